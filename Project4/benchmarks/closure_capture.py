@@ -0,0 +1,68 @@
+"""
+Cost of creating and calling lambdas against the size of the environment.
+
+Runs a Brewin program that defines K extra variables (each holding an object)
+and then, N times in a loop, creates a lambda that uses one variable and calls
+it. Closures capture only the variables their lambda (or what it calls) uses,
+so the time per iteration should stay flat as K grows instead of growing with
+the environment, and the heap should not fill up with copies of the unused
+objects.
+
+    python benchmarks/closure_capture.py [--iterations N] [--sizes K,K,...] [--engine ENGINE]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+
+
+def program(size):
+    """Source of the program with size extra variables in main."""
+    extra = "\n".join(f"  v{i} = @; v{i}.x = {i};" for i in range(size))
+    return f"""
+func main() {{
+{extra}
+  n = inputi();
+  total = 0;
+  i = 0;
+  while (i < n) {{
+    f = lambda(a) {{ return a + i; }};
+    total = total + f(1);
+    i = i + 1;
+  }}
+  print(total);
+}}
+"""
+
+
+def main():
+    """Print the time per iteration and peak heap for each environment size."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--sizes", default="0,10,100")
+    parser.add_argument("--engine", default="tree")
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        interpreter = Interpreter(
+            console_output=False, inp=[str(args.iterations)], engine=args.engine
+        )
+        start = time.perf_counter()
+        interpreter.run(program(size))
+        elapsed = time.perf_counter() - start
+        stats = interpreter.heap.stats()
+        print(
+            f"{size:>5} variables: {elapsed / args.iterations * 1e6:.1f} us/iteration,"
+            f" peak {stats['peak_objects']} objects, {stats['allocated']} allocated"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
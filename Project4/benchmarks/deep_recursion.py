@@ -0,0 +1,77 @@
+"""
+Deep Brewin recursion on each engine.
+
+Runs non-tail recursive Brewin programs (a plain function, and a method calling
+itself through the variable holding its object) at increasing depths on every
+engine and prints the time taken, or how the run failed. Every engine stops at
+--max-depth (the interpreter's max_call_depth), but the tree and compiled
+engines nest several Python frames per Brewin call and can hit Python's
+recursion limit first; the bytecode engine keeps Brewin frames on its own
+stack, so only --max-depth and memory limit it. The method
+program looks its object up by name in every frame, which dynamic scoping makes
+cost proportional to the depth.
+
+    python benchmarks/deep_recursion.py [--depths N,N,...] [--max-depth N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+
+PROGRAMS = {
+    "function": """
+func depth(n) { if (n == 0) { return 0; } return 1 + depth(n - 1); }
+func main() { print(depth(inputi())); }
+""",
+    "method": """
+func main() {
+  counter = @;
+  counter.depth = lambda(n) { if (n == 0) { return 0; } return 1 + counter.depth(n - 1); };
+  print(counter.depth(inputi()));
+}
+""",
+}
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+
+
+def run(program, engine, depth, max_depth):
+    """Time taken as text, or how the run failed."""
+    interpreter = Interpreter(
+        console_output=False, inp=[str(depth)], engine=engine, max_call_depth=max_depth
+    )
+    start = time.perf_counter()
+    try:
+        interpreter.run(program)
+    except RecursionError:
+        return "RecursionError"
+    except Exception as error:  # pylint: disable=broad-except
+        return str(error)
+    elapsed = time.perf_counter() - start
+    if interpreter.get_output() != [str(depth)]:
+        return f"wrong output {interpreter.get_output()}"
+    return f"{elapsed * 1000:.1f} ms"
+
+
+def main():
+    """Print one line per program, depth and engine."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--depths", default="100,900,5000")
+    parser.add_argument("--max-depth", type=int, default=None)
+    args = parser.parse_args()
+
+    for name, program in PROGRAMS.items():
+        for depth in (int(depth) for depth in args.depths.split(",")):
+            for engine in ENGINES:
+                result = run(program, engine, depth, args.max_depth)
+                print(f"{name:>8} depth {depth:>6} {engine:>8}: {result}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Object heap occupancy of a long-running, allocation-heavy program.
+
+Runs a Brewin program that creates N short-lived objects (each passed by value
+to a function, so it is copied once more, and every other one refers to itself)
+and prints the interpreter's heap statistics afterwards: objects allocated in
+total against the peak and final number of live ones, which stay flat however
+large N is, and what the heap's collector reclaimed and the pauses it took.
+Python's own cycle collector is disabled for the run, so the self-referring
+objects are only reclaimed by the heap's.
+
+    python benchmarks/heap_stats.py [--objects N] [--engine ENGINE] [--heap-limit BYTES]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+
+PROGRAM = """
+func total(p) { return p.x + p.y; }
+func main() {
+  n = inputi();
+  i = 0;
+  sum = 0;
+  while (i < n) {
+    p = @;
+    p.x = i;
+    p.y = 1;
+    if (i / 2 * 2 == i) { p.me = p; }
+    sum = sum + total(p);
+    i = i + 1;
+  }
+  print(sum);
+}
+"""
+
+
+def main():
+    """Run the program and print the heap statistics."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--objects", type=int, default=100000)
+    parser.add_argument("--engine", default="tree")
+    parser.add_argument("--heap-limit", type=int, default=None)
+    args = parser.parse_args()
+
+    interpreter = Interpreter(
+        console_output=False,
+        inp=[str(args.objects)],
+        engine=args.engine,
+        heap_limit=args.heap_limit,
+    )
+    gc.disable()
+    start = time.perf_counter()
+    try:
+        interpreter.run(PROGRAM)
+    except Exception as error:  # pylint: disable=broad-except
+        print(f"stopped: {error}")
+    elapsed = time.perf_counter() - start
+    gc.enable()
+    stats = interpreter.heap.stats()
+    print(f"ran in {elapsed:.2f} s, output {interpreter.get_output()}")
+    print(f"allocated: {stats['allocated']} objects")
+    print(f"peak live: {stats['peak_objects']} objects, {stats['peak_bytes']} bytes")
+    print(f"live at exit: {stats['live_objects']} objects, {stats['live_bytes']} bytes")
+    print(
+        f"collections: {stats['collections']}, reclaimed {stats['reclaimed_objects']} objects"
+        f" ({stats['reclaimed_bytes']} bytes), pauses {stats['gc_pause_total_ms']:.1f} ms total,"
+        f" {stats['gc_pause_max_ms']:.2f} ms max"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""
+Effect of memoizing pure Brewin functions on a call-heavy program.
+
+Runs a recursive Brewin fib(N) on every engine with Interpreter(memoize=False)
+and with memoize=True, and prints the time taken by each and, when memoizing,
+the memo cache's hits, misses and hit rate. fib is pure (see memov4.py), so
+with memoization each fib(k) runs once and every repeated call is a hit.
+
+    python benchmarks/memoization.py [--n N] [--memo-size N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+from memov4 import MEMO_SIZE  # noqa: E402
+
+PROGRAM = """
+func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+func main() { print(fib(inputi())); }
+"""
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+
+
+def run(engine, n, memoize, memo_size):
+    """Seconds taken by one run, and the interpreter."""
+    interpreter = Interpreter(
+        console_output=False, inp=[str(n)], engine=engine, memoize=memoize, memo_size=memo_size
+    )
+    start = time.perf_counter()
+    interpreter.run(PROGRAM)
+    return time.perf_counter() - start, interpreter
+
+
+def main():
+    """Print one line per engine and memoize setting."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--n", type=int, default=18)
+    parser.add_argument("--memo-size", type=int, default=MEMO_SIZE)
+    args = parser.parse_args()
+
+    for engine in ENGINES:
+        outputs = set()
+        for memoize in (False, True):
+            elapsed, interpreter = run(engine, args.n, memoize, args.memo_size)
+            outputs.add(tuple(interpreter.get_output()))
+            line = f"{engine:>8} memoize {'on' if memoize else 'off':>3}: {elapsed * 1000:.1f} ms"
+            if memoize:
+                stats = interpreter.memo.stats()
+                line += (
+                    f", {stats['hits']} hits, {stats['misses']} misses"
+                    f" ({stats['hit_rate']:.0%})"
+                )
+            print(line)
+        if len(outputs) != 1:
+            print(f"{engine}: output differs with memoization", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Cost of printing many lines, by output buffer size and output log mode.
+
+Runs a Brewin program that prints N lines, writing them to a line-buffered
+console stand-in (the null device, flushed at every newline as a terminal
+is) once with output_buffer_size=0, which writes each line as it is printed,
+and once with the default buffer. It then runs the program with no sink and
+each output log (the unbounded list, a ring of --log-limit lines, and spilling
+past --log-limit lines to disk), and prints the time and the peak Python
+memory (tracemalloc) of each.
+
+    python benchmarks/output_throughput.py [--lines N] [--engine ENGINE] [--log-limit N]
+"""
+
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+from outputv4 import OUTPUT_BUFFER, RING, SPILL  # noqa: E402
+
+PROGRAM = """
+func main() {
+  n = inputi();
+  i = 0;
+  while (i < n) {
+    print("line ", i);
+    i = i + 1;
+  }
+}
+"""
+
+
+def run(lines, engine, traced=False, **kwargs):
+    """Seconds taken by one run, peak KB if traced, and the lines it logged."""
+    interpreter = Interpreter(inp=[str(lines)], engine=engine, **kwargs)
+    gc.collect()
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        interpreter.run(PROGRAM)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1024 if traced else None
+    finally:
+        if traced:
+            tracemalloc.stop()
+    logged = len(interpreter.get_output())
+    interpreter.close_output()
+    return elapsed, peak, logged
+
+
+def main():
+    """Print one line per configuration."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument(
+        "--engine", choices=sorted(Interpreter.ENGINES), default=Interpreter.BYTECODE_ENGINE
+    )
+    parser.add_argument("--log-limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(os.devnull, "w", buffering=1, encoding="utf-8") as console:
+        for buffer_size in (0, OUTPUT_BUFFER):
+            with contextlib.redirect_stdout(console):
+                elapsed, _, _ = run(args.lines, args.engine, output_buffer_size=buffer_size)
+            print(f"console, buffer {buffer_size:>6}: {elapsed * 1000:8.1f} ms")
+
+    logs = [("list", None, RING), ("ring", args.log_limit, RING), ("spill", args.log_limit, SPILL)]
+    for name, log_limit, log_mode in logs:
+        elapsed, peak, logged = run(
+            args.lines,
+            args.engine,
+            traced=True,
+            console_output=False,
+            output_log_limit=log_limit,
+            output_log_mode=log_mode,
+        )
+        print(f"log {name:>5}: {elapsed * 1000:8.1f} ms, peak {peak:8.0f} KB, {logged} lines kept")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
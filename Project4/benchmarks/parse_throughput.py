@@ -0,0 +1,166 @@
+"""
+Conformance check and throughput benchmark for the parser backends.
+
+Parses a corpus with both the PLY grammar and the hand-written Pratt parser and
+fails if any program yields a different tree (compared through Element.__str__)
+or a different outcome (tree, None, or exception). Then measures how many MB of
+source per second each backend parses on a large machine-generated program.
+
+    python benchmarks/parse_throughput.py [--size-kb KB] [--runs N] [FILE.br ...]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from brewparse import PLY_BACKEND, PRATT_BACKEND, parse_program  # noqa: E402
+
+# Small programs covering every production, plus inputs that exercise the
+# error paths (illegal characters, PLY's restart-after-error recovery, EOF).
+CORPUS = [
+    'func main() { print("hello"); }',
+    "func main() { x = 1 + 2 * 3 - -4 / (5 - 6); print(x); }",
+    "func main() { print(1 < 2 == 3 >= 4 != 5 <= 6 > 7 || !a && b || c); }",
+    "func main() { print(!-!x, - - 1, 1 - -1, !a == b, -a * b); }",
+    "func f(a, ref b) { b = a; return; } func main() { f(1, x); return nil; }",
+    "func main() { if (x) { y = 1; } if (x) { y = 1; } else { y = @; } }",
+    "func main() { while (i < 3) { i = i + 1; } }",
+    "func main() { o = @; o.x = 5; o.f = lambda(a) { return a + this.x; }; o.f(1); print(o.x); }",
+    "func main() { f = lambda() { return lambda(ref q) { q = true; }; }; g(f(), false, nil); }",
+    'func main() { /* multi\nline */ print("a/*b", "", 007); }',
+    "func main() { x = 1 & 2; }",
+    'func main() { x = "unterminated; }',
+    "func main() { }",
+    "func main() { x = ; } func g() { return 1; }",
+    "oops func main() { print(1); }",
+    "func main() { a.b.c = 1; }",
+    "func main() { print(1) }",
+    "func main() { print(1);",
+    "func",
+    "",
+]
+
+
+def generate_program(size_bytes, seed=0):
+    """A syntactically valid program of roughly size_bytes bytes."""
+    rng = random.Random(seed)
+    names = ["a", "b", "count", "total", "obj", "x1", "y2"]
+
+    def expression(depth=0):
+        choice = rng.randrange(9 if depth < 3 else 4)
+        if choice == 0:
+            return str(rng.randrange(1000))
+        if choice == 1:
+            return rng.choice(names)
+        if choice == 2:
+            return '"s' + str(rng.randrange(100)) + '"'
+        if choice == 3:
+            return rng.choice(["true", "false", "nil"])
+        if choice == 4:
+            return "-" + expression(depth + 1)
+        if choice == 5:
+            return "!(" + expression(depth + 1) + ")"
+        if choice == 6:
+            args = ", ".join(expression(depth + 1) for _ in range(rng.randrange(3)))
+            return rng.choice(names) + "." + rng.choice(names) + "(" + args + ")"
+        op = rng.choice(["+", "-", "*", "/", "==", "!=", "<", ">=", "&&", "||"])
+        return "(" + expression(depth + 1) + " " + op + " " + expression(depth + 1) + ")"
+
+    def statement(depth=0):
+        choice = rng.randrange(6 if depth < 2 else 3)
+        if choice == 0:
+            return rng.choice(names) + " = " + expression() + ";"
+        if choice == 1:
+            return "obj." + rng.choice(names) + " = " + expression() + ";"
+        if choice == 2:
+            return "print(" + expression() + ");"
+        if choice == 3:
+            return "if (" + expression() + ") { " + statement(depth + 1) + " } else { return; }"
+        if choice == 4:
+            return "while (" + expression() + ") { " + statement(depth + 1) + " }"
+        return "f = lambda(p, ref q) { " + statement(depth + 1) + " return q; };"
+
+    chunks = []
+    size = 0
+    index = 0
+    while size < size_bytes:
+        body = "\n  ".join(statement() for _ in range(20))
+        chunk = f"func f{index}(a, ref b) {{\n  {body}\n}}\n"
+        chunks.append(chunk)
+        size += len(chunk)
+        index += 1
+    chunks.append("func main() { f0(1, x); }\n")
+    return "".join(chunks)
+
+
+def outcome(program, backend):
+    """The tree (as a string) or exception a backend produces, and its output."""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            result = str(parse_program(program, backend=backend))
+        except Exception as exc:  # pylint: disable=broad-except
+            result = f"{type(exc).__name__}: {exc}"
+    # lexer messages are printed while tokenizing, which the Pratt parser does
+    # up front, so only the set of messages has to match, not their order
+    return result, sorted(output.getvalue().splitlines())
+
+
+def check_conformance(programs):
+    """Names of the programs the two backends disagree on."""
+    return [
+        name
+        for name, program in programs
+        if outcome(program, PLY_BACKEND) != outcome(program, PRATT_BACKEND)
+    ]
+
+
+def throughput_mb_s(program, backend, runs):
+    """Median parse throughput in MB of source per second."""
+    parse_program(program, backend=backend)  # build tables / warm up
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        parse_program(program, backend=backend)
+        timings.append(time.perf_counter() - start)
+    return len(program.encode("utf-8")) / statistics.median(timings) / 1e6
+
+
+def main():
+    """Run the check and the benchmark; exit status 1 on a conformance failure."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("files", nargs="*")
+    args = parser.parse_args()
+
+    large = generate_program(args.size_kb * 1024)
+    programs = [(f"corpus[{i}]", program) for i, program in enumerate(CORPUS)]
+    programs.append(("generated", large))
+    for path in args.files:
+        with open(path, encoding="utf-8") as handle:
+            programs.append((path, handle.read()))
+
+    mismatches = check_conformance(programs)
+    print(f"conformance: {len(programs) - len(mismatches)}/{len(programs)} programs identical")
+
+    for backend in (PLY_BACKEND, PRATT_BACKEND):
+        rate = throughput_mb_s(large, backend, args.runs)
+        print(f"{backend:>5}: {rate:.2f} MB/s on {len(large) / 1024:.0f} KB")
+
+    if mismatches:
+        print(f"FAIL: backends disagree on {', '.join(mismatches)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
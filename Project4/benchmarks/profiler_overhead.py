@@ -0,0 +1,56 @@
+"""
+Cost of the Brewin profiler on a call-heavy program.
+
+Runs a recursive Brewin fib(N) on every engine with Interpreter(profile=False)
+and with profile=True, and prints the time taken by each and the profiler's
+count of fib calls. With profiling off the interpreter only checks that it has
+no profiler at each call, so the first time should match an interpreter
+without one; the second shows what recording every call costs.
+
+    python benchmarks/profiler_overhead.py [--n N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+
+PROGRAM = """
+func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+func main() { print(fib(inputi())); }
+"""
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+
+
+def run(engine, n, profile):
+    """Seconds taken by one run, and the interpreter."""
+    interpreter = Interpreter(console_output=False, inp=[str(n)], engine=engine, profile=profile)
+    start = time.perf_counter()
+    interpreter.run(PROGRAM)
+    return time.perf_counter() - start, interpreter
+
+
+def main():
+    """Print one line per engine and profile setting."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--n", type=int, default=18)
+    args = parser.parse_args()
+
+    for engine in ENGINES:
+        for profile in (False, True):
+            elapsed, interpreter = run(engine, args.n, profile)
+            line = f"{engine:>8} profile {'on' if profile else 'off':>3}: {elapsed * 1000:.1f} ms"
+            if profile:
+                calls = {row["name"]: row["calls"] for row in interpreter.profiler.summary()}
+                line += f", {calls['fib']} fib calls"
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
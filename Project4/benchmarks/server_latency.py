@@ -0,0 +1,111 @@
+"""
+Request latency of the warm interpreter server against cold starts.
+
+Runs the same program N times, first as a fresh `python` process per run (the
+way the pipeline runs Brewin today), then as N requests to one server.py
+process over stdin/stdout, and prints latency percentiles for both as seen by
+the caller.
+
+    python benchmarks/server_latency.py [--runs N] [--engine ENGINE]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from server import LatencyStats  # noqa: E402
+
+PROGRAM = """
+func fib(n) { if (n < 2) { return n; } return fib(n - 1) + fib(n - 2); }
+func main() { print(fib(inputi())); }
+"""
+INPUT = ["10"]
+
+COLD_SNIPPET = """
+import sys
+from interpreterv4 import Interpreter
+Interpreter(inp=sys.argv[2:], engine=sys.argv[1]).run(sys.stdin.read())
+"""
+
+
+def cold_latencies(runs, engine):
+    """Wall time of one fresh interpreter process per run, in ms."""
+    stats = LatencyStats()
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", COLD_SNIPPET, engine, *INPUT],
+            cwd=PROJECT_DIR,
+            input=PROGRAM,
+            text=True,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        stats.record((time.perf_counter() - start) * 1000)
+    return stats
+
+
+def warm_latencies(runs, engine):
+    """Round-trip time of requests to one server process, in ms."""
+    stats = LatencyStats()
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--engine", engine],
+        cwd=PROJECT_DIR,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+    )
+    try:
+        # wait until the server has started up before timing anything
+        server.stdin.write(json.dumps({"op": "stats"}) + "\n")
+        server.stdin.flush()
+        server.stdout.readline()
+        for request_id in range(runs):
+            request = {"id": request_id, "program": PROGRAM, "input": INPUT}
+            start = time.perf_counter()
+            server.stdin.write(json.dumps(request) + "\n")
+            server.stdin.flush()
+            response = json.loads(server.stdout.readline())
+            stats.record((time.perf_counter() - start) * 1000)
+            if response["exception"] is not None:
+                raise RuntimeError(response["exception"])
+    finally:
+        server.stdin.close()
+        server.wait()
+    return stats
+
+
+def report(label, stats):
+    """Print one line of percentiles."""
+    summary = stats.summary()
+    percentiles = ", ".join(
+        f"{key[:-3]} {value:.2f} ms" for key, value in summary.items() if key.endswith("_ms")
+    )
+    print(f"{label}: {percentiles} ({summary['requests']} runs)")
+
+
+def main():
+    """Run both measurements and print the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--engine", default="tree")
+    args = parser.parse_args()
+
+    cold = cold_latencies(args.runs, args.engine)
+    warm = warm_latencies(args.runs, args.engine)
+    report("cold start ", cold)
+    report("warm server", warm)
+    print(f"median speedup: {cold.percentile(50) / warm.percentile(50):.0f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
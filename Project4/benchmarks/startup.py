@@ -0,0 +1,97 @@
+"""
+Cold-start benchmark for the interpreter modules.
+
+Measures, in fresh Python processes, how long `import interpreterv4` takes
+(from `python -X importtime`) and how long a worker needs to import, parse and
+run a trivial program. Fails if the median import time exceeds the budget, or
+if importing writes any file next to the sources (parsetab.py, parser.out, ...).
+
+    python benchmarks/startup.py [--runs N] [--budget-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_RUN_SNIPPET = """
+from interpreterv4 import Interpreter
+Interpreter(console_output=False).run("func main() { print(1); }")
+"""
+
+
+def snapshot_sources():
+    """Map of file name to mtime for everything in the project directory."""
+    return {
+        entry.name: entry.stat().st_mtime_ns
+        for entry in os.scandir(PROJECT_DIR)
+        if entry.is_file()
+    }
+
+
+def import_time_us():
+    """Cumulative `import interpreterv4` time reported by -X importtime."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import interpreterv4"],
+        cwd=PROJECT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    for line in reversed(proc.stderr.splitlines()):
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "interpreterv4":
+            return int(fields[1])
+    raise RuntimeError("interpreterv4 missing from -X importtime output")
+
+
+def first_run_seconds():
+    """Wall time of a fresh process that imports, parses and runs a program."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", FIRST_RUN_SNIPPET],
+        cwd=PROJECT_DIR,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the benchmark; exit status 1 on a budget or side-effect violation."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    before = snapshot_sources()
+    imports = [import_time_us() / 1000 for _ in range(args.runs)]
+    first_runs = [first_run_seconds() * 1000 for _ in range(args.runs)]
+    after = snapshot_sources()
+
+    import_ms = statistics.median(imports)
+    print(f"import interpreterv4: median {import_ms:.1f} ms, min {min(imports):.1f} ms")
+    print(
+        f"import + first run:   median {statistics.median(first_runs):.1f} ms, "
+        f"min {min(first_runs):.1f} ms"
+    )
+
+    failed = False
+    if after != before:
+        changed = sorted(
+            name for name in set(before) | set(after) if before.get(name) != after.get(name)
+        )
+        print(f"FAIL: starting the interpreter wrote {', '.join(changed)}")
+        failed = True
+    if import_ms > args.budget_ms:
+        print(f"FAIL: import time {import_ms:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+Benchmark suite of representative Brewin programs, with regression tracking.
+
+Runs each program in benchmarks/programs (recursive fib, nested while loops,
+closures, prototype-chain method dispatch, object allocation churn, string
+concatenation) on each engine, and parses a large generated source. After the
+warmup runs it reports the median parse and execution times of the repeated
+runs, the peak Python memory of one more run (tracemalloc), and ops per second:
+statements executed (counted in a separate run, see statsv4.py) per second of
+execution, or bytes of source per second of parsing. Inputs and the generated
+source are fixed, so runs are comparable. Results are written as JSON; with
+--baseline, they are compared against an earlier results file, and the run
+fails if any program's output changed, or if the fastest parse or execution
+time or the peak memory grew by more than the threshold. The fastest time is
+compared because it varies least from run to run.
+
+    python benchmarks/suite.py [--engines E,...] [--only NAME,...] [--quick]
+        [--warmup N] [--repeat N] [--output FILE] [--baseline FILE] [--threshold FRACTION]
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCHMARKS_DIR)
+PROGRAMS_DIR = os.path.join(BENCHMARKS_DIR, "programs")
+sys.path.insert(0, PROJECT_DIR)
+
+from brewparse import parse_program  # noqa: E402
+from interpreterv4 import Interpreter  # noqa: E402
+from parse_throughput import generate_program  # noqa: E402
+
+# name -> program in benchmarks/programs, its inputi() lines, and those for --quick
+PROGRAMS = {
+    "fib": ("fib.br", ["18"], ["12"]),
+    "nested_loops": ("nested_loops.br", ["120"], ["30"]),
+    "closures": ("closures.br", ["400"], ["50"]),
+    "proto_dispatch": ("proto_dispatch.br", ["2000"], ["200"]),
+    "object_churn": ("object_churn.br", ["2000"], ["200"]),
+    "string_concat": ("string_concat.br", ["5000"], ["500"]),
+}
+# parsed only; KB of generated source, and for --quick
+LARGE_SOURCE = "large_source"
+LARGE_SOURCE_KB = (256, 32)
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+# compared against the baseline; time differences below the floor are noise
+COMPARED_METRICS = ("parse_ms_min", "exec_ms_min", "peak_kb")
+NOISE_FLOOR_MS = 1.0
+
+
+class PreParsed:
+    """Parse cache stand-in that hands Interpreter.run the tree parsed beforehand."""
+
+    def __init__(self, ast):
+        self.ast = ast
+
+    def load(self, program):
+        return self.ast
+
+    def store(self, program, ast):
+        pass
+
+
+def run_once(source, inputs, engine, **kwargs):
+    """Parse and run source once; seconds parsing, seconds running, and the interpreter."""
+    interpreter = Interpreter(console_output=False, inp=list(inputs), engine=engine, **kwargs)
+    start = time.perf_counter()
+    ast = parse_program(source)
+    parsed = time.perf_counter()
+    interpreter.parse_cache = PreParsed(ast)
+    interpreter.run(source)
+    return parsed - start, time.perf_counter() - parsed, interpreter
+
+
+def peak_kb(run):
+    """Peak KB of Python memory allocated while run() runs."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_program(source, inputs, engine, warmup, repeat):
+    """Result entry for one program on one engine."""
+    for _ in range(warmup):
+        run_once(source, inputs, engine)
+    parse_times, exec_times = [], []
+    for _ in range(repeat):
+        gc.collect()
+        parse_s, exec_s, interpreter = run_once(source, inputs, engine)
+        parse_times.append(parse_s)
+        exec_times.append(exec_s)
+    _, _, counted = run_once(source, inputs, engine, collect_stats=True)
+    statements = counted.stats()["statements_total"]
+    exec_s = statistics.median(exec_times)
+    return {
+        "parse_ms": statistics.median(parse_times) * 1000,
+        "parse_ms_min": min(parse_times) * 1000,
+        "exec_ms": exec_s * 1000,
+        "exec_ms_min": min(exec_times) * 1000,
+        "peak_kb": peak_kb(lambda: run_once(source, inputs, engine)),
+        "ops": statements,
+        "ops_per_sec": statements / exec_s if exec_s else 0.0,
+        "ops_unit": "statements",
+        "output": interpreter.get_output(),
+    }
+
+
+def bench_parse(source, warmup, repeat):
+    """Result entry for parsing source."""
+    for _ in range(warmup):
+        parse_program(source)
+    parse_times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        parse_program(source)
+        parse_times.append(time.perf_counter() - start)
+    parse_s = statistics.median(parse_times)
+    size = len(source.encode("utf-8"))
+    return {
+        "parse_ms": parse_s * 1000,
+        "parse_ms_min": min(parse_times) * 1000,
+        "peak_kb": peak_kb(lambda: parse_program(source)),
+        "ops": size,
+        "ops_per_sec": size / parse_s if parse_s else 0.0,
+        "ops_unit": "bytes",
+    }
+
+
+def run_suite(names, engines, quick, warmup, repeat):
+    """Results keyed by "program/engine" (and "large_source/parse")."""
+    results = {}
+    for name in names:
+        if name == LARGE_SOURCE:
+            size_kb = LARGE_SOURCE_KB[1] if quick else LARGE_SOURCE_KB[0]
+            source = generate_program(size_kb * 1024)
+            results[f"{name}/parse"] = bench_parse(source, warmup, repeat)
+            continue
+        file_name, inputs, quick_inputs = PROGRAMS[name]
+        with open(os.path.join(PROGRAMS_DIR, file_name), encoding="utf-8") as handle:
+            source = handle.read()
+        for engine in engines:
+            results[f"{name}/{engine}"] = bench_program(
+                source, quick_inputs if quick else inputs, engine, warmup, repeat
+            )
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Descriptions of the regressions of results against baseline results."""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if "output" in base and base["output"] != result.get("output"):
+            regressions.append(f"{key}: output {base['output']} -> {result.get('output')}")
+        for metric in COMPARED_METRICS:
+            if metric not in base or metric not in result:
+                continue
+            old, new = base[metric], result[metric]
+            if new <= old * (1 + threshold):
+                continue
+            if metric != "peak_kb" and new - old < NOISE_FLOOR_MS:
+                continue
+            growth = (new / old - 1) * 100 if old else float("inf")
+            regressions.append(f"{key}: {metric} {old:.2f} -> {new:.2f} (+{growth:.0f}%)")
+    return regressions
+
+
+def format_results(results):
+    """One line per result."""
+    lines = [
+        f"{'benchmark':<28} {'parse ms':>9} {'exec ms':>9} {'peak KB':>9} {'ops/s':>12}"
+    ]
+    for key, result in results.items():
+        exec_ms = f"{result['exec_ms']:.2f}" if "exec_ms" in result else "-"
+        lines.append(
+            f"{key:<28} {result['parse_ms']:>9.2f} {exec_ms:>9} {result['peak_kb']:>9.0f}"
+            f" {result['ops_per_sec']:>12.0f} {result['ops_unit']}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    """Run the suite; exit status 1 if it regressed against the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--engines", default=",".join(ENGINES))
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    engines = args.engines.split(",")
+    for engine in engines:
+        if engine not in Interpreter.ENGINES:
+            parser.error(f"unknown engine {engine}")
+    names = list(PROGRAMS) + [LARGE_SOURCE]
+    if args.only:
+        names = args.only.split(",")
+        for name in names:
+            if name not in PROGRAMS and name != LARGE_SOURCE:
+                parser.error(f"unknown benchmark {name}")
+
+    results = run_suite(names, engines, args.quick, args.warmup, args.repeat)
+    print(format_results(results))
+    if args.output:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "engines": engines,
+                "quick": args.quick,
+                "warmup": args.warmup,
+                "repeat": args.repeat,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as handle:
+            baseline = json.load(handle)
+        if baseline["meta"].get("quick") != args.quick:
+            print("warning: baseline was run with different inputs (--quick)")
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"FAIL: {len(regressions)} regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
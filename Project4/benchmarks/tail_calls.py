@@ -0,0 +1,83 @@
+"""
+Tail-recursive Brewin loops against while loops on each engine.
+
+Runs an accumulator-style loop written as a tail-recursive function (return
+loop(n - 1, acc + 1)), as a tail-recursive lambda, and as a while loop, for N
+iterations on every engine, with the interpreter's tail calls on and off, and
+prints the time taken, or how the run failed. With tail calls on, each
+iteration replaces the caller's frame, so the recursive loops run in constant
+Python stack and environment space; with them off, every iteration nests a
+frame, which the tree and compiled engines can only do up to Python's recursion
+limit.
+
+    python benchmarks/tail_calls.py [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+
+PROGRAMS = {
+    "function": """
+func loop(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + 1); }
+func main() { print(loop(inputi(), 0)); }
+""",
+    "lambda": """
+func main() {
+  loop = lambda(n, acc) { if (n == 0) { return acc; } return loop(n - 1, acc + 1); };
+  print(loop(inputi(), 0));
+}
+""",
+    "while": """
+func main() {
+  n = inputi();
+  acc = 0;
+  while (n > 0) { n = n - 1; acc = acc + 1; }
+  print(acc);
+}
+""",
+}
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+
+
+def run(program, engine, iterations, tail_calls):
+    """Time taken as text, or how the run failed."""
+    interpreter = Interpreter(
+        console_output=False, inp=[str(iterations)], engine=engine, tail_calls=tail_calls
+    )
+    start = time.perf_counter()
+    try:
+        interpreter.run(program)
+    except RecursionError:
+        return "RecursionError"
+    except Exception as error:  # pylint: disable=broad-except
+        return str(error)
+    elapsed = time.perf_counter() - start
+    if interpreter.get_output() != [str(iterations)]:
+        return f"wrong output {interpreter.get_output()}"
+    return f"{elapsed * 1000:.1f} ms"
+
+
+def main():
+    """Print one line per program, engine and tail call setting."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    for name, program in PROGRAMS.items():
+        for engine in ENGINES:
+            for tail_calls in (True, False):
+                result = run(program, engine, args.iterations, tail_calls)
+                setting = "on" if tail_calls else "off"
+                print(f"{name:>8} {engine:>8} tail calls {setting:>3}: {result}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Allocation-heavy while loop with and without the small-int Value cache.
+
+Runs a Brewin loop made of int literals, arithmetic and comparisons on every
+engine, once with the interpreter's default small_ints range and once with an
+empty one, and prints the time taken. nil, bools and literals are interned in
+both configurations; the difference is the new Value each int result needs
+without the cache.
+
+    python benchmarks/value_interning.py [--iterations N] [--bound N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from interpreterv4 import Interpreter  # noqa: E402
+from internv4 import SMALL_INTS  # noqa: E402
+
+# i stays below the bound, so with the default range every int is cached
+PROGRAM = """
+func main() {
+  n = inputi();
+  bound = inputi();
+  k = 0;
+  sum = 0;
+  while (k < n) {
+    i = k - k / bound * bound;
+    if (i / 2 * 2 == i) { sum = sum + 1; }
+    k = k + 1;
+  }
+  print(sum);
+}
+"""
+ENGINES = [Interpreter.TREE_ENGINE, Interpreter.COMPILED_ENGINE, Interpreter.BYTECODE_ENGINE]
+
+
+def run(engine, iterations, bound, small_ints):
+    """Seconds taken by one run."""
+    interpreter = Interpreter(
+        console_output=False,
+        inp=[str(iterations), str(bound)],
+        engine=engine,
+        small_ints=small_ints,
+    )
+    start = time.perf_counter()
+    interpreter.run(PROGRAM)
+    return time.perf_counter() - start
+
+
+def main():
+    """Print one line per engine and cache setting."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--bound", type=int, default=100)
+    args = parser.parse_args()
+
+    for engine in ENGINES:
+        for label, small_ints in (("cached", SMALL_INTS), ("uncached", range(0))):
+            elapsed = run(engine, args.iterations, args.bound, small_ints)
+            print(f"{engine:>8} {label:>8}: {elapsed * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from ply import lex
+import sys
 
 reserved = (
     "FUNC",
@@ -126,5 +126,16 @@ def t_error(t):
     t.lexer.skip(1)
 
 
-# Build the lexer
-lex.lex()
+# The lexer is built on first use rather than at import time, so importing this
+# module (and brewparse) stays cheap for processes that never parse; PLY itself
+# is only imported then too.
+_lexer = None
+
+
+def get_lexer():
+    global _lexer
+    if _lexer is None:
+        from ply import lex
+
+        _lexer = lex.lex(module=sys.modules[__name__])
+    return _lexer
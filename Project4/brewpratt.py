@@ -0,0 +1,327 @@
+# Hand-written recursive-descent/Pratt parser for Brewin, an alternative to the
+# PLY grammar in brewparse.py for large machine-generated sources. It builds the
+# same Element trees, honours the same precedence table and follows PLY's
+# behaviour on bad input: after a syntax error everything parsed so far and the
+# offending token are dropped and parsing restarts from the next token, with
+# p_error-style messages suppressed until three tokens have been shifted.
+import re
+
+from brewlex import literals, reserved_map
+from element import (
+    ArgNode,
+    AssignNode,
+    BinaryOpNode,
+    EmptyNode,
+    FuncCallNode,
+    FuncNode,
+    IfNode,
+    LambdaNode,
+    MethodCallNode,
+    ProgramNode,
+    ReturnNode,
+    UnaryOpNode,
+    ValueNode,
+    VarNode,
+    WhileNode,
+)
+from intbase import InterpreterBase
+
+# Same rules as brewlex.py, in the order PLY tries them: function rules in
+# definition order, then string rules by decreasing length. Ignored characters
+# and newlines are folded into a prefix of every match, and the last two
+# alternatives make every position match, so the whole source is a single
+# finditer pass.
+_TOKEN_RE = re.compile(
+    r"[ \t\n]*(?:"
+    r"(?P<NUMBER>\d+)"
+    r"|(?P<NAME>[A-Za-z_][\w_]*)"
+    r"|(?P<comment>/\*(?:.|\n)*?\*/)"
+    r'|(?P<STRING>".*?")'
+    r"|(?P<OR>\|\|)"
+    r"|(?P<AND>&&)"
+    r"|(?P<EQ>==)"
+    r"|(?P<NOT_EQ>!=)"
+    r"|(?P<GREATER_EQ>>=)"
+    r"|(?P<LESS_EQ><=)"
+    r"|(?P<LPAREN>\()"
+    r"|(?P<RPAREN>\))"
+    r"|(?P<LBRACE>\{)"
+    r"|(?P<RBRACE>\})"
+    r"|(?P<DOT>\.)"
+    r"|(?P<PLUS>\+)"
+    r"|(?P<MINUS>-)"
+    r"|(?P<MULTIPLY>\*)"
+    r"|(?P<AT>@)"
+    r"|(?P<COMMA>,)"
+    r"|(?P<SEMI>;)"
+    r"|(?P<GREATER>>)"
+    r"|(?P<LESS><)"
+    r"|(?P<ASSIGN>=)"
+    r"|(?P<DIVIDE>/)"
+    r"|(?P<NOT>!)"
+    r"|(?P<other>[\s\S])"
+    r"|\Z)"
+)
+
+END = "$end"
+UNARY_BP = 6
+BINARY_BP = {
+    "OR": 1,
+    "AND": 2,
+    "EQ": 3,
+    "NOT_EQ": 3,
+    "GREATER": 3,
+    "GREATER_EQ": 3,
+    "LESS": 3,
+    "LESS_EQ": 3,
+    "PLUS": 4,
+    "MINUS": 4,
+    "MULTIPLY": 5,
+    "DIVIDE": 5,
+}
+_ERROR_COUNT = 3  # yacc.error_count
+
+
+def tokenize(program):
+    types = []
+    values = []
+    add_type = types.append
+    add_value = values.append
+    for m in _TOKEN_RE.finditer(program):
+        kind = m.lastgroup
+        if kind is None or kind == "comment":
+            continue  # trailing whitespace
+        text = m.group(kind)
+        if kind == "NAME":
+            kind = reserved_map.get(text, "NAME")
+        elif kind == "NUMBER":
+            text = int(text)
+        elif kind == "STRING":
+            text = text[1:-1]
+        elif kind == "other":
+            if text not in literals:
+                print(f"Illegal character {text}")
+                continue
+            kind = text
+        add_type(kind)
+        add_value(text)
+    types.append(END)
+    values.append(None)
+    return types, values
+
+
+class _ParseError(Exception):
+    def __init__(self, pos):
+        super().__init__(pos)
+        self.pos = pos
+
+
+class PrattParser:
+    def __init__(self, types, values):
+        self.types = types
+        self.values = values
+        self.pos = 0
+
+    def parse(self):
+        restart = 0
+        error_count = 0
+        while True:
+            self.pos = restart
+            try:
+                return self.__program()
+            except _ParseError as error:
+                error_count = max(0, error_count - (error.pos - restart))
+                if error_count == 0:
+                    self.__report(error.pos)
+                error_count = _ERROR_COUNT
+                if self.types[error.pos] == END:
+                    return None
+                restart = error.pos + 1
+
+    def __report(self, pos):
+        if self.types[pos] == END:
+            print("Syntax error at EOF")
+        else:
+            print(f"Syntax error at '{self.values[pos]}'")
+
+    def __fail(self):
+        raise _ParseError(self.pos)
+
+    def __expect(self, kind):
+        if self.types[self.pos] != kind:
+            self.__fail()
+        value = self.values[self.pos]
+        self.pos += 1
+        return value
+
+    def __program(self):
+        functions = [self.__func()]
+        while self.types[self.pos] == "FUNC":
+            functions.append(self.__func())
+        if self.types[self.pos] != END:
+            self.__fail()
+        return ProgramNode(functions=functions)
+
+    def __func(self):
+        self.__expect("FUNC")
+        name = self.__expect("NAME")
+        args = self.__formal_args()
+        return FuncNode(name=name, args=args, statements=self.__body())
+
+    def __lambda(self):
+        self.__expect("LAMBDA")
+        args = self.__formal_args()
+        return LambdaNode(args=args, statements=self.__body())
+
+    def __formal_args(self):
+        self.__expect("LPAREN")
+        args = []
+        if self.types[self.pos] != "RPAREN":
+            args.append(self.__formal_arg())
+            while self.types[self.pos] == "COMMA":
+                self.pos += 1
+                args.append(self.__formal_arg())
+        self.__expect("RPAREN")
+        return args
+
+    def __formal_arg(self):
+        if self.types[self.pos] == "REF":
+            self.pos += 1
+            return ArgNode(InterpreterBase.REFARG_DEF, name=self.__expect("NAME"))
+        return ArgNode(InterpreterBase.ARG_DEF, name=self.__expect("NAME"))
+
+    # LBRACE statements RBRACE, where statements is non-empty
+    def __body(self):
+        self.__expect("LBRACE")
+        statements = [self.__statement()]
+        types = self.types
+        while types[self.pos] != "RBRACE":
+            statements.append(self.__statement())
+        self.pos += 1
+        return statements
+
+    def __statement(self):
+        types = self.types
+        pos = self.pos
+        kind = types[pos]
+        if kind == "NAME":
+            if types[pos + 1] == "ASSIGN":
+                name = self.values[pos]
+                self.pos = pos + 2
+                return self.__assign(name)
+            if types[pos + 1] == "DOT" and types[pos + 2] == "NAME" and types[pos + 3] == "ASSIGN":
+                name = self.values[pos] + "." + self.values[pos + 2]
+                self.pos = pos + 4
+                return self.__assign(name)
+        elif kind == "IF":
+            self.pos += 1
+            condition = self.__condition()
+            statements = self.__body()
+            else_statements = None
+            if types[self.pos] == "ELSE":
+                self.pos += 1
+                else_statements = self.__body()
+            return IfNode(
+                condition=condition,
+                statements=statements,
+                else_statements=else_statements,
+            )
+        elif kind == "WHILE":
+            self.pos += 1
+            condition = self.__condition()
+            return WhileNode(condition=condition, statements=self.__body())
+        elif kind == "RETURN":
+            self.pos += 1
+            expr = None
+            if types[self.pos] != "SEMI":
+                expr = self.__expression(0)
+            self.__expect("SEMI")
+            return ReturnNode(expression=expr)
+        expr = self.__expression(0)
+        self.__expect("SEMI")
+        return expr
+
+    def __assign(self, name):
+        expr = self.__expression(0)
+        self.__expect("SEMI")
+        return AssignNode(name=name, expression=expr)
+
+    def __condition(self):
+        self.__expect("LPAREN")
+        condition = self.__expression(0)
+        self.__expect("RPAREN")
+        return condition
+
+    # Pratt loop: all binary operators are left associative
+    def __expression(self, min_bp):
+        left = self.__prefix()
+        types = self.types
+        while True:
+            bp = BINARY_BP.get(types[self.pos])
+            if bp is None or bp <= min_bp:
+                return left
+            operator = self.values[self.pos]
+            self.pos += 1
+            left = BinaryOpNode(operator, op1=left, op2=self.__expression(bp))
+
+    def __prefix(self):
+        pos = self.pos
+        kind = self.types[pos]
+        value = self.values[pos]
+        if kind == "NAME":
+            return self.__name(value)
+        self.pos = pos + 1
+        if kind == "NUMBER":
+            return ValueNode(InterpreterBase.INT_DEF, val=value)
+        if kind == "STRING":
+            return ValueNode(InterpreterBase.STRING_DEF, val=value)
+        if kind == "TRUE" or kind == "FALSE":
+            return ValueNode(InterpreterBase.BOOL_DEF, val=value == InterpreterBase.TRUE_DEF)
+        if kind == "LPAREN":
+            expr = self.__expression(0)
+            self.__expect("RPAREN")
+            return expr
+        if kind == "MINUS":
+            return UnaryOpNode(InterpreterBase.NEG_DEF, op1=self.__expression(UNARY_BP))
+        if kind == "NOT":
+            return UnaryOpNode(InterpreterBase.NOT_DEF, op1=self.__expression(UNARY_BP))
+        if kind == "NIL":
+            return EmptyNode(InterpreterBase.NIL_DEF)
+        if kind == "AT":
+            return EmptyNode(InterpreterBase.OBJ_DEF)
+        if kind == "LAMBDA":
+            self.pos = pos
+            return self.__lambda()
+        self.pos = pos
+        self.__fail()
+
+    def __name(self, name):
+        types = self.types
+        self.pos += 1
+        if types[self.pos] == "LPAREN":
+            return FuncCallNode(name=name, args=self.__args())
+        if types[self.pos] != "DOT":
+            return VarNode(name=name)
+        self.pos += 1
+        member = self.__expect("NAME")
+        if types[self.pos] == "LPAREN":
+            return MethodCallNode(objref=name, name=member, args=self.__args())
+        return VarNode(name=name + "." + member)
+
+    def __args(self):
+        self.__expect("LPAREN")
+        args = []
+        if self.types[self.pos] != "RPAREN":
+            args.append(self.__expression(0))
+            while self.types[self.pos] == "COMMA":
+                self.pos += 1
+                args.append(self.__expression(0))
+        self.__expect("RPAREN")
+        return args
+
+
+# same contract as PLY's parser.parse: the program's AST, or None if it could
+# not be parsed
+def parse(program):
+    types, values = tokenize(program)
+    return PrattParser(types, values).parse()
@@ -0,0 +1,643 @@
+# Bytecode backend for Brewin: a compiler that lowers the Element AST into flat
+# array-backed code objects, a stack-based VM that runs them with an explicit
+# operand stack and frame stack, and a disassembler for inspecting the output.
+import copy
+from array import array
+
+from intbase import InterpreterBase, ErrorType
+from internv4 import ValuePool, bind_literals
+from memov4 import memo_key
+from type_valuev4 import Type, get_printable
+
+
+# opcodes; every instruction is two ints in the code array: (opcode, argument)
+LOAD_VALUE = 0  # push the literal's interned Value consts[arg]
+LOAD_NIL = 1  # push the shared nil value
+LOAD_NAME = 2  # push the variable/function named names[arg]
+STORE_NAME = 3  # pop into the variable named names[arg]
+BIN_OP = 4  # pop right, left; push names[arg] applied to them
+NEG = 5  # pop int; push its negation
+NOT = 6  # pop bool; push its complement
+IF_FALSE = 7  # pop an if condition; jump to arg if it is false
+WHILE_FALSE = 8  # pop a while condition; jump to arg if it is false
+JUMP = 9  # jump to arg
+PUSH_SCOPE = 10  # enter a block
+POP_SCOPE = 11  # leave a block
+RESOLVE = 12  # push the closure for the call described by consts[arg]
+CALL = 13  # pop args and closure pushed by RESOLVE; enter the closure's frame
+RETURN = 14  # pop a value and return it from the current frame
+RETURN_NIL = 15  # return nil from the current frame
+END = 16  # fall off the end of a function body
+POP = 17  # discard the top of the stack
+PRINTABLE = 18  # convert the top of the stack to its printable string
+PRINT = 19  # pop arg strings, output their concatenation, push nil
+EVAL_AST = 20  # push the tree walker's value for consts[arg >> 1]
+LOAD_FAST = 21  # push the variable at the resolved address addrs[arg]
+STORE_FAST = 22  # pop into the variable at the resolved address addrs[arg]
+RESOLVE_METHOD = 23  # push the receiver and closure of the method call consts[arg >> 1]
+CALL_METHOD = 24  # pop args, closure and receiver pushed by RESOLVE_METHOD; enter the method
+LOAD_FIELD_OWNER = 25  # push the object whose field "obj.field" consts[arg >> 1] names
+STORE_FIELD = 26  # pop a value and an object; set the object's field names[arg] to it
+STORE_THIS = 27  # pop into this (or the variable this at addrs[arg >> 1] outside methods)
+TAIL_CALL = 28  # like CALL, but the closure's frame replaces the current one
+AND_JUMP = 29  # if the left operand of && on the stack decides it, replace it with the result and jump to arg
+OR_JUMP = 30  # the same for ||
+COUNT_STATEMENT = 31  # count a statement of type names[arg] as run (only with count_statements)
+
+OPCODE_NAMES = {
+    value: name
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+BIN_OPS = {"+", "-", "*", "/", "==", "!=", ">", ">=", "<", "<=", "||", "&&"}
+LOGICAL_JUMPS = {"&&": AND_JUMP, "||": OR_JUMP}
+LITERAL_DEFS = {InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF}
+
+# flag of EVAL_AST and the opcodes that deal with this: use the
+# frame's calling object
+WITH_CALLING_OBJ = 1
+
+
+class CodeObject:
+    def __init__(self, name):
+        self.name = name
+        self.code = array("i")
+        self.consts = []
+        self.names = []
+        self.addrs = []
+        self.__const_index = {}
+        self.__name_index = {}
+        self.__addr_index = {}
+
+    def emit(self, opcode, arg=0):
+        self.code.append(opcode)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def patch(self, pos, arg):
+        self.code[pos + 1] = arg
+
+    def here(self):
+        return len(self.code)
+
+    # AST nodes, call descriptors and literal Values are keyed by id; equal
+    # literals share one interned Value (see internv4.py) and so one entry
+    def add_const(self, const):
+        key = id(const)
+        if key not in self.__const_index:
+            self.__const_index[key] = len(self.consts)
+            self.consts.append(const)
+        return self.__const_index[key]
+
+    def add_name(self, name):
+        if name not in self.__name_index:
+            self.__name_index[name] = len(self.names)
+            self.names.append(name)
+        return self.__name_index[name]
+
+    # (name, depth) pairs computed by the resolver
+    def add_addr(self, name, depth):
+        if (name, depth) not in self.__addr_index:
+            self.__addr_index[(name, depth)] = len(self.addrs)
+            self.addrs.append((name, depth))
+        return self.__addr_index[(name, depth)]
+
+
+class CallSite:
+    def __init__(self, func_name, num_args):
+        self.func_name = func_name
+        self.num_args = num_args
+
+    def __str__(self):
+        return f"{self.func_name}/{self.num_args}"
+
+
+# Lowers a statement list (a function/lambda body) into a CodeObject. Only
+# the top level of a body sees the calling object: nested if/while blocks,
+# call arguments and unary operands are evaluated without one, matching the
+# tree walker. With tail_calls, `return f(...)` compiles to TAIL_CALL. With
+# count_statements, each statement starts with a COUNT_STATEMENT.
+class Compiler:
+    def __init__(self, tail_calls=True, count_statements=False):
+        self.tail_calls = tail_calls
+        self.count_statements = count_statements
+
+    def compile_body(self, statements, name="<block>"):
+        self.co = CodeObject(name)
+        self.__block(statements, True)
+        self.co.emit(END)
+        return self.co
+
+    def __block(self, statements, with_obj):
+        self.co.emit(PUSH_SCOPE)
+        for statement in statements:
+            self.__statement(statement, with_obj)
+        self.co.emit(POP_SCOPE)
+
+    def __statement(self, statement, with_obj):
+        kind = statement.elem_type
+        if self.count_statements:
+            self.co.emit(COUNT_STATEMENT, self.co.add_name(kind))
+        if kind == InterpreterBase.FCALL_DEF:
+            self.__expr(statement, with_obj)
+            self.co.emit(POP)
+        elif kind == "=":
+            self.__assign(statement, with_obj)
+        elif kind == InterpreterBase.RETURN_DEF:
+            expr_ast = statement.get("expression")
+            if expr_ast is None:
+                self.co.emit(RETURN_NIL)
+            elif self.tail_calls and self.__is_call(expr_ast):
+                self.__call(expr_ast, TAIL_CALL)
+            else:
+                self.__expr(expr_ast, with_obj)
+                self.co.emit(RETURN)
+        elif kind == InterpreterBase.IF_DEF:
+            self.__if(statement, with_obj)
+        elif kind == InterpreterBase.WHILE_DEF:
+            self.__while(statement, with_obj)
+        elif kind == InterpreterBase.MCALL_DEF:
+            self.__method_call(statement, with_obj)
+            self.co.emit(POP)
+        # any other expression statement is never evaluated
+
+    def __assign(self, assign_ast, with_obj):
+        var_name = assign_ast.get("name")
+        expr_ast = assign_ast.get("expression")
+        flag = WITH_CALLING_OBJ if with_obj else 0
+        depth = assign_ast.get("depth")
+        if "." in var_name:
+            # the object is looked up before the value is evaluated
+            self.co.emit(LOAD_FIELD_OWNER, (self.co.add_const(var_name) << 1) | flag)
+            self.__expr(expr_ast, with_obj)
+            self.co.emit(STORE_FIELD, self.co.add_name(var_name.split(".")[1]))
+            return
+        self.__expr(expr_ast, with_obj)
+        if var_name == "this":
+            self.co.emit(STORE_THIS, (self.co.add_addr(var_name, depth) << 1) | flag)
+        elif depth is None:
+            self.co.emit(STORE_NAME, self.co.add_name(var_name))
+        else:
+            self.co.emit(STORE_FAST, self.co.add_addr(var_name, depth))
+
+    def __if(self, if_ast, with_obj):
+        self.__expr(if_ast.get("condition"), with_obj)
+        jump_else = self.co.emit(IF_FALSE)
+        self.__block(if_ast.get("statements"), False)
+        else_statements = if_ast.get("else_statements")
+        if else_statements is None:
+            self.co.patch(jump_else, self.co.here())
+            return
+        jump_end = self.co.emit(JUMP)
+        self.co.patch(jump_else, self.co.here())
+        self.__block(else_statements, False)
+        self.co.patch(jump_end, self.co.here())
+
+    def __while(self, while_ast, with_obj):
+        top = self.co.here()
+        self.__expr(while_ast.get("condition"), with_obj)
+        jump_exit = self.co.emit(WHILE_FALSE)
+        self.__block(while_ast.get("statements"), False)
+        self.co.emit(JUMP, top)
+        self.co.patch(jump_exit, self.co.here())
+
+    def __expr(self, expr_ast, with_obj):
+        kind = expr_ast.elem_type
+        if kind == InterpreterBase.NIL_DEF:
+            self.co.emit(LOAD_NIL)
+        elif kind in LITERAL_DEFS:
+            self.co.emit(LOAD_VALUE, self.co.add_const(expr_ast.get("const")))
+        elif kind == InterpreterBase.VAR_DEF and "." not in expr_ast.get("name"):
+            depth = expr_ast.get("depth")
+            if depth is None:
+                self.co.emit(LOAD_NAME, self.co.add_name(expr_ast.get("name")))
+            else:
+                self.co.emit(LOAD_FAST, self.co.add_addr(expr_ast.get("name"), depth))
+        elif kind in BIN_OPS:
+            self.__expr(expr_ast.get("op1"), with_obj)
+            jump_end = None
+            if kind in LOGICAL_JUMPS:
+                jump_end = self.co.emit(LOGICAL_JUMPS[kind])
+            self.__expr(expr_ast.get("op2"), with_obj)
+            self.co.emit(BIN_OP, self.co.add_name(kind))
+            if jump_end is not None:
+                self.co.patch(jump_end, self.co.here())
+        elif kind == InterpreterBase.NEG_DEF:
+            self.__expr(expr_ast.get("op1"), False)
+            self.co.emit(NEG)
+        elif kind == InterpreterBase.NOT_DEF:
+            self.__expr(expr_ast.get("op1"), False)
+            self.co.emit(NOT)
+        elif kind == InterpreterBase.FCALL_DEF and expr_ast.get("name") == "print":
+            for arg in expr_ast.get("args"):
+                self.__expr(arg, with_obj)
+                self.co.emit(PRINTABLE)
+            self.co.emit(PRINT, len(expr_ast.get("args")))
+        elif self.__is_call(expr_ast):
+            self.__call(expr_ast, CALL)
+        elif kind == InterpreterBase.MCALL_DEF:
+            # only method call statements see the calling object, see
+            # Interpreter.__walk_expr
+            self.__method_call(expr_ast, False)
+        else:
+            self.__fallback(expr_ast, with_obj)
+
+    # a call of a Brewin function or lambda rather than print or inputi
+    @staticmethod
+    def __is_call(expr_ast):
+        return expr_ast.elem_type == InterpreterBase.FCALL_DEF and expr_ast.get(
+            "name"
+        ) not in ("print", "inputi")
+
+    def __call(self, call_ast, opcode):
+        actual_args = call_ast.get("args")
+        site = CallSite(call_ast.get("name"), len(actual_args))
+        site_index = self.co.add_const(site)
+        self.co.emit(RESOLVE, site_index)
+        for arg in actual_args:
+            self.__expr(arg, False)
+        self.co.emit(opcode, site_index)
+
+    def __method_call(self, mcall_ast, with_obj):
+        actual_args = mcall_ast.get("args")
+        flag = WITH_CALLING_OBJ if with_obj else 0
+        self.co.emit(RESOLVE_METHOD, (self.co.add_const(mcall_ast) << 1) | flag)
+        for arg in actual_args:
+            self.__expr(arg, False)
+        site = CallSite(mcall_ast.get("name"), len(actual_args))
+        self.co.emit(CALL_METHOD, self.co.add_const(site))
+
+    # an expression the compiler has no opcodes for, evaluated by the tree walker
+    def __fallback(self, expr_ast, with_obj):
+        flag = WITH_CALLING_OBJ if with_obj else 0
+        self.co.emit(EVAL_AST, (self.co.add_const(expr_ast) << 1) | flag)
+
+
+def disassemble(co):
+    lines = [f"code object {co.name}:"]
+    code = co.code
+    for pc in range(0, len(code), 2):
+        opcode, arg = code[pc], code[pc + 1]
+        name = OPCODE_NAMES[opcode]
+        detail = ""
+        with_obj = " +this" if arg & WITH_CALLING_OBJ else ""
+        if opcode in (LOAD_NAME, STORE_NAME, BIN_OP, STORE_FIELD, COUNT_STATEMENT):
+            detail = f"({co.names[arg]})"
+        elif opcode in (LOAD_FAST, STORE_FAST):
+            detail = f"({co.addrs[arg][0]} @{co.addrs[arg][1]})"
+        elif opcode == STORE_THIS:
+            detail = f"(@{co.addrs[arg >> 1][1]}{with_obj})"
+        elif opcode == LOAD_VALUE:
+            detail = f"({co.consts[arg].type()} {co.consts[arg].value()!r})"
+        elif opcode in (RESOLVE, CALL, CALL_METHOD, TAIL_CALL):
+            detail = f"({co.consts[arg]})"
+        elif opcode == RESOLVE_METHOD:
+            mcall_ast = co.consts[arg >> 1]
+            detail = f"({mcall_ast.get('objref')}.{mcall_ast.get('name')}{with_obj})"
+        elif opcode == LOAD_FIELD_OWNER:
+            detail = f"({co.consts[arg >> 1]}{with_obj})"
+        elif opcode in (IF_FALSE, WHILE_FALSE, JUMP, AND_JUMP, OR_JUMP):
+            detail = f"(to {arg})"
+        elif opcode == EVAL_AST:
+            detail = f"({co.consts[arg >> 1].elem_type}{with_obj})"
+        elif opcode in (PRINT,):
+            detail = f"({arg} args)"
+        lines.append(f"{pc:>6} {name:<16} {arg:>4} {detail}".rstrip())
+    return "\n".join(lines)
+
+
+def compile_functions(ast):
+    compiler = Compiler()
+    return [
+        compiler.compile_body(func_def.get("statements"), func_def.get("name"))
+        for func_def in ast.get("functions")
+    ]
+
+
+class Frame:
+    __slots__ = ("co", "pc", "calling_obj", "env_depth", "tail_called", "memo_key")
+
+    def __init__(self, co, calling_obj, env_depth):
+        self.co = co
+        self.pc = 0
+        self.calling_obj = calling_obj
+        self.env_depth = env_depth
+        # the frame returns whatever its tail call returns, even by falling off the end
+        self.tail_called = False
+        # the call of a pure function whose result goes in the memo, see memov4.py
+        self.memo_key = None
+
+
+# Runs code objects for an Interpreter. The interpreter hands over the bound
+# helpers the VM shares with the tree walker so both engines raise the same
+# errors.
+class VirtualMachine:
+    def __init__(
+        self,
+        interpreter,
+        get_func_by_name,
+        prepare_env_with_closed_variables,
+        assign_value,
+        assign_this,
+        get_field_owner,
+        set_field,
+        get_method,
+        apply_bin_op,
+        short_circuit,
+        apply_unary,
+        walk_expr,
+        max_depth=None,
+        tail_calls=True,
+        profiler=None,
+        counters=None,
+        memo=None,
+    ):
+        self.interpreter = interpreter
+        self.get_func_by_name = get_func_by_name
+        self.prepare_env_with_closed_variables = prepare_env_with_closed_variables
+        self.assign_value = assign_value
+        self.assign_this = assign_this
+        self.get_field_owner = get_field_owner
+        self.set_field = set_field
+        self.get_method = get_method
+        self.apply_bin_op = apply_bin_op
+        self.short_circuit = short_circuit
+        self.apply_unary = apply_unary
+        self.walk_expr = walk_expr
+        # see statsv4.py; statements are only counted if there are counters
+        self.counters = counters
+        # calls of the pure functions in it are answered from it if made before
+        self.memo = memo
+        self.compiler = Compiler(tail_calls, count_statements=counters is not None)
+        self.code_objects = {}
+        # Brewin frames live in the frames lists of __run, not on the Python
+        # stack, so only this cap (and memory) limits the depth of recursion
+        self.max_depth = max_depth
+        self.depth = 0
+        # told about the calls made here; the tree walker tells it about the
+        # call whose body a run_block runs
+        self.profiler = profiler
+
+    def get_code(self, statements, name="<block>"):
+        co = self.code_objects.get(id(statements))
+        if co is None:
+            co = self.compiler.compile_body(statements, name)
+            self.code_objects[id(statements)] = co
+        return co
+
+    # entry point from the tree walker; returns (returned, value) for the block
+    def run_block(self, statements, calling_obj=None):
+        env = self.interpreter.env
+        self.__enter()
+        frames = [Frame(self.get_code(statements), calling_obj, len(env.environment))]
+        return self.__run(frames)
+
+    def __enter(self):
+        if self.max_depth is not None and self.depth >= self.max_depth:
+            self.__error(ErrorType.FAULT_ERROR, f"Maximum call depth of {self.max_depth} exceeded")
+        self.depth += 1
+
+    def __error(self, error_type, description):
+        self.interpreter.error(error_type, description)
+
+    # mirrors Interpreter.__eval_name once the variable lookup has failed
+    def __load_function(self, name):
+        closure = self.get_func_by_name(name, None)
+        if closure is None:
+            self.__error(ErrorType.NAME_ERROR, f"Variable/function {name} not found")
+        return self.interpreter.values.new(Type.CLOSURE, closure)
+
+    def __condition(self, value, description):
+        if value.type() == Type.INT:
+            return value.value() != 0
+        if value.type() != Type.BOOL:
+            self.__error(ErrorType.TYPE_ERROR, f"Incompatible type for {description} condition")
+        return value.value()
+
+    def __run(self, frames):
+        interpreter = self.interpreter
+        env = interpreter.env
+        stack = []
+        # values on the stack are only held here, see Interpreter.__create_obj
+        interpreter.call_roots.append(stack)
+        frame = frames[-1]
+        co = frame.co
+        code = co.code
+        pc = 0
+        nil = interpreter.NIL_VALUE
+        bin_op_table = interpreter.bin_op_table
+        copy_value = interpreter.copy_value
+        profiler = self.profiler
+        memo = self.memo
+        while True:
+            opcode = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+            if opcode == LOAD_FAST:
+                name, depth = co.addrs[arg]
+                val = env.environment[-1 - depth].get(name)
+                if val is None:
+                    val = self.__load_function(name)
+                stack.append(val)
+            elif opcode == LOAD_NAME:
+                name = co.names[arg]
+                val = env.get(name)
+                if val is None:
+                    val = self.__load_function(name)
+                stack.append(val)
+            elif opcode == LOAD_VALUE:
+                stack.append(co.consts[arg])
+            elif opcode == BIN_OP:
+                right = stack.pop()
+                left = stack[-1]
+                # Interpreter.__apply_bin_op with the table lookup inlined
+                f = bin_op_table.get((co.names[arg], left.t, right.t))
+                if f is not None:
+                    stack[-1] = f(left, right)
+                else:
+                    stack[-1] = self.apply_bin_op(co.names[arg], left, right)
+            elif opcode == STORE_FAST:
+                name, depth = co.addrs[arg]
+                self.assign_value(name, copy.copy(stack.pop()), depth)
+            elif opcode == STORE_NAME:
+                self.assign_value(co.names[arg], copy.copy(stack.pop()))
+            elif opcode == IF_FALSE:
+                if not self.__condition(stack.pop(), "if"):
+                    pc = arg
+            elif opcode == WHILE_FALSE:
+                if not self.__condition(stack.pop(), "while"):
+                    pc = arg
+            elif opcode == JUMP:
+                pc = arg
+            elif opcode == PUSH_SCOPE:
+                env.push()
+            elif opcode == POP_SCOPE:
+                env.pop()
+            elif opcode == LOAD_NIL:
+                stack.append(nil)
+            elif opcode == POP:
+                stack.pop()
+            elif opcode == RESOLVE:
+                site = co.consts[arg]
+                target_closure = self.get_func_by_name(site.func_name, site.num_args)
+                if target_closure == None:
+                    self.__error(ErrorType.NAME_ERROR, f"Function {site.func_name} not found")
+                if target_closure.type != Type.CLOSURE:
+                    self.__error(
+                        ErrorType.TYPE_ERROR,
+                        f"Function {site.func_name} is changed to non-function type.",
+                    )
+                stack.append(target_closure)
+            elif opcode == CALL or opcode == CALL_METHOD:
+                site = co.consts[arg]
+                base = len(stack) - site.num_args
+                actuals = stack[base:]
+                del stack[base:]
+                target_closure = stack.pop()
+                receiver = stack.pop() if opcode == CALL_METHOD else None
+                key = None
+                if memo is not None and id(target_closure.func_ast) in memo.pure_functions:
+                    key = memo_key(target_closure.func_ast, actuals)
+                    result = None if key is None else memo.get(key)
+                    if result is not None:
+                        stack.append(result)
+                        continue
+                new_env = self.__bind_args(target_closure, site, actuals)
+                self.__enter()
+                if profiler is not None:
+                    name = site.func_name if opcode == CALL else "." + site.func_name
+                    profiler.enter(target_closure.func_ast, name)
+                frame.pc = pc
+                frame = Frame(
+                    self.get_code(target_closure.func_ast.statements),
+                    receiver,
+                    len(env.environment),
+                )
+                frame.memo_key = key
+                frames.append(frame)
+                env.push(new_env)
+                co = frame.co
+                code = co.code
+                pc = 0
+            elif opcode == TAIL_CALL:
+                site = co.consts[arg]
+                base = len(stack) - site.num_args
+                actuals = stack[base:]
+                del stack[base:]
+                target_closure = stack.pop()
+                new_env = self.__bind_args(target_closure, site, actuals)
+                if profiler is not None:
+                    profiler.tail_call(target_closure.func_ast, site.func_name)
+                # the frame's scopes are folded under the callee's params, so the
+                # callee sees what it would from a nested frame (see
+                # Interpreter.__tail_call); the depth stays the same
+                merged = {}
+                for scope in env.environment[frame.env_depth:]:
+                    merged.update(scope)
+                merged.update(new_env)
+                env.pop_to(frame.env_depth)
+                env.push(merged)
+                frame.co = self.get_code(target_closure.func_ast.statements)
+                frame.calling_obj = None
+                frame.tail_called = True
+                co = frame.co
+                code = co.code
+                pc = 0
+            elif opcode in (RETURN, RETURN_NIL, END):
+                if opcode == RETURN:
+                    return_val = copy_value(stack.pop())
+                else:
+                    return_val = nil
+                if frame.memo_key is not None:
+                    memo.put(frame.memo_key, return_val)
+                env.pop_to(frame.env_depth)
+                frames.pop()
+                self.depth -= 1
+                if not frames:
+                    interpreter.call_roots.pop()
+                    return (opcode != END or frame.tail_called, return_val)
+                if profiler is not None:
+                    profiler.exit()
+                frame = frames[-1]
+                co = frame.co
+                code = co.code
+                pc = frame.pc
+                stack.append(return_val)
+            elif opcode == AND_JUMP or opcode == OR_JUMP:
+                operation = "&&" if opcode == AND_JUMP else "||"
+                result = self.short_circuit(operation, stack[-1])
+                if result is not None:
+                    stack[-1] = result
+                    pc = arg
+            elif opcode == NEG:
+                stack[-1] = self.apply_unary(InterpreterBase.NEG_DEF, Type.INT, lambda x: -1 * x, stack[-1])
+            elif opcode == NOT:
+                stack[-1] = self.apply_unary(InterpreterBase.NOT_DEF, Type.BOOL, lambda x: not x, stack[-1])
+            elif opcode == PRINTABLE:
+                printable = get_printable(stack[-1])
+                if printable is None:
+                    self.__error(ErrorType.NAME_ERROR, "Value to print does not exist")
+                stack[-1] = printable
+            elif opcode == PRINT:
+                base = len(stack) - arg
+                output = "".join(stack[base:])
+                del stack[base:]
+                interpreter.output(output)
+                stack.append(nil)
+            elif opcode == RESOLVE_METHOD:
+                calling_obj = frame.calling_obj if arg & WITH_CALLING_OBJ else None
+                receiver, target_closure = self.get_method(co.consts[arg >> 1], calling_obj)
+                stack.append(receiver)
+                stack.append(target_closure)
+            elif opcode == LOAD_FIELD_OWNER:
+                calling_obj = frame.calling_obj if arg & WITH_CALLING_OBJ else None
+                stack.append(self.get_field_owner(co.consts[arg >> 1], calling_obj))
+            elif opcode == STORE_FIELD:
+                val = stack.pop()
+                self.set_field(stack.pop(), co.names[arg], val)
+            elif opcode == STORE_THIS:
+                calling_obj = frame.calling_obj if arg & WITH_CALLING_OBJ else None
+                _, depth = co.addrs[arg >> 1]
+                self.assign_this(copy.copy(stack.pop()), depth, calling_obj)
+            elif opcode == EVAL_AST:
+                calling_obj = frame.calling_obj if arg & WITH_CALLING_OBJ else None
+                stack.append(self.walk_expr(co.consts[arg >> 1], calling_obj=calling_obj))
+            elif opcode == COUNT_STATEMENT:
+                self.counters.count_statement(co.names[arg])
+            else:
+                raise RuntimeError(f"Unknown opcode {opcode}")
+
+    # mirrors Interpreter.__prepare_params for already-evaluated actual args
+    def __bind_args(self, target_closure, site, actuals):
+        interpreter = self.interpreter
+        target_ast = target_closure.func_ast
+        new_env = {}
+        self.prepare_env_with_closed_variables(target_closure, new_env)
+        formal_args = target_ast.args
+        if site.num_args != len(formal_args):
+            self.__error(
+                ErrorType.NAME_ERROR,
+                f"Function {target_ast.get('name')} with {site.num_args} args not found",
+            )
+        for formal_ast, result in zip(formal_args, actuals):
+            if formal_ast.elem_type != InterpreterBase.REFARG_DEF:
+                result = interpreter.copy_value(result)
+            else:
+                result = interpreter.unshared(result)
+            new_env[formal_ast.name] = result
+        return new_env
+
+
+if __name__ == "__main__":
+    # usage: python bytecodev4.py program.br [func_name ...]
+    import sys
+
+    from brewparse import parse_program
+
+    with open(sys.argv[1], encoding="utf-8") as handle:
+        program_ast = bind_literals(parse_program(handle.read()), ValuePool())
+    for code_object in compile_functions(program_ast):
+        if len(sys.argv) > 2 and code_object.name not in sys.argv[2:]:
+            continue
+        print(disassemble(code_object))
@@ -0,0 +1,161 @@
+# Copy-on-write copies for Brewin's pass-by-value semantics.
+#
+# Arguments passed by value and returned values used to go through copy.deepcopy
+# unconditionally. Most of them are ints, strings, bools or nil, whose payload is
+# an immutable Python object: the only mutable part is the Value wrapper itself
+# (Value.set, used by assignment), so a new wrapper around the same payload is an
+# exact copy. The payload is shared and only the side that is assigned to gets a
+# different Value. The wrapper is built directly, not with copy.copy, which
+# would go through copyreg and copy._reconstruct for every argument.
+#
+# Objects and closures are copied lazily, one level at a time. A copy starts
+# out sharing what the original holds: an object copy is a new object on the
+# heap with the original's shape, slots list and proto Value, and a closure
+# copy is a new Closure with the original's captured environment. Until it is
+# completed, a copy is pending (listed in CopyOnWrite.pending). Completing it
+# gives it a slots list, proto or captured environment of its own, holding
+# new Values around the primitives it shared and pending copies of the
+# objects and closures. So copying is O(1), and a copy costs only as much as
+# the program goes on to use of it. A by-value argument that is only read
+# copies the objects it reads through, not the whole graph it reaches.
+#
+# The interpreter completes a pending copy before anything is read out of it:
+# a field, a method, its proto (Interpreter.__get_obj_ref,
+# __find_proto_holder), or a closure copy's captured variables
+# (__prepare_env_with_closed_variables). What a copy hands out is then always
+# the copy's own. Before anything is written (a field or proto, or a Value
+# overwritten in place by assignment, see Interpreter.__set_field and
+# __set_value), it completes every pending copy (settle()). This is the
+# conservative part. What a pending copy shares can also be reached, and
+# changed, through references that aren't copies: the original object, or a
+# variable aliasing one of its Values. So nothing may change while any copy
+# still shares it. A copy dropped before then is never completed. settle()
+# also runs before the heap is collected, which may empty objects a pending
+# copy would still copy, and before a lambda is created, since Closure()
+# deep-copies what it captures.
+#
+# Within one copy (a by-value argument or return), an object, closure or Value
+# reached twice is copied once, as copy.deepcopy's memo did, so aliasing
+# inside the copied graph is kept. The AST reachable from closures is
+# immutable and is shared rather than copied.
+import copy
+import sys
+import weakref
+
+from env_v4 import EnvironmentManager
+from shapesv4 import ShapedObject
+from type_valuev4 import Type, Value
+
+IMMUTABLE_TYPES = {Type.INT, Type.STRING, Type.BOOL, Type.NIL}
+
+
+class CopyOnWrite:
+    def __init__(self, heap, values):
+        self.heap = heap  # object copies are allocated here
+        self.values = values  # the ValuePool copied Values are made by
+        # id(copy) -> (weak reference to the copy, the _Copy it belongs to), for
+        # the pending copies; a copy that is dropped leaves on its own
+        self.pending = {}
+
+    # a copy of value, for a by-value argument or a return
+    def copy_value(self, value):
+        if value is None:
+            return None
+        if value.t in IMMUTABLE_TYPES:
+            return Value(value.t, value.v)
+        return _Copy(self).value(value)
+
+    def _track(self, copied, owner):
+        key = id(copied)
+        ref = weakref.ref(copied, lambda _: self.pending.pop(key, None))
+        self.pending[key] = (ref, owner)
+        return ref
+
+    # gives the pending copy item what it still shares
+    def complete(self, item):
+        owner = self.pending.pop(id(item))[1]
+        if isinstance(item, ShapedObject):
+            shared = item.slots
+            item.slots = [owner.slot(slot) for slot in shared]
+            if item.proto is not None:
+                item.proto = owner.value(item.proto)
+            if item.heap is not None:
+                item.heap.resize(sys.getsizeof(item.slots) - sys.getsizeof(shared))
+        else:
+            captured = EnvironmentManager()
+            captured.environment = [
+                {name: owner.value(value) for name, value in scope.items()}
+                for scope in item.captured_env.environment
+            ]
+            item.captured_env = captured
+
+    # completes every pending copy, and the copies that makes, before anything
+    # they share is written
+    def settle(self):
+        pending = self.pending
+        while pending:
+            for key, (ref, _) in list(pending.items()):
+                item = ref()
+                if item is None:
+                    pending.pop(key, None)
+                elif key in pending:
+                    self.complete(item)
+
+
+# one by-value copy: the copies made for it so far, by id of the original
+class _Copy:
+    __slots__ = ("cow", "memo")
+
+    def __init__(self, cow):
+        self.cow = cow
+        # id(original) -> (original, weak reference to its copy); the original
+        # is held so that its id isn't reused while this copy is completed
+        self.memo = {}
+
+    def __copied(self, original):
+        entry = self.memo.get(id(original))
+        return None if entry is None else entry[1]()
+
+    def value(self, value):
+        copied = self.__copied(value)
+        if copied is None:
+            if value.t == Type.OBJECT:
+                copied = self.cow.values.new(Type.OBJECT, self.object(value.v))
+            elif value.t == Type.CLOSURE:
+                copied = self.cow.values.new(Type.CLOSURE, self.closure(value.v))
+            else:
+                copied = self.cow.values.new(value.t, value.v)
+            self.memo[id(value)] = (value, weakref.ref(copied))
+        return copied
+
+    # an object's slot: a property's Value, or a method table (arity -> Value)
+    def slot(self, slot):
+        if isinstance(slot, dict):
+            return {num_args: self.value(method) for num_args, method in slot.items()}
+        return self.value(slot)
+
+    def object(self, obj):
+        copied = self.__copied(obj)
+        if copied is None:
+            cow = self.cow
+            if id(obj) in cow.pending:
+                # a copy of a pending copy copies what that will hold
+                cow.complete(obj)
+            copied = cow.heap.allocate()
+            size = sys.getsizeof(copied.slots)
+            copied.shape = obj.shape
+            copied.slots = obj.slots
+            copied.proto = obj.proto
+            cow.heap.resize(sys.getsizeof(copied.slots) - size)
+            self.memo[id(obj)] = (obj, cow._track(copied, self))
+        return copied
+
+    def closure(self, closure):
+        copied = self.__copied(closure)
+        if copied is None:
+            cow = self.cow
+            if id(closure) in cow.pending:
+                cow.complete(closure)
+            copied = copy.copy(closure)
+            self.memo[id(closure)] = (closure, cow._track(copied, self))
+        return copied
@@ -1,18 +1,31 @@
+from intbase import InterpreterBase
+
+
+# Base class for AST nodes. Each kind of node is a subclass with __slots__ for
+# exactly the fields it carries, so nodes need no per-instance dict and fields
+# can be read as plain attributes. get()/set() keep the old keyed interface.
 class Element:
-    def __init__(self, elem_type, **kwargs):
-        self.elem_type = elem_type
-        self.dict = {}
-        for key, value in kwargs.items():
-            self.dict[key] = value
+    __slots__ = ("elem_type",)
+    fields = ()
 
     def get(self, key):
-        if key not in self.dict:
-            return None
-        return self.dict[key]
+        return getattr(self, key, None)
+
+    def set(self, key, value):
+        setattr(self, key, value)
+
+    def items(self):
+        for key in self.fields:
+            yield key, getattr(self, key, None)
+
+    # the AST is never modified while a program runs, so copies of closures and
+    # objects can share it
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         s = f"{self.elem_type}: "
-        for key, value in self.dict.items():
+        for key, value in self.items():
             s += key + ": " + self.__val(value) + ", "
         return s[0:-2]
 
@@ -27,3 +40,165 @@ class Element:
                 return "[" + s[0:-2] + "]"
             return "[" + s + "]"
         return str(v)
+
+
+class ProgramNode(Element):
+    __slots__ = ("functions",)
+    fields = __slots__
+
+    def __init__(self, functions):
+        self.elem_type = InterpreterBase.PROGRAM_DEF
+        self.functions = functions
+
+
+class FuncNode(Element):
+    __slots__ = ("name", "args", "statements")
+    fields = __slots__
+
+    def __init__(self, name, args, statements):
+        self.elem_type = InterpreterBase.FUNC_DEF
+        self.name = name
+        self.args = args
+        self.statements = statements
+
+
+# free_vars is filled in when the program is loaded, see freevarsv4.py
+class LambdaNode(Element):
+    __slots__ = ("args", "statements", "free_vars")
+    fields = ("args", "statements")
+
+    def __init__(self, args, statements):
+        self.elem_type = InterpreterBase.LAMBDA_DEF
+        self.args = args
+        self.statements = statements
+        self.free_vars = None
+
+
+# formal parameter, either InterpreterBase.ARG_DEF or InterpreterBase.REFARG_DEF
+class ArgNode(Element):
+    __slots__ = ("name",)
+    fields = __slots__
+
+    def __init__(self, elem_type, name):
+        self.elem_type = elem_type
+        self.name = name
+
+
+# depth is filled in by the resolver, see resolverv4.py; shape_cache holds the
+# (shape, slot, next shape or None) of the last object property written here,
+# see Interpreter.__compile_assign
+class AssignNode(Element):
+    __slots__ = ("name", "expression", "depth", "shape_cache")
+    fields = ("name", "expression", "depth")
+
+    def __init__(self, name, expression):
+        self.elem_type = "="
+        self.name = name
+        self.expression = expression
+        self.depth = None
+        self.shape_cache = None
+
+
+class IfNode(Element):
+    __slots__ = ("condition", "statements", "else_statements")
+    fields = __slots__
+
+    def __init__(self, condition, statements, else_statements):
+        self.elem_type = InterpreterBase.IF_DEF
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements
+
+
+class WhileNode(Element):
+    __slots__ = ("condition", "statements")
+    fields = __slots__
+
+    def __init__(self, condition, statements):
+        self.elem_type = InterpreterBase.WHILE_DEF
+        self.condition = condition
+        self.statements = statements
+
+
+class ReturnNode(Element):
+    __slots__ = ("expression",)
+    fields = __slots__
+
+    def __init__(self, expression):
+        self.elem_type = InterpreterBase.RETURN_DEF
+        self.expression = expression
+
+
+# InterpreterBase.NEG_DEF or InterpreterBase.NOT_DEF
+class UnaryOpNode(Element):
+    __slots__ = ("op1",)
+    fields = __slots__
+
+    def __init__(self, elem_type, op1):
+        self.elem_type = elem_type
+        self.op1 = op1
+
+
+# elem_type is the operator itself, e.g. "+" or "&&"
+class BinaryOpNode(Element):
+    __slots__ = ("op1", "op2")
+    fields = __slots__
+
+    def __init__(self, elem_type, op1, op2):
+        self.elem_type = elem_type
+        self.op1 = op1
+        self.op2 = op2
+
+
+# int, string and bool literals; const is the interned Value bound to the
+# literal when the program is loaded, see internv4.py
+class ValueNode(Element):
+    __slots__ = ("val", "const")
+    fields = ("val",)
+
+    def __init__(self, elem_type, val):
+        self.elem_type = elem_type
+        self.val = val
+        self.const = None
+
+
+# nodes without fields: nil and @
+class EmptyNode(Element):
+    __slots__ = ()
+
+    def __init__(self, elem_type):
+        self.elem_type = elem_type
+
+
+# depth is filled in by the resolver, see resolverv4.py; shape_cache holds the
+# (shape, slot) of the last object property read here, see shapesv4.py
+class VarNode(Element):
+    __slots__ = ("name", "depth", "shape_cache")
+    fields = ("name", "depth")
+
+    def __init__(self, name):
+        self.elem_type = InterpreterBase.VAR_DEF
+        self.name = name
+        self.depth = None
+        self.shape_cache = None
+
+
+class FuncCallNode(Element):
+    __slots__ = ("name", "args")
+    fields = __slots__
+
+    def __init__(self, name, args):
+        self.elem_type = InterpreterBase.FCALL_DEF
+        self.name = name
+        self.args = args
+
+
+class MethodCallNode(Element):
+    __slots__ = ("objref", "name", "args")
+    fields = __slots__
+
+    def __init__(self, objref, name, args):
+        self.elem_type = InterpreterBase.MCALL_DEF
+        self.objref = objref
+        self.name = name
+        self.args = args
@@ -25,6 +25,14 @@ class EnvironmentManager:
         # symbol not found anywhere in the environment
         self.environment[-1][symbol] = value
 
+    # direct access to the scope depth levels below the top-most one, for names whose
+    # scope was computed ahead of time by the resolver
+    def get_at(self, depth, symbol):
+        return self.environment[-1 - depth].get(symbol)
+
+    def set_at(self, depth, symbol, value):
+        self.environment[-1 - depth][symbol] = value
+
     # create a new symbol in the top-most environment, regardless of whether that symbol exists
     # in a lower environment
     def create(self, symbol, value):
@@ -41,6 +49,10 @@ class EnvironmentManager:
     def pop(self):
         self.environment.pop()
 
+    # used when a call returns to discard its frame and any blocks still open in it
+    def pop_to(self, depth):
+        del self.environment[depth:]
+
     def __enumerate(self):
         captured_so_far = set()
         for captured in reversed(self.environment):
@@ -0,0 +1,140 @@
+# Free-variable analysis: annotates each lambda node with the names its closure
+# has to capture ("free_vars"), so that creating a closure snapshots only those
+# variables instead of the whole environment.
+#
+# A lambda uses the names its body reads or assigns that are not its params,
+# including those of lambdas nested in it (they capture from its frame). Brewin
+# is dynamically scoped, though: a function called from the lambda's body sees
+# the lambda's frame, captured variables included, so the names the callee
+# uses the same way (and, transitively, its callees) count as used too. Calls by
+# name to a top-level function have a known callee; calls through a variable
+# and method calls could reach any lambda or any function used as a value, so
+# they count the names of all of those. The sets are computed together as a
+# fixed point, since functions and lambdas can call each other recursively.
+from intbase import InterpreterBase
+
+BUILTINS = {"print", "inputi"}
+
+
+def annotate_program(ast):
+    functions = {}
+    for func_def in ast.get("functions"):
+        functions.setdefault(func_def.get("name"), {})[len(func_def.get("args"))] = func_def
+    analysis = _Analysis(functions)
+    for func_def in ast.get("functions"):
+        analysis.add_body(func_def)
+    analysis.solve()
+    return ast
+
+
+class _Body:
+    def __init__(self, node):
+        self.node = node
+        self.params = {arg.get("name") for arg in node.get("args")}
+        self.names = set()  # read or assigned in the body itself
+        self.nested = []  # lambdas created in the body
+        self.callees = []  # top-level functions called by name
+        self.indirect = False  # calls through a variable, or methods
+        self.uses = set()  # result: names the body needs from its caller
+
+
+class _Analysis:
+    def __init__(self, functions):
+        self.functions = functions
+        self.bodies = {}  # id(node) -> _Body
+        self.lambdas = []
+        self.function_values = set()  # ids of functions read as values
+
+    def add_body(self, node):
+        body = _Body(node)
+        self.bodies[id(node)] = body
+        if node.elem_type == InterpreterBase.LAMBDA_DEF:
+            self.lambdas.append(body)
+        self.__block(body, node.get("statements"))
+        return body
+
+    def solve(self):
+        indirect_targets = self.lambdas + [
+            self.bodies[key] for key in self.function_values
+        ]
+        changed = True
+        while changed:
+            changed = False
+            indirect_uses = set()
+            for target in indirect_targets:
+                indirect_uses |= target.uses
+            for body in self.bodies.values():
+                uses = set(body.names)
+                for nested in body.nested:
+                    uses |= nested.uses
+                for callee in body.callees:
+                    uses |= self.bodies[id(callee)].uses
+                if body.indirect:
+                    uses |= indirect_uses
+                uses -= body.params
+                if uses != body.uses:
+                    body.uses = uses
+                    changed = True
+        for body in self.lambdas:
+            body.node.free_vars = frozenset(body.uses)
+
+    def __block(self, body, statements):
+        for statement in statements:
+            self.__statement(body, statement)
+
+    def __statement(self, body, statement):
+        kind = statement.elem_type
+        if kind == "=":
+            body.names.add(statement.get("name").split(".")[0])
+            self.__expr(body, statement.get("expression"))
+        elif kind == InterpreterBase.IF_DEF:
+            self.__expr(body, statement.get("condition"))
+            self.__block(body, statement.get("statements"))
+            if statement.get("else_statements") is not None:
+                self.__block(body, statement.get("else_statements"))
+        elif kind == InterpreterBase.WHILE_DEF:
+            self.__expr(body, statement.get("condition"))
+            self.__block(body, statement.get("statements"))
+        elif kind == InterpreterBase.RETURN_DEF:
+            if statement.get("expression") is not None:
+                self.__expr(body, statement.get("expression"))
+        else:
+            self.__expr(body, statement)
+
+    def __expr(self, body, expr_ast):
+        kind = expr_ast.elem_type
+        if kind == InterpreterBase.VAR_DEF:
+            var_name = expr_ast.get("name").split(".")[0]
+            body.names.add(var_name)
+            # a function read as a value can be called through a variable
+            for func_def in self.functions.get(var_name, {}).values():
+                self.function_values.add(id(func_def))
+        elif kind == InterpreterBase.LAMBDA_DEF:
+            body.nested.append(self.add_body(expr_ast))
+        elif kind == InterpreterBase.FCALL_DEF:
+            self.__call(body, expr_ast)
+            for arg in expr_ast.get("args"):
+                self.__expr(body, arg)
+        elif kind == InterpreterBase.MCALL_DEF:
+            body.names.add(expr_ast.get("objref"))
+            body.indirect = True
+            for arg in expr_ast.get("args"):
+                self.__expr(body, arg)
+        else:
+            for operand in ("op1", "op2"):
+                if expr_ast.get(operand) is not None:
+                    self.__expr(body, expr_ast.get(operand))
+
+    def __call(self, body, call_ast):
+        func_name = call_ast.get("name")
+        if func_name in BUILTINS:
+            return
+        candidates = self.functions.get(func_name)
+        if candidates is None:
+            # a closure held in a variable
+            body.names.add(func_name)
+            body.indirect = True
+            return
+        func_def = candidates.get(len(call_ast.get("args")))
+        if func_def is not None:
+            body.callees.append(func_def)
@@ -5,6 +5,8 @@ test management.
 
 import asyncio
 import json
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from os import makedirs
 from os.path import exists
 from abc import ABC, abstractmethod
@@ -48,27 +50,152 @@ async def run_test_wrapper(interpreter, test_case, timeout):
         return 0
 
 
-async def run_all_tests(interpreter, tests, timeout_per_test=5):
+async def run_all_tests(interpreter, tests, timeout_per_test=5, workers=None):
     """
     Run all tests sequentially; defaults to 5s timeout per test.
     Each test case *must* have a name and srcfile key.
+    With workers=N the tests are instead sharded across N worker processes (see
+    run_tests_in_processes); the results are the same, in the same order.
     """
     print(f"Running {len(tests)} tests...")
+    if workers is None:
+        scores = [
+            await run_test_wrapper(interpreter, test, timeout_per_test)
+            for test in tests
+        ]
+    else:
+        scores = await run_tests_in_processes(
+            interpreter, tests, timeout_per_test, workers
+        )
     results = [
         {
             "name": test["name"],
-            "score": await run_test_wrapper(interpreter, test, timeout_per_test),
+            "score": score,
             "max_score": 1,
             "visibility": "visible"
             if test.get("visible", False)
             else "after_published",
         }
-        for test in tests
+        for test, score in zip(tests, scores)
     ]
     print(f"{get_score(results)}/{len(tests)} tests passed.")
     return results
 
 
+# sent by a worker once it has started, see TestWorker
+WORKER_READY = "ready"
+
+
+def test_worker(scaffold, connection):
+    """Worker process loop: run each test case received, send back its score."""
+    connection.send(WORKER_READY)
+    while True:
+        test_case = connection.recv()
+        if test_case is None:
+            return
+        connection.send(run_test(scaffold, test_case))
+
+
+class TestWorker:
+    """
+    A worker process and the pipe used to hand it test cases. Blocks until the
+    worker has started (unpickled the scaffold, importing the interpreter), so
+    that its startup isn't counted against the timeout of the first test it runs.
+    """
+
+    def __init__(self, context, scaffold):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=test_worker, args=(scaffold, child_connection), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        try:
+            self.ready = self.connection.recv() == WORKER_READY
+        except EOFError:
+            self.ready = False
+
+    def run(self, test_case, timeout):
+        """
+        Run a test case in the worker; returns (score, status). Blocks, so it is
+        called from a thread. status is None, "TIMED OUT" or "CRASHED"; in the
+        last two cases the worker is dead and must be replaced.
+        """
+        if not self.ready:
+            self.stop()
+            return 0, "CRASHED"
+        self.connection.send(test_case)
+        if not self.connection.poll(timeout):
+            self.stop()
+            return 0, "TIMED OUT"
+        try:
+            return self.connection.recv(), None
+        except EOFError:
+            self.stop()
+            return 0, "CRASHED"
+
+    def stop(self):
+        """Kill the worker process; used for timeouts and at shutdown."""
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+    def close(self):
+        """Ask the worker to exit once it is idle."""
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+async def run_tests_in_processes(scaffold, tests, timeout, workers):
+    """
+    Run tests across a pool of worker processes and return their scores in test
+    order. Each result is printed as soon as it is in. A test that exceeds the
+    timeout has its worker killed (so it stops using CPU) and replaced.
+    The scaffold is pickled into every worker, and workers are started with
+    "spawn", which behaves the same on every platform.
+    """
+    context = multiprocessing.get_context("spawn")
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue()
+    for index, test in enumerate(tests):
+        pending.put_nowait((index, test))
+    scores = [0] * len(tests)
+
+    async def shard(executor):
+        worker = None
+        try:
+            while not pending.empty():
+                index, test = pending.get_nowait()
+                if worker is None:
+                    worker = await loop.run_in_executor(
+                        executor, TestWorker, context, scaffold
+                    )
+                score, status = await loop.run_in_executor(
+                    executor, worker.run, test, timeout
+                )
+                if status is not None:
+                    worker = None
+                else:
+                    status = "PASSED" if score else "FAILED"
+                scores[index] = score
+                print(f'{test["srcfile"]}... {status}')
+        finally:
+            if worker is not None:
+                worker.close()
+
+    workers = max(1, min(workers, len(tests)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        await asyncio.gather(*(shard(executor) for _ in range(workers)))
+    return scores
+
+
 def format_gradescope_output(results):
     """Generate proper JSON object depending on results type."""
     if isinstance(results, (int, float)):
@@ -0,0 +1,177 @@
+# Object heap for Brewin objects.
+#
+# Every object a program creates (with @, or by copying one for a by-value
+# argument or return) is allocated by the interpreter's ObjectHeap. The
+# ShapedObject it returns is the object's handle: Value(Type.OBJECT, handle) is
+# what variables, properties and protos hold, and obj.x, obj.m() and this are
+# resolved through that value rather than by variable name.
+#
+# Python's reference counting frees an object as soon as nothing refers to it.
+# Each object keeps a pointer back to its heap and reports its own release
+# (ShapedObject.__del__), so the heap keeps exact counts of live objects and of
+# the bytes their layouts use (the object and its slots list; the shape is
+# shared and property values are counted where they are allocated) along with
+# the peaks of both.
+#
+# Garbage that refers to itself (an object stored in its own property, a
+# closure whose captured environment holds the closure or an object with it as
+# a method) is never freed that way, so the heap also has a mark-and-sweep
+# collector. collect() marks everything reachable from the roots it is given
+# (environments, and the frames and operand stacks of calls in progress) through
+# Values, object slots and protos, method tables and captured environments, and
+# sweeps the objects and lambda closures it did not reach by emptying them,
+# which breaks their cycles. The interpreter runs it when collection_due() says
+# so at the points where it creates an object, since everything the program can
+# still reach is rooted there. With a limit set, the collector also runs each
+# time half of the room left by the previous collection has been used, and
+# allocating past the limit calls on_exhausted.
+import time
+import weakref
+
+from env_v4 import EnvironmentManager
+from shapesv4 import Shape, ShapedObject, object_size
+from type_valuev4 import Closure, Value
+
+# collect after this many allocations, or after as many as there were objects
+# left by the previous collection if that is more, so that marking stays
+# proportional to allocation
+COLLECTION_INTERVAL = 10000
+
+
+class ObjectHeap:
+    def __init__(self, limit=None, on_exhausted=None, interval=COLLECTION_INTERVAL):
+        self.limit = limit  # max live_bytes, or None
+        self.on_exhausted = on_exhausted
+        self.interval = interval
+        self.root_shape = Shape({}, {})  # the shape of new objects
+        self.objects = weakref.WeakSet()
+        self.closures = {}  # id(closure) -> weak reference to it
+        self.live_objects = 0
+        self.live_bytes = 0
+        self.peak_objects = 0
+        self.peak_bytes = 0
+        self.allocated = 0
+        self.released = 0
+        self.new_object_bytes = object_size(ShapedObject())
+        # collector
+        self.next_collection = interval
+        self.next_collection_bytes = None if limit is None else limit // 2
+        self.collections = 0
+        self.pause_total = 0.0
+        self.pause_max = 0.0
+        self.reclaimed_objects = 0
+        self.reclaimed_bytes = 0
+        self.reclaimed_closures = 0
+
+    def allocate(self):
+        if self.limit is not None and self.live_bytes + self.new_object_bytes > self.limit:
+            self.__exhausted()
+        obj = ShapedObject(self)
+        self.objects.add(obj)
+        self.allocated += 1
+        self.live_objects += 1
+        if self.live_objects > self.peak_objects:
+            self.peak_objects = self.live_objects
+        self.resize(object_size(obj))
+        return obj
+
+    # lambda closures are swept like objects once unreachable
+    def track_closure(self, closure):
+        key = id(closure)
+        self.closures[key] = weakref.ref(closure, lambda _: self.closures.pop(key, None))
+
+    # an object's layout grew or shrank by nbytes
+    def resize(self, nbytes):
+        self.live_bytes += nbytes
+        if self.live_bytes > self.peak_bytes:
+            self.peak_bytes = self.live_bytes
+        if nbytes > 0 and self.limit is not None and self.live_bytes > self.limit:
+            self.__exhausted()
+
+    def __exhausted(self):
+        if self.on_exhausted is None:
+            raise MemoryError(f"heap limit of {self.limit} bytes exceeded")
+        self.on_exhausted()
+
+    def release(self, obj):
+        self.released += 1
+        self.live_objects -= 1
+        self.live_bytes -= object_size(obj)
+
+    def collection_due(self):
+        if self.allocated >= self.next_collection:
+            return True
+        return self.limit is not None and self.live_bytes >= self.next_collection_bytes
+
+    # roots: Values, objects, closures, environments, and dicts or lists of them
+    def collect(self, roots):
+        start = time.perf_counter()
+        marked = self.__mark(roots)
+        for obj in list(self.objects):
+            if id(obj) not in marked:
+                self.reclaimed_objects += 1
+                self.reclaimed_bytes += object_size(obj)
+                self.release(obj)
+                # the object is no longer this heap's, whatever still holds it
+                self.objects.discard(obj)
+                obj.heap = None
+                obj.shape = self.root_shape
+                obj.slots = []
+                obj.proto = None
+        for key, ref in list(self.closures.items()):
+            closure = ref()
+            if closure is not None and key not in marked:
+                self.reclaimed_closures += 1
+                del self.closures[key]
+                closure.captured_env = EnvironmentManager()
+        self.next_collection = self.allocated + max(self.interval, self.live_objects)
+        if self.limit is not None:
+            self.next_collection_bytes = self.live_bytes + (self.limit - self.live_bytes) // 2
+        pause = time.perf_counter() - start
+        self.collections += 1
+        self.pause_total += pause
+        self.pause_max = max(self.pause_max, pause)
+
+    # ids of every object, closure and environment reachable from roots
+    def __mark(self, roots):
+        marked = set()
+        pending = [roots]
+        while pending:
+            item = pending.pop()
+            if isinstance(item, Value):
+                item = item.value()
+            if isinstance(item, ShapedObject):
+                if id(item) not in marked:
+                    marked.add(id(item))
+                    pending.extend(item.slots)  # properties and method tables
+                    if item.proto is not None:
+                        pending.append(item.proto)
+            elif isinstance(item, Closure):
+                if id(item) not in marked:
+                    marked.add(id(item))
+                    pending.append(item.captured_env)
+            elif isinstance(item, EnvironmentManager):
+                if id(item) not in marked:
+                    marked.add(id(item))
+                    pending.extend(item.environment)
+            elif isinstance(item, dict):
+                pending.extend(item.values())
+            elif isinstance(item, list):
+                pending.extend(item)
+        return marked
+
+    def stats(self):
+        return {
+            "live_objects": self.live_objects,
+            "live_bytes": self.live_bytes,
+            "peak_objects": self.peak_objects,
+            "peak_bytes": self.peak_bytes,
+            "allocated": self.allocated,
+            "released": self.released,
+            "collections": self.collections,
+            "gc_pause_total_ms": self.pause_total * 1000,
+            "gc_pause_max_ms": self.pause_max * 1000,
+            "reclaimed_objects": self.reclaimed_objects,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "reclaimed_closures": self.reclaimed_closures,
+        }
@@ -0,0 +1,147 @@
+# Inline caches for method calls and proto-chain property reads.
+#
+# Each call site (the mcall or var AST node) remembers, per receiver layout,
+# which object supplied the method or property: the receiver itself, or an
+# object on its proto chain. Later executions skip the chain walk and read the
+# holder's methods or properties directly. A layout is the receiver's shape
+# (see shapesv4.py) and its proto object, so every object built by the same
+# code with the same proto shares an entry. A site caches up to
+# POLYMORPHIC_ENTRIES layouts; a site that sees more becomes megamorphic and
+# shares one bounded table with all other megamorphic sites instead of falling
+# back to full walks.
+#
+# Entries only record where a name was found, never the value found there, so
+# overwriting an existing method or property needs no invalidation, and
+# neither does a change to the receiver (a new field gives it a new shape, a
+# new proto a different proto object). What else an entry depends on is
+# recorded when it is stored: the protos the walk passed over before reaching
+# the holder, and the proto Values linking them. Those are watched. Only a
+# change to a watched object (a new field or a proto assignment, see
+# object_changed) or a watched proto Value being overwritten in place (see
+# value_changed) calls invalidate(), which drops every entry of the cache by
+# bumping its epoch. Objects that are never on a cached chain, such as freshly
+# allocated ones, cost a dict lookup when they change.
+from type_valuev4 import Type
+
+POLYMORPHIC_ENTRIES = 4
+MEGAMORPHIC_ENTRIES = 256
+# objects and Values watched before the cache starts over
+WATCHED_ENTRIES = 4 * MEGAMORPHIC_ENTRIES
+
+
+# the object obj's proto field refers to, or None
+def proto_object(obj):
+    proto = obj.proto
+    if proto is None or proto.type() != Type.OBJECT:
+        return None
+    return proto.value()
+
+
+class _Site:
+    __slots__ = ("epoch", "entries", "megamorphic")
+
+    def __init__(self, epoch):
+        self.epoch = epoch
+        # (id(shape), id(proto)) -> (shape, proto, holder, or None for the receiver)
+        self.entries = {}
+        self.megamorphic = False
+
+
+class InlineCache:
+    def __init__(self):
+        self.epoch = 0
+        self.sites = {}  # id(site AST node) -> _Site
+        # (key, id(shape), id(proto)) -> entry, shared by megamorphic sites
+        self.megamorphic = {}
+        self.megamorphic_epoch = 0
+        # id -> the protos and proto Values cached entries depend on; held so
+        # their ids aren't reused while watched
+        self.watched = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def invalidate(self):
+        self.epoch += 1
+        self.invalidations += 1
+        self.watched.clear()
+
+    # obj got a new field or a new proto
+    def object_changed(self, obj):
+        if id(obj) in self.watched:
+            self.invalidate()
+
+    # value is about to be overwritten in place with set()
+    def value_changed(self, value):
+        if id(value) in self.watched:
+            self.invalidate()
+
+    # key identifies what the site looks up (e.g. method name and arity); the
+    # holder of the name for receiver, or None
+    def lookup(self, site_ast, key, receiver):
+        site = self.sites.get(id(site_ast))
+        entry = None
+        if site is not None and site.epoch == self.epoch:
+            shape = receiver.shape
+            proto = proto_object(receiver)
+            if not site.megamorphic:
+                entry = site.entries.get((id(shape), id(proto)))
+            elif self.megamorphic_epoch == self.epoch:
+                entry = self.megamorphic.get((key, id(shape), id(proto)))
+            if entry is not None and entry[0] is shape and entry[1] is proto:
+                self.hits += 1
+                return receiver if entry[2] is None else entry[2]
+        self.misses += 1
+        return None
+
+    def store(self, site_ast, key, receiver, holder):
+        shape = receiver.shape
+        proto = proto_object(receiver)
+        if holder is receiver:
+            entry = (shape, proto, None)
+        else:
+            entry = (shape, proto, holder)
+            self.__watch_chain(proto, holder)
+        site = self.sites.get(id(site_ast))
+        if site is None or site.epoch != self.epoch:
+            site = _Site(self.epoch)
+            self.sites[id(site_ast)] = site
+        layout = (id(shape), id(proto))
+        if not site.megamorphic:
+            if len(site.entries) < POLYMORPHIC_ENTRIES or layout in site.entries:
+                site.entries[layout] = entry
+                return
+            site.megamorphic = True
+            entries = site.entries
+            site.entries = None
+            for other_layout, other_entry in entries.items():
+                self.__store_megamorphic((key,) + other_layout, other_entry)
+        self.__store_megamorphic((key,) + layout, entry)
+
+    # watches the protos from proto up to (not including) holder and the proto
+    # Values linking them to the next
+    def __watch_chain(self, proto, holder):
+        if len(self.watched) >= WATCHED_ENTRIES:
+            self.invalidate()
+        watched = self.watched
+        while proto is not None and proto is not holder:
+            watched[id(proto)] = proto
+            if proto.proto is not None:
+                watched[id(proto.proto)] = proto.proto
+            proto = proto_object(proto)
+
+    def __store_megamorphic(self, key, entry):
+        if self.megamorphic_epoch != self.epoch or len(self.megamorphic) >= MEGAMORPHIC_ENTRIES:
+            self.megamorphic.clear()
+            self.megamorphic_epoch = self.epoch
+        self.megamorphic[key] = entry
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "megamorphic_sites": sum(site.megamorphic for site in self.sites.values()),
+        }
@@ -1,6 +1,8 @@
 # Base class for our interpreter
 from enum import Enum
 
+from outputv4 import OUTPUT_BUFFER, RING, ConsoleSink, OutputBuffer, make_log, make_sink
+
 
 class ErrorType(Enum):
     TYPE_ERROR = 1
@@ -34,14 +36,37 @@ class InterpreterBase:
     NOT_DEF = "!"
 
     # methods
-    def __init__(self, console_output=True, inp=None):
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        output_sink=None,
+        output_buffer_size=OUTPUT_BUFFER,
+        output_log_limit=None,
+        output_log_mode=RING,
+    ):
         self.console_output = console_output
         self.inp = inp  # if not none, then read input from passed-in list
+        # see outputv4.py; output goes to output_sink (a path, a callable or a
+        # sink), or else to the console if console_output is set
+        if output_sink is not None:
+            output_sink = make_sink(output_sink)
+        elif console_output:
+            output_sink = ConsoleSink()
+        self.output_sink = output_sink
+        self.output_buffer_size = output_buffer_size
+        self.output_log_limit = output_log_limit
+        self.output_log_mode = output_log_mode
+        self.output_buffer = None
         self.reset()
 
     # Call to reset I/O for another run of the program
     def reset(self):
-        self.output_log = []
+        if self.output_buffer is not None:
+            self.output_buffer.flush()
+        if self.output_sink is not None:
+            self.output_buffer = OutputBuffer(self.output_sink, self.output_buffer_size)
+        self.output_log = make_log(self.output_log_limit, self.output_log_mode)
         self.input_cursor = 0
         self.error_type = None
         self.error_line = None
@@ -52,6 +77,7 @@ class InterpreterBase:
 
     def get_input(self):
         if not self.inp:
+            self.flush_output()  # so a prompt shows before we wait for input
             return input()  # Get input from keyboard if not input list provided
 
         if self.input_cursor < len(self.inp):
@@ -75,12 +101,27 @@ class InterpreterBase:
         raise Exception(f"{error_type} on line {line_num}{description}")
 
     def output(self, v):
-        if self.console_output:
-            print(v)
+        if self.output_buffer is not None:
+            self.output_buffer.write(v)
         self.output_log.append(v)
 
+    # writes out the buffered output; runs call this when they end
+    def flush_output(self):
+        if self.output_buffer is not None:
+            self.output_buffer.flush()
+
+    # flushes the output and closes the sink and the output log's spill file
+    def close_output(self):
+        if self.output_buffer is not None:
+            self.output_buffer.close()
+            self.output_buffer = None
+        if not isinstance(self.output_log, list):
+            self.output_log.close()
+
     def get_output(self):
-        return self.output_log
+        if isinstance(self.output_log, list):
+            return self.output_log
+        return self.output_log.get_lines()
 
     def get_error_type_and_line(self):
         return self.error_type, self.error_line
@@ -0,0 +1,118 @@
+# Interned (flyweight) Values for constants.
+#
+# nil, true and false, the ints of a small range and the value of each literal
+# in the program are each one shared InternedValue instead of a new Value per
+# evaluation. Literal nodes are bound to theirs when a program is loaded
+# (bind_literals), and operators return the shared nil, bools and small ints
+# from a ValuePool.
+#
+# Value is mutable: assignment overwrites a variable's Value in place with
+# set() (see Interpreter.__set_value), and ref args alias a caller's Value. So
+# an InternedValue must never become the Value a variable, param or property
+# holds. Every place that binds one copies the Value first, and copying an
+# InternedValue (copy.copy, copy.deepcopy, CopyOnWrite.copy_value) gives a
+# plain Value. set() on an InternedValue raises rather than change the constant
+# everywhere it is used.
+from element import Element
+from intbase import InterpreterBase
+from type_valuev4 import Type, Value
+
+# ints from Interpreter(small_ints=...) by default
+SMALL_INTS = range(-128, 1024)
+
+
+class InternedValue(Value):
+    def set(self, other):
+        raise TypeError(f"interned value {self.v!r} cannot be assigned to")
+
+    def __copy__(self):
+        return Value(self.t, self.v)
+
+    def __deepcopy__(self, memo):
+        return Value(self.t, self.v)
+
+
+NIL = InternedValue(Type.NIL, None)
+TRUE = InternedValue(Type.BOOL, True)
+FALSE = InternedValue(Type.BOOL, False)
+ZERO = InternedValue(Type.INT, 0)
+ONE = InternedValue(Type.INT, 1)
+
+
+# a variable, param or property may hold value; a copy if it is shared
+def unshared(value):
+    if type(value) is InternedValue:
+        return Value(value.t, value.v)
+    return value
+
+
+class ValuePool:
+    def __init__(self, small_ints=SMALL_INTS):
+        if small_ints.step != 1:
+            raise ValueError("small_ints must be a range with step 1")
+        self.ints_start = small_ints.start
+        self.ints = []
+        for i in small_ints:
+            if i == 0:
+                self.ints.append(ZERO)
+            elif i == 1:
+                self.ints.append(ONE)
+            else:
+                self.ints.append(InternedValue(Type.INT, i))
+
+    def int(self, v):
+        index = v - self.ints_start
+        if 0 <= index < len(self.ints):
+            return self.ints[index]
+        return Value(Type.INT, v)
+
+    @staticmethod
+    def bool(v):
+        return TRUE if v else FALSE
+
+    # the result of an operator whose result type is t
+    def make(self, t, v):
+        if t == Type.INT:
+            return self.int(v)
+        if t == Type.BOOL:
+            return TRUE if v else FALSE
+        return Value(t, v)
+
+    # a Value of its own for anything else the interpreter creates (objects,
+    # closures, input, strings it builds)
+    def new(self, t, v):
+        return Value(t, v)
+
+    # the Value of a literal; ints outside the range and strings get one of
+    # their own, which is as immutable as the shared ones
+    def literal(self, t, v):
+        if t == Type.BOOL:
+            return TRUE if v else FALSE
+        if t == Type.INT:
+            index = v - self.ints_start
+            if 0 <= index < len(self.ints):
+                return self.ints[index]
+        return InternedValue(t, v)
+
+
+LITERAL_TYPES = {
+    InterpreterBase.INT_DEF: Type.INT,
+    InterpreterBase.STRING_DEF: Type.STRING,
+    InterpreterBase.BOOL_DEF: Type.BOOL,
+}
+
+
+# sets node.const on every int, string and bool literal of ast
+def bind_literals(ast, pool):
+    pending = [ast]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, list):
+            pending.extend(node)
+        elif isinstance(node, Element):
+            t = LITERAL_TYPES.get(node.elem_type)
+            if t is not None:
+                node.const = pool.literal(t, node.val)
+            else:
+                pending.extend(child for _, child in node.items())
+    return ast
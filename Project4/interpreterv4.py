@@ -1,13 +1,18 @@
 import copy
-from curses import ERR
-from dataclasses import field
 from enum import Enum
-from pickle import OBJ
 
-from brewparse import parse_program
+from brewparse import PLY_BACKEND, parse_program
+from cowv4 import CopyOnWrite
 from env_v4 import EnvironmentManager
+from freevarsv4 import annotate_program
+from heapv4 import ObjectHeap
+from icachev4 import InlineCache
 from intbase import InterpreterBase, ErrorType
-from type_valuev4 import Closure, Type, Value, Object, create_value, get_printable
+from internv4 import FALSE, NIL, ONE, SMALL_INTS, TRUE, ZERO, ValuePool, bind_literals, unshared
+from memov4 import MEMO_SIZE, MemoCache, find_pure_functions, memo_key
+from outputv4 import OUTPUT_BUFFER, RING
+from resolverv4 import resolve_program
+from type_valuev4 import Closure, Type, Value, get_printable
 
 
 class ExecStatus(Enum):
@@ -15,32 +20,219 @@ class ExecStatus(Enum):
     RETURN = 2
 
 
+# returned in place of a value by `return f(...)`: the frame the caller's frame
+# is to be replaced with (statements of f's body, the environment to run them
+# in), see Interpreter.__run_function
+class TailCall:
+    __slots__ = ("statements", "env")
+
+    def __init__(self, statements, env):
+        self.statements = statements
+        self.env = env
+
+
 # Main interpreter class
 class Interpreter(InterpreterBase):
     # constants
-    NIL_VALUE = create_value(InterpreterBase.NIL_DEF)
-    TRUE_VALUE = create_value(InterpreterBase.TRUE_DEF)
+    NIL_VALUE = NIL
+    TRUE_VALUE = TRUE
     BIN_OPS = {"+", "-", "*", "/", "==", "!=", ">", ">=", "<", "<=", "||", "&&"}
+    LOGICAL_OPS = {"&&", "||"}
+    LITERAL_DEFS = {InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF}
+    TREE_ENGINE = "tree"
+    COMPILED_ENGINE = "compiled"
+    BYTECODE_ENGINE = "bytecode"
+    ENGINES = {TREE_ENGINE, COMPILED_ENGINE, BYTECODE_ENGINE}
 
     # methods
-    def __init__(self, console_output=True, inp=None, trace_output=False):
-        super().__init__(console_output, inp)
+    def __init__(
+        self,
+        console_output=True,
+        inp=None,
+        trace_output=False,
+        engine=TREE_ENGINE,
+        parse_cache=None,
+        parser_backend=PLY_BACKEND,
+        optimize=False,
+        heap_limit=None,
+        max_call_depth=None,
+        tail_calls=True,
+        small_ints=SMALL_INTS,
+        profile=False,
+        collect_stats=False,
+        stats_path=None,
+        memoize=False,
+        memo_size=MEMO_SIZE,
+        output_sink=None,
+        output_buffer_size=OUTPUT_BUFFER,
+        output_log_limit=None,
+        output_log_mode=RING,
+    ):
+        super().__init__(
+            console_output,
+            inp,
+            output_sink,
+            output_buffer_size,
+            output_log_limit,
+            output_log_mode,
+        )
+        if engine not in Interpreter.ENGINES:
+            raise ValueError(f"Unknown engine {engine}")
         self.trace_output = trace_output
+        self.engine = engine
+        self.parse_cache = parse_cache
+        self.parser_backend = parser_backend
+        self.optimize = optimize
+        # most calls (main's included) in progress at once before a FAULT_ERROR;
+        # the tree and compiled engines may hit Python's recursion limit first
+        self.max_call_depth = max_call_depth
+        # `return f(...)` reuses the caller's frame instead of nesting f's
+        self.tail_calls = tail_calls
+        self.optimizer_rewrites = []
+        # see statsv4.py; None unless collecting stats, and then kept across
+        # runs, which write stats() as JSON to stats_path when they end if it is set
+        self.counters = None
+        self.stats_path = stats_path
+        # shared Values for nil, bools, the ints in small_ints and literals, see
+        # internv4.py, and the copies made for args and returns, see cowv4.py;
+        # counted by their stand-ins in self.counters if collecting stats
+        if collect_stats:
+            # imported here so interpreters that don't collect stats don't pay for it at startup
+            from statsv4 import InterpreterStats
+
+            self.counters = InterpreterStats()
+            self.values = self.counters.value_pool(small_ints)
+            copier = self.counters.copier
+            self.unshared = self.counters.unshared
+        else:
+            self.values = ValuePool(small_ints)
+            copier = CopyOnWrite
+            self.unshared = unshared
         self.__setup_ops()
-        self.objects = {}
+        self.__setup_bin_op_table()
+        # see heapv4.py; self.heap.stats() for live/peak counts and collections
+        self.heap = ObjectHeap(heap_limit, self.__out_of_memory)
+        # pending copies of by-value objects and closures are completed before
+        # they are read, and all of them before anything is written, see cowv4.py
+        self.cow = copier(self.heap, self.values)
+        self.copy_value = self.cow.copy_value
+        self.pending_copies = self.cow.pending
+        # see profilerv4.py; None unless profiling, and then kept across runs
+        self.profiler = None
+        if profile:
+            # imported here so interpreters that don't profile don't pay for it at startup
+            from profilerv4 import Profiler
+
+            self.profiler = Profiler(self.heap)
+        # calls of pure functions are answered from self.memo, an LRU of
+        # memo_size results that each run starts afresh, see memov4.py
+        self.memoize = memoize
+        self.memo_size = memo_size
+        self.memo = None
 
     # run a program that's provided in a string
     # usese the provided Parser found in brewparse.py to parse the program
     # into an abstract syntax tree (ast)
     def run(self, program):
-        ast = parse_program(program)
+        ast = parse_program(program, self.parse_cache, self.parser_backend)
+        if self.optimize:
+            ast = self.__optimize(ast)
+        ast = resolve_program(ast)
+        annotate_program(ast)
+        bind_literals(ast, self.values)
         # print(ast)
         self.__set_up_function_table(ast)
-        self.env = EnvironmentManager()
+        if self.counters is None:
+            self.env = EnvironmentManager()
+        else:
+            self.env = self.counters.environment()
+        self.compiled_code = {}
+        self.method_cache = InlineCache()
+        self.property_cache = InlineCache()
+        # frames and operand stacks of calls in progress, for the collector
+        self.call_roots = []
+        # index in self.env.environment of the frame of each function call in progress
+        self.frame_bases = []
+        if self.engine == Interpreter.BYTECODE_ENGINE:
+            self.__set_up_vm()
         main_func = self.__get_func_by_name("main", 0)
         if main_func is None:
             super().error(ErrorType.NAME_ERROR, f"Function main not found")
-        self.__run_statements(main_func.func_ast.get("statements"))
+        self.__run_main(main_func.func_ast)
+
+    # runs main's body under the profiler and the stats counters that are on,
+    # and writes out the buffered output when it ends, even with an error
+    def __run_main(self, main_ast):
+        statements = main_ast.get("statements")
+        if self.profiler is not None:
+            self.profiler.enter(main_ast, "main")
+        try:
+            self.__run_statements(statements)
+        finally:
+            if self.profiler is not None:
+                self.profiler.unwind()
+            if self.counters is not None and self.stats_path is not None:
+                self.counters.dump(self.stats_path, {"heap": self.heap.stats()})
+            self.flush_output()
+
+    # the counters collected so far (see statsv4.py) and the heap's stats, or
+    # None unless the interpreter was created with collect_stats
+    def stats(self):
+        if self.counters is None:
+            return None
+        stats = self.counters.as_dict()
+        stats["heap"] = self.heap.stats()
+        if self.memo is not None:
+            stats["memo"] = self.memo.stats()
+        return stats
+
+    # see optimizerv4.py; the rewrites made are kept in self.optimizer_rewrites
+    def __optimize(self, ast):
+        # imported here so interpreters that don't optimize don't pay for it at startup
+        from optimizerv4 import Optimizer
+
+        error_type, error_line = self.error_type, self.error_line
+        optimizer = Optimizer(self.__evaluate_literal_expr)
+        ast = optimizer.optimize(ast)
+        # folds that were abandoned because they raise must not leave an error behind
+        self.error_type, self.error_line = error_type, error_line
+        self.optimizer_rewrites = optimizer.rewrites
+        return ast
+
+    # evaluates an expression the optimizer folds; its literals (some folded
+    # just before) are bound here, as run() binds the program's only after
+    # optimizing
+    def __evaluate_literal_expr(self, expr_ast):
+        # operands go through __eval_expr, which the compiled engine caches by
+        # node id; nodes the optimizer replaces are freed and their ids reused,
+        # so nothing is kept from one fold to the next, and run() starts over
+        # with a fresh cache
+        self.compiled_code = {}
+        return self.__walk_expr(bind_literals(expr_ast, self.values))
+
+    def __set_up_vm(self):
+        # imported here so the tree and compiled engines don't pay for it at startup
+        from bytecodev4 import VirtualMachine
+
+        self.vm = VirtualMachine(
+            self,
+            get_func_by_name=self.__get_func_by_name,
+            prepare_env_with_closed_variables=self.__prepare_env_with_closed_variables,
+            assign_value=self.__assign_value,
+            assign_this=self.__assign_this,
+            get_field_owner=self.__get_field_owner,
+            set_field=self.__set_field,
+            get_method=self.__get_method,
+            apply_bin_op=self.__apply_bin_op,
+            short_circuit=self.__short_circuit,
+            apply_unary=self.__apply_unary,
+            walk_expr=self.__walk_expr,
+            max_depth=self.max_call_depth,
+            tail_calls=self.tail_calls,
+            profiler=self.profiler,
+            counters=self.counters,
+            memo=self.memo,
+        )
 
     def __set_up_function_table(self, ast):
         self.func_name_to_ast = {}
@@ -51,6 +243,8 @@ class Interpreter(InterpreterBase):
             if func_name not in self.func_name_to_ast:
                 self.func_name_to_ast[func_name] = {}
             self.func_name_to_ast[func_name][num_params] = Closure(func_def, empty_env)
+        if self.memoize:
+            self.memo = MemoCache(find_pure_functions(ast), self.memo_size)
 
     def __get_func_by_name(self, name, num_params):
         if name not in self.func_name_to_ast:
@@ -90,25 +284,25 @@ class Interpreter(InterpreterBase):
         return candidate_funcs[num_params]
 
     def __run_statements(self, statements, calling_obj=None):
+        if self.engine == Interpreter.COMPILED_ENGINE:
+            return self.__get_compiled_block(statements)(calling_obj)
+        if self.engine == Interpreter.BYTECODE_ENGINE:
+            returned, return_val = self.vm.run_block(statements, calling_obj)
+            if returned:
+                return (ExecStatus.RETURN, return_val)
+            return (ExecStatus.CONTINUE, return_val)
+        return self.__walk_statements(statements, calling_obj)
+
+    def __walk_statements(self, statements, calling_obj=None):
         # print("__run_statements: ", calling_obj)
         self.env.push()
         for statement in statements:
             if self.trace_output:
+                self.flush_output()  # keep the trace in step with the output
                 print(statement)
-            status = ExecStatus.CONTINUE
-            if statement.elem_type == InterpreterBase.FCALL_DEF:
-                self.__call_func(statement, calling_obj)
-            elif statement.elem_type == "=":
-                self.__assign(statement, calling_obj)
-            elif statement.elem_type == InterpreterBase.RETURN_DEF:
-                status, return_val = self.__do_return(statement, calling_obj)
-            elif statement.elem_type == Interpreter.IF_DEF:
-                status, return_val = self.__do_if(statement, calling_obj)
-            elif statement.elem_type == Interpreter.WHILE_DEF:
-                status, return_val = self.__do_while(statement, calling_obj)
-            elif statement.elem_type == InterpreterBase.MCALL_DEF:
-                self.__call_method(statement, calling_obj)
-
+            if self.counters is not None:
+                self.counters.count_statement(statement.elem_type)
+            status, return_val = self.__exec_statement(statement, calling_obj)
             if status == ExecStatus.RETURN:
                 self.env.pop()
                 return (status, return_val)
@@ -116,19 +310,42 @@ class Interpreter(InterpreterBase):
         self.env.pop()
         return (ExecStatus.CONTINUE, Interpreter.NIL_VALUE)
 
+    def __exec_statement(self, statement, calling_obj=None):
+        status, return_val = ExecStatus.CONTINUE, Interpreter.NIL_VALUE
+        if statement.elem_type == InterpreterBase.FCALL_DEF:
+            self.__call_func(statement, calling_obj)
+        elif statement.elem_type == "=":
+            self.__assign(statement, calling_obj)
+        elif statement.elem_type == InterpreterBase.RETURN_DEF:
+            status, return_val = self.__do_return(statement, calling_obj)
+        elif statement.elem_type == Interpreter.IF_DEF:
+            status, return_val = self.__do_if(statement, calling_obj)
+        elif statement.elem_type == Interpreter.WHILE_DEF:
+            status, return_val = self.__do_while(statement, calling_obj)
+        elif statement.elem_type == InterpreterBase.MCALL_DEF:
+            self.__call_method(statement, calling_obj)
+        return (status, return_val)
+
 
     def __call_func(self, call_ast, calling_obj=None):
-        func_name = call_ast.get("name")
-        # print("--------------------", func_name, "--------------------")
-        c = self.env.get("c")
-        # print(c.value().func_ast)
-        # self.env.print_env()
+        func_name = call_ast.name
         if func_name == "print":
             return self.__call_print(call_ast, calling_obj)
         if func_name == "inputi":
             return self.__call_input(call_ast, calling_obj)
 
-        actual_args = call_ast.get("args")
+        target_ast, new_env = self.__bind_call(call_ast)
+        if self.memo is not None and id(target_ast) in self.memo.pure_functions:
+            return self.__call_pure(func_name, target_ast, new_env)
+        if self.profiler is not None:
+            return self.__run_profiled(func_name, target_ast, new_env)
+        return self.__run_function(target_ast.statements, new_env)
+
+    # the function a call resolves to, and the frame holding its closed
+    # variables and params
+    def __bind_call(self, call_ast):
+        func_name = call_ast.name
+        actual_args = call_ast.args
         target_closure = self.__get_func_by_name(func_name, len(actual_args))
         # print("TARGET CLOSURE: ", target_closure.func_ast)
         if target_closure == None:
@@ -140,17 +357,91 @@ class Interpreter(InterpreterBase):
         new_env = {}
         self.__prepare_env_with_closed_variables(target_closure, new_env)
         self.__prepare_params(target_ast,call_ast, new_env)
-        self.env.push(new_env)
-        # print("************* NEW ENV****************")
-        # self.env.print_env()
-        # print("************* NEW ENV****************")
-        _, return_val = self.__run_statements(target_ast.get("statements"))
-        self.env.pop()
+        return target_ast, new_env
+
+    # runs a function or method body in the frame new_env; a TailCall it
+    # returns replaces the frame and runs in it, so a chain of tail calls
+    # takes no more Python stack or scopes than one call
+    def __run_function(self, statements, new_env, calling_obj=None):
+        # main runs without a frame base of its own, but counts as a call, as in the VM
+        if self.max_call_depth is not None and len(self.frame_bases) + 1 >= self.max_call_depth:
+            super().error(
+                ErrorType.FAULT_ERROR, f"Maximum call depth of {self.max_call_depth} exceeded"
+            )
+        env = self.env
+        self.frame_bases.append(len(env.environment))
+        env.push(new_env)
+        _, return_val = self.__run_statements(statements, calling_obj=calling_obj)
+        while type(return_val) is TailCall:
+            env.environment[-1] = return_val.env
+            _, return_val = self.__run_statements(return_val.statements)
+        env.pop()
+        self.frame_bases.pop()
+        return return_val
+
+    # a call of a pure function (see memov4.py), answered from self.memo if
+    # it was made before with the same args
+    def __call_pure(self, func_name, target_ast, new_env):
+        key = memo_key(target_ast, [new_env[arg.name] for arg in target_ast.args])
+        if key is not None:
+            result = self.memo.get(key)
+            if result is not None:
+                return result
+        if self.profiler is not None:
+            return_val = self.__run_profiled(func_name, target_ast, new_env)
+        else:
+            return_val = self.__run_function(target_ast.statements, new_env)
+        if key is not None:
+            self.memo.put(key, return_val)
         return return_val
 
+    # __run_function for a call the profiler is told about, under name
+    def __run_profiled(self, name, target_ast, new_env, calling_obj=None):
+        self.profiler.enter(target_ast, name)
+        return_val = self.__run_function(target_ast.statements, new_env, calling_obj=calling_obj)
+        self.profiler.exit()
+        return return_val
+
+    # whether `return expr_ast` is a call that can reuse the returning frame
+    def __is_tail_call_site(self, expr_ast):
+        return (
+            self.tail_calls
+            and expr_ast.elem_type == InterpreterBase.FCALL_DEF
+            and expr_ast.name not in ("print", "inputi")
+        )
+
+    # the caller's frame and the scopes of the blocks it is in are folded into
+    # one environment under the callee's own frame, so the callee sees the same
+    # names as it would in a nested call, ref args and closed variables included
+    def __tail_call(self, name, target_ast, new_env):
+        if self.profiler is not None:
+            self.profiler.tail_call(target_ast, name)
+        merged = {}
+        for scope in self.env.environment[self.frame_bases[-1]:]:
+            merged.update(scope)
+        merged.update(new_env)
+        return (ExecStatus.RETURN, TailCall(target_ast.statements, merged))
+
+    # the variables a lambda uses (see freevarsv4.py), as they are bound where
+    # it is created; Closure snapshots them as it used to the whole environment
+    def __capture(self, free_vars):
+        captured = EnvironmentManager()
+        scope = captured.environment[0]
+        for var_name in free_vars:
+            value = self.env.get(var_name)
+            if value is not None:
+                scope[var_name] = value
+        return captured
+
     def __prepare_env_with_closed_variables(self, target_closure, temp_env):
+        if self.pending_copies and id(target_closure) in self.pending_copies:
+            self.cow.complete(target_closure)
         for var_name, value in target_closure.captured_env:
             # print(var_name, ": ", value.value())
+            if value.type() == Type.OBJECT and self.env.get(var_name) is None:
+                # the closure outlived the object's variable; keep its own reference
+                temp_env[var_name] = value
+                continue
             if value.type() == Type.OBJECT or value.type() == Type.CLOSURE:
                 continue    # pass by reference, not copying to new environment
             # Updated here - ignore updates to the scope if we
@@ -160,33 +451,29 @@ class Interpreter(InterpreterBase):
 
     def __prepare_params(self, target_ast, call_ast, temp_env, calling_obj=None):
         # print(target_ast.elem_type)
-        actual_args = call_ast.get("args")
-        formal_args = target_ast.get("args")
+        actual_args = call_ast.args
+        formal_args = target_ast.args
         if len(actual_args) != len(formal_args):
             super().error(
                 ErrorType.NAME_ERROR,
                 f"Function {target_ast.get('name')} with {len(actual_args)} args not found",
             )
 
+        # the args evaluated so far are only held here until the call starts
+        self.call_roots.append(temp_env)
         for formal_ast, actual_ast in zip(formal_args, actual_args):
             if formal_ast.elem_type == InterpreterBase.REFARG_DEF:
-                result = self.__eval_expr(actual_ast, calling_obj=calling_obj)
+                result = self.unshared(self.__eval_expr(actual_ast, calling_obj=calling_obj))
             else:
-                result = copy.deepcopy(self.__eval_expr(actual_ast, calling_obj=calling_obj))
-
-            if actual_ast.get("name") in self.objects:
-                original = self.objects[actual_ast.get("name")]
-                if formal_ast.elem_type == InterpreterBase.REFARG_DEF:
-                    self.objects[formal_ast.get("name")] = original
-                else:
-                    self.objects[formal_ast.get("name")] = copy.deepcopy(original)
-            arg_name = formal_ast.get("name")
+                result = self.copy_value(self.__eval_expr(actual_ast, calling_obj=calling_obj))
+            arg_name = formal_ast.name
             temp_env[arg_name] = result
+        self.call_roots.pop()
 
     def __call_print(self, call_ast, calling_obj=None):
         # self.env.print_env()
         output = ""
-        for arg in call_ast.get("args"):
+        for arg in call_ast.args:
             result = self.__eval_expr(arg, calling_obj=calling_obj)  # result is a Value object
             printable = get_printable(result)
             if printable is None:
@@ -198,7 +485,7 @@ class Interpreter(InterpreterBase):
         return Interpreter.NIL_VALUE
 
     def __call_input(self, call_ast, calling_obj=None):
-        args = call_ast.get("args")
+        args = call_ast.args
         if args is not None and len(args) == 1:
             result = self.__eval_expr(args[0], calling_obj=calling_obj)
             super().output(get_printable(result))
@@ -207,84 +494,73 @@ class Interpreter(InterpreterBase):
                 ErrorType.NAME_ERROR, "No inputi() function that takes > 1 parameter"
             )
         inp = super().get_input()
-        if call_ast.get("name") == "inputi":
-            return Value(Type.INT, int(inp))
-        if call_ast.get("name") == "inputs":
-            return Value(Type.STRING, inp)
+        if call_ast.name == "inputi":
+            return self.values.new(Type.INT, int(inp))
+        if call_ast.name == "inputs":
+            return self.values.new(Type.STRING, inp)
 
     def __assign(self, assign_ast, calling_obj=None):
-        var_name = assign_ast.get("name")
-        if var_name == "this":
-            var_name = calling_obj
+        var_name = assign_ast.name
         # checking for object property/method assignment
         if "." in var_name:
             # print(var_name)
             self.__add_to_obj(var_name, assign_ast, calling_obj)
             return
-        src_value_obj = copy.copy(self.__eval_expr(assign_ast.get("expression"), var_name, calling_obj=calling_obj))
-        target_value_obj = self.env.get(var_name)
-        self.env.set(var_name, src_value_obj)
-
-        print("var name: ", var_name)
-        print("tar val obj: ", target_value_obj)
-        # removing object reference if it no longer exists
-        if var_name in self.objects.keys() and src_value_obj.type() != Type.OBJECT:
-            del self.objects[var_name]
-        # elif target_value_obj is not None and target_value_obj.type() == Type.OBJECT:
-        #     self.objects[var_name] = target_value_obj.value()
-
-        # # assigning objects to each other
-        # if target_value_obj is not None and target_value_obj.type() == Type.OBJECT:
-        #     self.objects[var_name] = target_value_obj.value()
-
-        if target_value_obj is None:
-            if src_value_obj.type() == Type.OBJECT:
-                print(self.objects)
-                # del self.objects[var_name]
-                print("src val obj: ",src_value_obj)
-                self.objects[var_name] = src_value_obj.value()
+        src_value_obj = copy.copy(self.__eval_expr(assign_ast.expression, calling_obj=calling_obj))
+        if var_name == "this":
+            self.__assign_this(src_value_obj, assign_ast.depth, calling_obj)
+            return
+        self.__assign_value(var_name, src_value_obj, assign_ast.depth)
+
+    def __assign_this(self, src_value_obj, depth=None, calling_obj=None):
+        if calling_obj is None:
+            self.__assign_value("this", src_value_obj, depth)
+            return
+        # calling_obj is the receiver's Value, so this rebinds the variable
+        # the method was called through
+        self.__set_value(calling_obj, src_value_obj)
+
+    def __assign_value(self, var_name, src_value_obj, depth=None):
+        if depth is None:
+            target_value_obj = self.env.get(var_name)
             self.env.set(var_name, src_value_obj)
         else:
-            # if target_value_obj.type() == Type.OBJECT:
-            #     self.objects[var_name] = target_value_obj.value()
-            # if a close is changed to another type such as int, we cannot make function calls on it any more 
-            if target_value_obj.t == Type.CLOSURE and src_value_obj.t != Type.CLOSURE:
-                target_value_obj.v.type = src_value_obj.t
-            target_value_obj.set(src_value_obj)
+            target_value_obj = self.env.get_at(depth, var_name)
+            self.env.set_at(depth, var_name, src_value_obj)
+
+        if target_value_obj is not None:
+            self.__set_value(target_value_obj, src_value_obj)
         # self.env.print_env()
 
+    # overwrite an existing variable's Value in place
+    def __set_value(self, target_value_obj, src_value_obj):
+        if self.pending_copies:
+            self.cow.settle()
+        if target_value_obj.t == Type.OBJECT:
+            # this Value may be some object's proto, which set() repoints
+            self.method_cache.value_changed(target_value_obj)
+            self.property_cache.value_changed(target_value_obj)
+        # if a close is changed to another type such as int, we cannot make function calls on it any more 
+        if target_value_obj.t == Type.CLOSURE and src_value_obj.t != Type.CLOSURE:
+            target_value_obj.v.type = src_value_obj.t
+        target_value_obj.set(src_value_obj)
+
     def __add_to_obj(self, var_name, expr_ast, calling_obj=None):
-        n = var_name.split(".")
         # print("EXPR AST: ", expr_ast)
         # self.env.print_env()
-        obj_name = n[0]
-        field_name = n[1]
-        # print(obj_name)
-        if(obj_name == "this"):
-            obj_name = calling_obj
-        if obj_name not in self.objects:
-            # print("HERE HERE HERE")
-            # check in list of vars first
-            if self.env.get(obj_name) is None: 
-                super().error(
-                    ErrorType.NAME_ERROR, f"Object {obj_name} not found"
-                )
-            potential_obj = self.env.get(obj_name).value()
-            val = self.__eval_expr(expr_ast.get("expression"), calling_obj=calling_obj)
-            if (val.type() == Type.CLOSURE) or (val.value() == Value and val.value().type() == Type.CLOSURE):  # method
-                # print("METHOD!!")
-                num_args = len(val.value().func_ast.get("args"))
-                if field_name not in potential_obj.methods.keys():
-                    potential_obj.methods[field_name] = {}
-                potential_obj.methods[field_name][num_args] = val
-                return Value(Type.OBJECT, potential_obj)
-            else:   # property
-                potential_obj.properties[field_name] = val
-                # print("PROPS: ", potential_obj.properties)
-                return Value(Type.OBJECT, potential_obj)
-        # get obj
-        obj = self.objects[obj_name]
+        obj = self.__get_field_owner(var_name, calling_obj)
         val = self.__eval_expr(expr_ast.get("expression"), calling_obj=calling_obj)
+        return self.__set_field(obj, var_name.split(".")[1], val)
+
+    # the object whose field "obj.field" names
+    def __get_field_owner(self, var_name, calling_obj=None):
+        obj_name = var_name.split(".")[0]
+        # print(obj_name)
+        return self.__get_obj(obj_name, calling_obj, f"dot operator used on non-object {obj_name}")
+
+    def __set_field(self, obj, field_name, val):
+        if self.pending_copies:
+            self.cow.settle()
         if field_name == "proto":
             if (val.type() != Type.OBJECT):
                 if (val.value() == Interpreter.NIL_DEF):
@@ -294,29 +570,35 @@ class Interpreter(InterpreterBase):
                         ErrorType.TYPE_ERROR, f"{val} is not an Object, cannot be assigned to proto field"
                     )
             obj.proto = val
+            self.method_cache.object_changed(obj)
+            self.property_cache.object_changed(obj)
         if (val.type() == Type.CLOSURE) or (val.value() == Value and val.value().type() == Type.CLOSURE):  # method
             # print("METHOD!!")
             num_args = len(val.value().func_ast.get("args"))
             if field_name not in obj.methods.keys():
                 obj.methods[field_name] = {}
+                self.method_cache.object_changed(obj)
             obj.methods[field_name][num_args] = val
-            return Value(Type.OBJECT, obj)
+            return self.values.new(Type.OBJECT, obj)
         else:   # property
-            obj.properties[field_name] = val
+            if field_name not in obj.properties:
+                self.property_cache.object_changed(obj)
+            obj.properties[field_name] = self.unshared(val)
             # print("PROPS: ", obj.properties)
-            return Value(Type.OBJECT, obj)     
+            return self.values.new(Type.OBJECT, obj)     
 
-    def __eval_expr(self, expr_ast, var_name=None, calling_obj=None):
+    def __eval_expr(self, expr_ast, calling_obj=None):
+        if self.engine == Interpreter.COMPILED_ENGINE:
+            return self.__get_compiled_expr(expr_ast)(calling_obj)
+        return self.__walk_expr(expr_ast, calling_obj)
+
+    def __walk_expr(self, expr_ast, calling_obj=None):
         if expr_ast.elem_type == InterpreterBase.NIL_DEF:
             return Interpreter.NIL_VALUE
-        if expr_ast.elem_type == InterpreterBase.INT_DEF:
-            return Value(Type.INT, expr_ast.get("val"))
-        if expr_ast.elem_type == InterpreterBase.STRING_DEF:
-            return Value(Type.STRING, expr_ast.get("val"))
-        if expr_ast.elem_type == InterpreterBase.BOOL_DEF:
-            return Value(Type.BOOL, expr_ast.get("val"))
+        if expr_ast.elem_type in Interpreter.LITERAL_DEFS:
+            return expr_ast.const
         if expr_ast.elem_type == InterpreterBase.VAR_DEF:
-            if "." in expr_ast.get("name"):
+            if "." in expr_ast.name:
                 return self.__get_obj_val(expr_ast, calling_obj)
             return self.__eval_name(expr_ast)
         if expr_ast.elem_type == InterpreterBase.FCALL_DEF:
@@ -328,16 +610,29 @@ class Interpreter(InterpreterBase):
         if expr_ast.elem_type == Interpreter.NOT_DEF:
             return self.__eval_unary(expr_ast, Type.BOOL, lambda x: not x)
         if expr_ast.elem_type == Interpreter.LAMBDA_DEF:
-            return Value(Type.CLOSURE, Closure(expr_ast, self.env))
+            if self.pending_copies:
+                self.cow.settle()
+            closure = Closure(expr_ast, self.__capture(expr_ast.free_vars))
+            self.heap.track_closure(closure)
+            return self.values.new(Type.CLOSURE, closure)
         if expr_ast.elem_type == Interpreter.OBJ_DEF:
-            return self.__create_obj(expr_ast, var_name)
+            return self.__create_obj()
         if expr_ast.elem_type == Interpreter.MCALL_DEF:
             return self.__call_method(expr_ast)
 
-    def __create_obj(self, obj_ast, obj_name):
-        obj = Object()
-        self.objects[obj_name] = obj
-        return Value(Type.OBJECT, obj)
+    # everything the program can still reach is rooted in self.env and
+    # self.call_roots here, so this is where the heap is collected, once no
+    # copy is pending
+    def __create_obj(self):
+        if self.heap.collection_due():
+            self.cow.settle()
+            self.heap.collect([self.env, self.call_roots])
+        return self.values.new(Type.OBJECT, self.heap.allocate())
+
+    def __out_of_memory(self):
+        super().error(
+            ErrorType.FAULT_ERROR, f"Heap limit of {self.heap.limit} bytes exceeded"
+        )
 
     def __get_obj_val(self, expr_ast, calling_obj=None):
         # print("GET OBJ VAL AST: ", expr_ast)
@@ -345,57 +640,77 @@ class Interpreter(InterpreterBase):
         n = var.split(".")
         obj_name = n[0]
         field_name = n[1]
-        if obj_name == "this" and calling_obj is not None:
-            obj_name = calling_obj
-        if obj_name not in self.objects.keys():
-            if self.env.get(obj_name) is not None:
-                super().error(
-                    ErrorType.TYPE_ERROR, f"dot operator used on non-object {obj_name}"
-                )
-            super().error(
-                ErrorType.NAME_ERROR, f"Object {obj_name} not found"
-            )
-        obj = self.objects[obj_name]
+        obj = self.__get_obj(obj_name, calling_obj, f"dot operator used on non-object {obj_name}")
 
         # checking for proto object
         if field_name == "proto":
             # print("PROTO OBJECT: ", obj.proto)
             return obj.proto
-        if field_name not in obj.properties.keys():
+        return self.__get_property(expr_ast, obj, field_name)
+
+    # the Value of property field_name of obj or its proto chain, for the var
+    # node expr_ast that reads it
+    def __get_property(self, expr_ast, obj, field_name):
+        shape = obj.shape
+        cached = expr_ast.shape_cache
+        if cached is not None and cached[0] is shape:
+            return obj.slots[cached[1]]
+        slot = shape.properties.get(field_name)
+        if slot is None:
             # check proto object
-            potential_proto = self.__process_proto(obj_name, field_name, num_args=None, calling_obj=calling_obj)
-            if potential_proto is not None:
-                return potential_proto
-            super().error(
-                ErrorType.NAME_ERROR, f"Object property {field_name} not found"
-            )
-        
-        # print(obj.properties[field_name])
-        return obj.properties[field_name]
+            holder = self.property_cache.lookup(expr_ast, field_name, obj)
+            if holder is None:
+                holder = self.__find_proto_holder(obj, field_name)
+                if holder is None:
+                    super().error(
+                        ErrorType.NAME_ERROR, f"Object property {field_name} not found"
+                    )
+                self.property_cache.store(expr_ast, field_name, obj, holder)
+            return holder.properties[field_name]
+
+        expr_ast.shape_cache = (shape, slot)
+        return obj.slots[slot]
 
     def __call_method(self, method_ast, calling_obj=None):
         # print("__call_method: ", calling_obj)
+        receiver, method_closure = self.__get_method(method_ast, calling_obj)
+        m_ast = method_closure.func_ast
+        new_env = {}
+        self.__prepare_env_with_closed_variables(method_closure, new_env)
+        self.__prepare_params(m_ast,method_ast, new_env)
+        # print("__call_method: ", obj_name)
+        if self.profiler is not None:
+            return self.__run_profiled("." + method_ast.name, m_ast, new_env, calling_obj=receiver)
+        return self.__run_function(m_ast.get("statements"), new_env, calling_obj=receiver)
+
+    # the receiver Value and the method closure a method call resolves to
+    def __get_method(self, method_ast, calling_obj=None):
         obj_name = method_ast.get("objref")
         # print("object name: ", obj_name)
-        if obj_name == "this":
-            obj_name = calling_obj
-        if obj_name not in self.objects.keys():
-            if self.env.get(obj_name) is not None:
-                super().error(
-                    ErrorType.TYPE_ERROR, f"{obj_name} is not an object"
-                )
-            super().error(
-                ErrorType.NAME_ERROR, f"Object {obj_name} not found"
-            )
-        obj = self.objects[obj_name]
+        receiver = self.__get_obj_ref(obj_name, calling_obj, f"{obj_name} is not an object")
+        obj = receiver.value()
         m_name = method_ast.get("name")
         # print("method name: ", m_name)
         num_args = len(method_ast.get("args"))
-        # check proto object
-        potential_proto = self.__process_proto(obj_name, m_name, num_args=num_args, calling_obj=calling_obj)
+        method_closure = None
+        holder = self.method_cache.lookup(method_ast, (m_name, num_args), obj)
+        if holder is not None:
+            method_closure = holder.methods[m_name][num_args].value()
+        if method_closure is None:
+            method_closure = self.__resolve_method(obj, method_ast, m_name, num_args)
+        return receiver, method_closure
+
+    # full lookup of a method on obj and its proto chain; own methods win, but
+    # the chain is walked first
+    def __resolve_method(self, obj, method_ast, m_name, num_args):
+        potential_proto = None
+        holder = self.__find_proto_holder(obj, m_name, num_args=num_args)
+        if holder is not None:
+            potential_proto = holder.methods[m_name][num_args].value()
         if potential_proto is not None:
             method_closure = potential_proto
         if m_name in obj.methods.keys():
+            holder = obj
             method_closure = obj.methods[m_name][num_args].value()
         if potential_proto is None and m_name not in obj.methods.keys():
             if m_name in obj.properties.keys():
@@ -405,20 +720,13 @@ class Interpreter(InterpreterBase):
             super().error(
                 ErrorType.NAME_ERROR, f"Object method {m_name} not found"
             )
-        m_ast = method_closure.func_ast
-        new_env = {}
-        self.__prepare_env_with_closed_variables(method_closure, new_env)
-        self.__prepare_params(m_ast,method_ast, new_env)
-        self.env.push(new_env)
-        # print("__call_method: ", obj_name)
-        _, return_val = self.__run_statements(m_ast.get("statements"), calling_obj=obj_name)
-        self.env.pop()
-        return return_val
+        if method_closure is not None:
+            self.method_cache.store(method_ast, (m_name, num_args), obj, holder)
+        return method_closure
 
-    def __process_proto(self, obj_name, field_or_method, num_args=None, calling_obj=None):
-        obj = self.objects[obj_name]
-        if obj_name == "this":
-            obj = self.objects[calling_obj]
+    # the first object on obj's proto chain that has field_or_method as a
+    # property (num_args None) or method, or None
+    def __find_proto_holder(self, obj, field_or_method, num_args=None):
         proto = obj.proto
         if proto is None:
             return None
@@ -427,16 +735,24 @@ class Interpreter(InterpreterBase):
             return None
         if num_args is None:    # property
             while proto is not None:
+                if self.pending_copies and id(proto) in self.pending_copies:
+                    self.cow.complete(proto)
+                if self.counters is not None:
+                    self.counters.proto_hops += 1
                 if field_or_method in proto.properties.keys():
-                    return proto.properties[field_or_method]
+                    return proto
                 proto = proto.proto
                 if proto is None:
                     return None
                 proto = proto.value()
         else:   # method
             while proto is not None:
+                if self.pending_copies and id(proto) in self.pending_copies:
+                    self.cow.complete(proto)
+                if self.counters is not None:
+                    self.counters.proto_hops += 1
                 if field_or_method in proto.methods.keys():
-                    return proto.methods[field_or_method][num_args].value()
+                    return proto
                 proto = proto.proto
                 if proto is None:
                     return None
@@ -444,9 +760,34 @@ class Interpreter(InterpreterBase):
                 
         return None
 
+    # the Value holding the object that obj_name refers to: the variable of
+    # that name, or for this the Value the running method was called through
+    def __get_obj_ref(self, obj_name, calling_obj, non_object_message):
+        if obj_name == "this" and calling_obj is not None:
+            obj_ref = calling_obj
+        else:
+            obj_ref = self.env.get(obj_name)
+        if obj_ref is None:
+            super().error(
+                ErrorType.NAME_ERROR, f"Object {obj_name} not found"
+            )
+        if obj_ref.type() != Type.OBJECT:
+            super().error(ErrorType.TYPE_ERROR, non_object_message)
+        # a pending copy gets its own fields before any are read or written
+        if self.pending_copies and id(obj_ref.value()) in self.pending_copies:
+            self.cow.complete(obj_ref.value())
+        return obj_ref
+
+    def __get_obj(self, obj_name, calling_obj, non_object_message):
+        return self.__get_obj_ref(obj_name, calling_obj, non_object_message).value()
+
     def __eval_name(self, name_ast):
-        var_name = name_ast.get("name")
-        val = self.env.get(var_name)
+        var_name = name_ast.name
+        depth = name_ast.depth
+        if depth is None:
+            val = self.env.get(var_name)
+        else:
+            val = self.env.get_at(depth, var_name)
         if val is not None:
             return val
         closure = self.__get_func_by_name(var_name, None)
@@ -454,37 +795,60 @@ class Interpreter(InterpreterBase):
             super().error(
                 ErrorType.NAME_ERROR, f"Variable/function {var_name} not found"
             )
-        return Value(Type.CLOSURE, closure)
+        return self.values.new(Type.CLOSURE, closure)
 
     
 
     def __eval_op(self, arith_ast, calling_obj=None):
-        left_value_obj = self.__eval_expr(arith_ast.get("op1"), calling_obj=calling_obj)
-        right_value_obj = self.__eval_expr(arith_ast.get("op2"), calling_obj=calling_obj)
+        left_value_obj = self.__eval_expr(arith_ast.op1, calling_obj=calling_obj)
+        if arith_ast.elem_type in Interpreter.LOGICAL_OPS:
+            result = self.__short_circuit(arith_ast.elem_type, left_value_obj)
+            if result is not None:
+                return result
+        right_value_obj = self.__eval_expr(arith_ast.op2, calling_obj=calling_obj)
 
         # print("LEFT: ", left_value_obj.value())
         # print("RIGHT: ", right_value_obj.value())
 
+        return self.__apply_bin_op(arith_ast.elem_type, left_value_obj, right_value_obj)
 
+    def __apply_bin_op(self, operation, left_value_obj, right_value_obj):
+        f = self.bin_op_table.get((operation, left_value_obj.t, right_value_obj.t))
+        if f is not None:
+            return f(left_value_obj, right_value_obj)
+        # the pair is an error; the checks below report which one
         left_value_obj, right_value_obj = self.__bin_op_promotion(
-            arith_ast.elem_type, left_value_obj, right_value_obj
+            operation, left_value_obj, right_value_obj
         )
 
         if not self.__compatible_types(
-            arith_ast.elem_type, left_value_obj, right_value_obj
+            operation, left_value_obj, right_value_obj
         ):
             super().error(
                 ErrorType.TYPE_ERROR,
-                f"Incompatible types for {arith_ast.elem_type} operation",
+                f"Incompatible types for {operation} operation",
             )
-        if arith_ast.elem_type not in self.op_to_lambda[left_value_obj.type()]:
+        if operation not in self.op_to_lambda[left_value_obj.type()]:
             super().error(
                 ErrorType.TYPE_ERROR,
-                f"Incompatible operator {arith_ast.elem_type} for type {left_value_obj.type()}",
+                f"Incompatible operator {operation} for type {left_value_obj.type()}",
             )
-        f = self.op_to_lambda[left_value_obj.type()][arith_ast.elem_type]
+        f = self.op_to_lambda[left_value_obj.type()][operation]
         return f(left_value_obj, right_value_obj)
 
+    # the result of left && right or left || right when the left operand alone
+    # decides it (false or 0 for &&, true or nonzero for ||), else None; the
+    # right operand is then never evaluated
+    def __short_circuit(self, operation, left_value_obj):
+        t = left_value_obj.t
+        if t != Type.BOOL and t != Type.INT:
+            return None
+        if operation == "&&" and not left_value_obj.v:
+            return FALSE
+        if operation == "||" and left_value_obj.v:
+            return TRUE
+        return None
+
     # bool and int, int and bool for and/or/==/!= -> coerce int to bool
     # bool and int, int and bool for arithmetic ops, coerce true to 1, false to 0
     def __bin_op_promotion(self, operation, op1, op2):
@@ -513,11 +877,11 @@ class Interpreter(InterpreterBase):
 
     @staticmethod
     def __int_to_bool(value):
-        return Value(Type.BOOL, value.value() != 0)
+        return TRUE if value.value() != 0 else FALSE
 
     @staticmethod
     def __bool_to_int(value):
-        return Value(Type.INT, 1 if value.value() else 0)
+        return ONE if value.value() else ZERO
 
     def __compatible_types(self, oper, obj1, obj2):
         # DOCUMENT: allow comparisons ==/!= of anything against anything
@@ -526,105 +890,108 @@ class Interpreter(InterpreterBase):
         return obj1.type() == obj2.type()
 
     def __eval_unary(self, arith_ast, t, f, calling_obj=None):
-        value_obj = self.__eval_expr(arith_ast.get("op1"), calling_obj=calling_obj)
-        value_obj = self.__unary_op_promotion(arith_ast.elem_type, value_obj)
+        value_obj = self.__eval_expr(arith_ast.op1, calling_obj=calling_obj)
+        return self.__apply_unary(arith_ast.elem_type, t, f, value_obj)
+
+    def __apply_unary(self, operation, t, f, value_obj):
+        value_obj = self.__unary_op_promotion(operation, value_obj)
 
         if value_obj.type() != t:
             super().error(
                 ErrorType.TYPE_ERROR,
-                f"Incompatible type for {arith_ast.elem_type} operation",
+                f"Incompatible type for {operation} operation",
             )
-        return Value(t, f(value_obj.value()))
+        return self.values.make(t, f(value_obj.value()))
 
     def __setup_ops(self):
         self.op_to_lambda = {}
+        # results are the shared bools and small ints where possible
+        ints = self.values.int
+        bools = self.values.bool
         # set up operations on integers
         self.op_to_lambda[Type.INT] = {}
-        self.op_to_lambda[Type.INT]["+"] = lambda x, y: Value(
-            x.type(), x.value() + y.value()
-        )
-        self.op_to_lambda[Type.INT]["-"] = lambda x, y: Value(
-            x.type(), x.value() - y.value()
-        )
-        self.op_to_lambda[Type.INT]["*"] = lambda x, y: Value(
-            x.type(), x.value() * y.value()
-        )
-        self.op_to_lambda[Type.INT]["/"] = lambda x, y: Value(
-            x.type(), x.value() // y.value()
-        )
-        self.op_to_lambda[Type.INT]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
-        )
-        self.op_to_lambda[Type.INT]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
-        )
-        self.op_to_lambda[Type.INT]["<"] = lambda x, y: Value(
-            Type.BOOL, x.value() < y.value()
-        )
-        self.op_to_lambda[Type.INT]["<="] = lambda x, y: Value(
-            Type.BOOL, x.value() <= y.value()
-        )
-        self.op_to_lambda[Type.INT][">"] = lambda x, y: Value(
-            Type.BOOL, x.value() > y.value()
-        )
-        self.op_to_lambda[Type.INT][">="] = lambda x, y: Value(
-            Type.BOOL, x.value() >= y.value()
-        )
+        self.op_to_lambda[Type.INT]["+"] = lambda x, y: ints(x.value() + y.value())
+        self.op_to_lambda[Type.INT]["-"] = lambda x, y: ints(x.value() - y.value())
+        self.op_to_lambda[Type.INT]["*"] = lambda x, y: ints(x.value() * y.value())
+        self.op_to_lambda[Type.INT]["/"] = lambda x, y: ints(x.value() // y.value())
+        self.op_to_lambda[Type.INT]["=="] = lambda x, y: bools(x.value() == y.value())
+        self.op_to_lambda[Type.INT]["!="] = lambda x, y: bools(x.value() != y.value())
+        self.op_to_lambda[Type.INT]["<"] = lambda x, y: bools(x.value() < y.value())
+        self.op_to_lambda[Type.INT]["<="] = lambda x, y: bools(x.value() <= y.value())
+        self.op_to_lambda[Type.INT][">"] = lambda x, y: bools(x.value() > y.value())
+        self.op_to_lambda[Type.INT][">="] = lambda x, y: bools(x.value() >= y.value())
         #  set up operations on strings
         self.op_to_lambda[Type.STRING] = {}
-        self.op_to_lambda[Type.STRING]["+"] = lambda x, y: Value(
+        self.op_to_lambda[Type.STRING]["+"] = lambda x, y: self.values.new(
             x.type(), x.value() + y.value()
         )
-        self.op_to_lambda[Type.STRING]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.STRING]["=="] = lambda x, y: bools(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.STRING]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
+        self.op_to_lambda[Type.STRING]["!="] = lambda x, y: bools(
+            x.value() != y.value()
         )
         #  set up operations on bools
         self.op_to_lambda[Type.BOOL] = {}
-        self.op_to_lambda[Type.BOOL]["&&"] = lambda x, y: Value(
-            x.type(), x.value() and y.value()
-        )
-        self.op_to_lambda[Type.BOOL]["||"] = lambda x, y: Value(
-            x.type(), x.value() or y.value()
-        )
-        self.op_to_lambda[Type.BOOL]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
-        )
-        self.op_to_lambda[Type.BOOL]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
-        )
+        self.op_to_lambda[Type.BOOL]["&&"] = lambda x, y: bools(x.value() and y.value())
+        self.op_to_lambda[Type.BOOL]["||"] = lambda x, y: bools(x.value() or y.value())
+        self.op_to_lambda[Type.BOOL]["=="] = lambda x, y: bools(x.value() == y.value())
+        self.op_to_lambda[Type.BOOL]["!="] = lambda x, y: bools(x.value() != y.value())
 
         #  set up operations on nil
         self.op_to_lambda[Type.NIL] = {}
-        self.op_to_lambda[Type.NIL]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
-        )
-        self.op_to_lambda[Type.NIL]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
-        )
+        self.op_to_lambda[Type.NIL]["=="] = lambda x, y: bools(x.value() == y.value())
+        self.op_to_lambda[Type.NIL]["!="] = lambda x, y: bools(x.value() != y.value())
 
         #  set up operations on closures
         self.op_to_lambda[Type.CLOSURE] = {}
-        self.op_to_lambda[Type.CLOSURE]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.CLOSURE]["=="] = lambda x, y: bools(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.CLOSURE]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
+        self.op_to_lambda[Type.CLOSURE]["!="] = lambda x, y: bools(
+            x.value() != y.value()
         )
 
         #  set up operations on objects
         self.op_to_lambda[Type.OBJECT] = {}
-        self.op_to_lambda[Type.OBJECT]["=="] = lambda x, y: Value(
-            Type.BOOL, x.value() == y.value()
+        self.op_to_lambda[Type.OBJECT]["=="] = lambda x, y: bools(
+            x.value() == y.value()
         )
-        self.op_to_lambda[Type.OBJECT]["!="] = lambda x, y: Value(
-            Type.BOOL, x.value() != y.value()
+        self.op_to_lambda[Type.OBJECT]["!="] = lambda x, y: bools(
+            x.value() != y.value()
         )
 
+    # (operator, left type, right type) -> the op_to_lambda entry the operands
+    # end up at, with __bin_op_promotion applied ahead of time, for every type
+    # pair __apply_bin_op accepts; pairs that are errors are left out
+    def __setup_bin_op_table(self):
+        self.bin_op_table = {}
+        types = list(self.op_to_lambda)
+        for operation in Interpreter.BIN_OPS:
+            for left_type in types:
+                for right_type in types:
+                    f = self.__specialize_bin_op(operation, left_type, right_type)
+                    if f is not None:
+                        self.bin_op_table[(operation, left_type, right_type)] = f
+
+    def __specialize_bin_op(self, operation, left_type, right_type):
+        # promotion and the type checks only look at the operands' types
+        left_probe, right_probe = Value(left_type), Value(right_type)
+        left, right = self.__bin_op_promotion(operation, left_probe, right_probe)
+        if not self.__compatible_types(operation, left, right):
+            return None
+        if operation not in self.op_to_lambda[left.t]:
+            return None
+        f = self.op_to_lambda[left.t][operation]
+        if left is left_probe and right is right_probe:
+            return f
+        # mixed int and bool operands; promotion may take several steps (an int
+        # compared with a bool becomes a bool, then an int), so it is kept whole
+        promote = self.__bin_op_promotion
+        return lambda x, y: f(*promote(operation, x, y))
+
     def __do_if(self, if_ast, calling_obj=None):
-        cond_ast = if_ast.get("condition")
+        cond_ast = if_ast.condition
         result = self.__eval_expr(cond_ast, calling_obj=calling_obj)
         if result.type() == Type.INT:
             result = Interpreter.__int_to_bool(result)
@@ -634,11 +1001,11 @@ class Interpreter(InterpreterBase):
                 "Incompatible type for if condition",
             )
         if result.value():
-            statements = if_ast.get("statements")
+            statements = if_ast.statements
             status, return_val = self.__run_statements(statements)
             return (status, return_val)
         else:
-            else_statements = if_ast.get("else_statements")
+            else_statements = if_ast.else_statements
             if else_statements is not None:
                 status, return_val = self.__run_statements(else_statements)
                 return (status, return_val)
@@ -646,7 +1013,7 @@ class Interpreter(InterpreterBase):
         return (ExecStatus.CONTINUE, Interpreter.NIL_VALUE)
 
     def __do_while(self, while_ast, calling_obj=None):
-        cond_ast = while_ast.get("condition")
+        cond_ast = while_ast.condition
         run_while = Interpreter.TRUE_VALUE
         while run_while.value():
             run_while = self.__eval_expr(cond_ast, calling_obj=calling_obj)
@@ -658,7 +1025,7 @@ class Interpreter(InterpreterBase):
                     "Incompatible type for while condition",
                 )
             if run_while.value():
-                statements = while_ast.get("statements")
+                statements = while_ast.statements
                 status, return_val = self.__run_statements(statements)
                 if status == ExecStatus.RETURN:
                     return status, return_val
@@ -666,8 +1033,427 @@ class Interpreter(InterpreterBase):
         return (ExecStatus.CONTINUE, Interpreter.NIL_VALUE)
 
     def __do_return(self, return_ast, calling_obj=None):
-        expr_ast = return_ast.get("expression")
+        expr_ast = return_ast.expression
         if expr_ast is None:
             return (ExecStatus.RETURN, Interpreter.NIL_VALUE)
-        value_obj = copy.deepcopy(self.__eval_expr(expr_ast, calling_obj=calling_obj))
+        # main has no frame of its own to reuse
+        if self.frame_bases and self.__is_tail_call_site(expr_ast):
+            target_ast, new_env = self.__bind_call(expr_ast)
+            return self.__tail_call(expr_ast.name, target_ast, new_env)
+        value_obj = self.copy_value(self.__eval_expr(expr_ast, calling_obj=calling_obj))
         return (ExecStatus.RETURN, value_obj)
+
+    # compiled engine: each AST node is turned into a Python closure the first time
+    # it runs, so later executions skip the elem_type dispatch in __walk_statements
+    # and __walk_expr. Only calls to print and inputi are left to the tree walker.
+    def __get_compiled_block(self, statements):
+        code = self.compiled_code.get(id(statements))
+        if code is None:
+            code = self.__compile_block(statements)
+            self.compiled_code[id(statements)] = code
+        return code
+
+    def __get_compiled_expr(self, expr_ast):
+        code = self.compiled_code.get(id(expr_ast))
+        if code is None:
+            code = self.__compile_expr(expr_ast)
+            self.compiled_code[id(expr_ast)] = code
+        return code
+
+    def __compile_block(self, statements):
+        compiled = [
+            (statement, self.__compile_statement(statement)) for statement in statements
+        ]
+        if self.counters is not None:
+            compiled = [
+                (statement, self.__count_statement(statement.elem_type, code))
+                for statement, code in compiled
+            ]
+        continue_result = (ExecStatus.CONTINUE, Interpreter.NIL_VALUE)
+
+        def run_block(calling_obj):
+            env = self.env
+            env.push()
+            for statement, code in compiled:
+                if self.trace_output:
+                    self.flush_output()  # keep the trace in step with the output
+                    print(statement)
+                result = code(calling_obj)
+                if result is not None and result[0] == ExecStatus.RETURN:
+                    env.pop()
+                    return result
+            env.pop()
+            return continue_result
+
+        return run_block
+
+    # code that counts a statement of type kind as executed, then runs it
+    def __count_statement(self, kind, code):
+        count_statement = self.counters.count_statement
+
+        def run_counted(calling_obj):
+            count_statement(kind)
+            return code(calling_obj)
+
+        return run_counted
+
+    def __compile_statement(self, statement):
+        kind = statement.elem_type
+        if kind == InterpreterBase.FCALL_DEF:
+            call = self.__compile_expr(statement)
+
+            def run_call(calling_obj):
+                call(calling_obj)
+
+            return run_call
+        if kind == "=":
+            return self.__compile_assign(statement)
+        if kind == InterpreterBase.RETURN_DEF:
+            return self.__compile_return(statement)
+        if kind == InterpreterBase.IF_DEF:
+            return self.__compile_if(statement)
+        if kind == InterpreterBase.WHILE_DEF:
+            return self.__compile_while(statement)
+        if kind == InterpreterBase.MCALL_DEF:
+            call = self.__compile_method_call(statement, pass_calling_obj=True)
+
+            def run_mcall(calling_obj):
+                call(calling_obj)
+
+            return run_mcall
+        # any other expression statement is ignored, as in __walk_statements
+        return lambda calling_obj: None
+
+    def __compile_assign(self, assign_ast):
+        var_name = assign_ast.get("name")
+        expr = self.__compile_expr(assign_ast.get("expression"))
+        depth = assign_ast.get("depth")
+        # mirrors __add_to_obj
+        if "." in var_name:
+            return self.__compile_field_assign(assign_ast, expr)
+        if var_name == "this":
+
+            def run_this_assign(calling_obj):
+                self.__assign_this(copy.copy(expr(calling_obj)), depth, calling_obj)
+
+            return run_this_assign
+
+        def run_assign(calling_obj):
+            self.__assign_value(var_name, copy.copy(expr(calling_obj)), depth)
+
+        return run_assign
+
+    # a property store to an object with the shape last seen here writes its
+    # slot, or takes the shape transition, directly; anything else (methods,
+    # proto, other shapes) goes through __set_field
+    def __compile_field_assign(self, assign_ast, expr):
+        var_name = assign_ast.get("name")
+        field_name = var_name.split(".")[1]
+        get_field_owner = self.__get_field_owner
+        set_field = self.__set_field
+        if field_name == "proto":
+
+            def run_proto_assign(calling_obj):
+                set_field(get_field_owner(var_name, calling_obj), field_name, expr(calling_obj))
+
+            return run_proto_assign
+        pending_copies = self.pending_copies
+        unshared = self.unshared
+        property_cache = self.property_cache
+
+        def run_field_assign(calling_obj):
+            obj = get_field_owner(var_name, calling_obj)
+            val = expr(calling_obj)
+            shape = obj.shape
+            cached = assign_ast.shape_cache
+            if cached is None or cached[0] is not shape or val.t == Type.CLOSURE:
+                set_field(obj, field_name, val)
+                if val.t != Type.CLOSURE:
+                    assign_ast.shape_cache = (
+                        shape, obj.shape.properties[field_name], None if obj.shape is shape else obj.shape
+                    )
+                return
+            if pending_copies:
+                self.cow.settle()
+            if cached[2] is None:
+                obj.slots[cached[1]] = unshared(val)
+            else:
+                property_cache.object_changed(obj)
+                obj.extend(cached[2], unshared(val))
+
+        return run_field_assign
+
+    def __compile_condition(self, cond_ast, description):
+        cond = self.__compile_expr(cond_ast)
+
+        def run_condition(calling_obj):
+            result = cond(calling_obj)
+            if result.type() == Type.INT:
+                return result.value() != 0
+            if result.type() != Type.BOOL:
+                self.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Incompatible type for {description} condition",
+                )
+            return result.value()
+
+        return run_condition
+
+    def __compile_if(self, if_ast):
+        cond = self.__compile_condition(if_ast.get("condition"), "if")
+        then_block = self.__get_compiled_block(if_ast.get("statements"))
+        else_statements = if_ast.get("else_statements")
+        else_block = None
+        if else_statements is not None:
+            else_block = self.__get_compiled_block(else_statements)
+
+        def run_if(calling_obj):
+            if cond(calling_obj):
+                return then_block(None)
+            if else_block is not None:
+                return else_block(None)
+            return None
+
+        return run_if
+
+    def __compile_while(self, while_ast):
+        cond = self.__compile_condition(while_ast.get("condition"), "while")
+        body = self.__get_compiled_block(while_ast.get("statements"))
+
+        def run_while(calling_obj):
+            while cond(calling_obj):
+                result = body(None)
+                if result[0] == ExecStatus.RETURN:
+                    return result
+            return None
+
+        return run_while
+
+    def __compile_return(self, return_ast):
+        expr_ast = return_ast.get("expression")
+        if expr_ast is None:
+            nil_result = (ExecStatus.RETURN, Interpreter.NIL_VALUE)
+            return lambda calling_obj: nil_result
+        if self.__is_tail_call_site(expr_ast):
+            return self.__compile_call(expr_ast, tail=True)
+        expr = self.__compile_expr(expr_ast)
+
+        def run_return(calling_obj):
+            return (ExecStatus.RETURN, self.copy_value(expr(calling_obj)))
+
+        return run_return
+
+    def __compile_expr(self, expr_ast):
+        kind = expr_ast.elem_type
+        if kind == InterpreterBase.NIL_DEF:
+            return lambda calling_obj: Interpreter.NIL_VALUE
+        if kind in Interpreter.LITERAL_DEFS:
+            const = expr_ast.const
+            return lambda calling_obj: const
+        if kind == InterpreterBase.VAR_DEF:
+            if "." in expr_ast.get("name"):
+                return self.__compile_field(expr_ast)
+            return self.__compile_name(expr_ast)
+        if kind == InterpreterBase.FCALL_DEF and expr_ast.get("name") not in ("print", "inputi"):
+            return self.__compile_call(expr_ast)
+        if kind in Interpreter.BIN_OPS:
+            return self.__compile_bin_op(expr_ast)
+        if kind == InterpreterBase.NEG_DEF:
+            return self.__compile_unary(expr_ast, Type.INT, lambda x: -1 * x)
+        if kind == InterpreterBase.NOT_DEF:
+            return self.__compile_unary(expr_ast, Type.BOOL, lambda x: not x)
+        if kind == InterpreterBase.LAMBDA_DEF:
+            return self.__compile_lambda(expr_ast)
+        if kind == InterpreterBase.OBJ_DEF:
+            return self.__compile_obj_def()
+        if kind == InterpreterBase.MCALL_DEF:
+            # method calls in expressions run without the calling object, as in __walk_expr
+            return self.__compile_method_call(expr_ast, pass_calling_obj=False)
+        return lambda calling_obj: self.__walk_expr(expr_ast, calling_obj=calling_obj)
+
+    # mirrors __create_obj
+    def __compile_obj_def(self):
+        heap = self.heap
+        collection_due = heap.collection_due
+        allocate = heap.allocate
+        new = self.values.new
+
+        def run_obj_def(calling_obj):
+            if collection_due():
+                self.cow.settle()
+                heap.collect([self.env, self.call_roots])
+            return new(Type.OBJECT, allocate())
+
+        return run_obj_def
+
+    def __compile_name(self, name_ast):
+        var_name = name_ast.get("name")
+        depth = name_ast.get("depth")
+        if depth is not None:
+
+            def run_local(calling_obj):
+                val = self.env.get_at(depth, var_name)
+                if val is not None:
+                    return val
+                return self.__eval_name(name_ast)
+
+            return run_local
+
+        def run_name(calling_obj):
+            val = self.env.get(var_name)
+            if val is not None:
+                return val
+            return self.__eval_name(name_ast)
+
+        return run_name
+
+    def __compile_bin_op(self, arith_ast):
+        operation = arith_ast.elem_type
+        left = self.__compile_expr(arith_ast.get("op1"))
+        right = self.__compile_expr(arith_ast.get("op2"))
+        apply_bin_op = self.__apply_bin_op
+        if operation in Interpreter.LOGICAL_OPS:
+            short_circuit = self.__short_circuit
+
+            def run_logical(calling_obj):
+                left_value_obj = left(calling_obj)
+                result = short_circuit(operation, left_value_obj)
+                if result is not None:
+                    return result
+                return apply_bin_op(operation, left_value_obj, right(calling_obj))
+
+            return run_logical
+        table = self.bin_op_table
+
+        # __apply_bin_op with the table lookup inlined
+        def run_bin_op(calling_obj):
+            left_value_obj = left(calling_obj)
+            right_value_obj = right(calling_obj)
+            f = table.get((operation, left_value_obj.t, right_value_obj.t))
+            if f is not None:
+                return f(left_value_obj, right_value_obj)
+            return apply_bin_op(operation, left_value_obj, right_value_obj)
+
+        return run_bin_op
+
+    def __compile_unary(self, arith_ast, t, f):
+        operation = arith_ast.elem_type
+        # operands of unary ops are evaluated without the calling object, see __eval_unary
+        operand = self.__compile_expr(arith_ast.get("op1"))
+        return lambda calling_obj: self.__apply_unary(operation, t, f, operand(None))
+
+    # __prepare_params, with the code of each argument in args
+    def __bind_compiled_args(self, target_ast, args, new_env):
+        formal_args = target_ast.args
+        if len(args) != len(formal_args):
+            self.error(
+                ErrorType.NAME_ERROR,
+                f"Function {target_ast.get('name')} with {len(args)} args not found",
+            )
+        self.call_roots.append(new_env)
+        for formal_ast, arg in zip(formal_args, args):
+            is_ref = formal_ast.elem_type == InterpreterBase.REFARG_DEF
+            result = arg(None)
+            if not is_ref:
+                result = self.copy_value(result)
+            else:
+                result = self.unshared(result)
+            new_env[formal_ast.name] = result
+        self.call_roots.pop()
+
+    # mirrors __get_obj_val, with the name split once
+    def __compile_field(self, field_ast):
+        n = field_ast.get("name").split(".")
+        obj_name = n[0]
+        field_name = n[1]
+        message = f"dot operator used on non-object {obj_name}"
+        get_obj = self.__get_obj
+        if field_name == "proto":
+            return lambda calling_obj: get_obj(obj_name, calling_obj, message).proto
+        get_property = self.__get_property
+
+        def run_field(calling_obj):
+            obj = get_obj(obj_name, calling_obj, message)
+            cached = field_ast.shape_cache
+            if cached is not None and cached[0] is obj.shape:
+                return obj.slots[cached[1]]
+            return get_property(field_ast, obj, field_name)
+
+        return run_field
+
+    def __compile_lambda(self, lambda_ast):
+        free_vars = lambda_ast.free_vars
+
+        def run_lambda(calling_obj):
+            if self.pending_copies:
+                self.cow.settle()
+            closure = Closure(lambda_ast, self.__capture(free_vars))
+            self.heap.track_closure(closure)
+            return self.values.new(Type.CLOSURE, closure)
+
+        return run_lambda
+
+    # mirrors __call_method, with the arguments precompiled; the calling object
+    # is only used to resolve the receiver if pass_calling_obj is set
+    def __compile_method_call(self, method_ast, pass_calling_obj):
+        args = [self.__compile_expr(actual_ast) for actual_ast in method_ast.get("args")]
+        profile_name = "." + method_ast.name
+
+        def run_method_call(calling_obj):
+            receiver, method_closure = self.__get_method(
+                method_ast, calling_obj if pass_calling_obj else None
+            )
+            m_ast = method_closure.func_ast
+            new_env = {}
+            self.__prepare_env_with_closed_variables(method_closure, new_env)
+            self.__bind_compiled_args(m_ast, args, new_env)
+            if self.profiler is not None:
+                return self.__run_profiled(profile_name, m_ast, new_env, calling_obj=receiver)
+            return self.__run_function(m_ast.statements, new_env, calling_obj=receiver)
+
+        return run_method_call
+
+    # with tail set, the code of `return <call>`, see __do_return
+    def __compile_call(self, call_ast, tail=False):
+        func_name = call_ast.get("name")
+        actual_args = call_ast.get("args")
+        num_args = len(actual_args)
+        args = [self.__compile_expr(actual_ast) for actual_ast in actual_args]
+
+        # mirrors __bind_call and __prepare_params, with the arguments precompiled
+        def bind_call():
+            target_closure = self.__get_func_by_name(func_name, num_args)
+            if target_closure == None:
+                self.error(
+                    ErrorType.NAME_ERROR, f"Function {func_name} not found"
+                )
+            if target_closure.type != Type.CLOSURE:
+                self.error(
+                    ErrorType.TYPE_ERROR,
+                    f"Function {func_name} is changed to non-function type.",
+                )
+            target_ast = target_closure.func_ast
+            new_env = {}
+            self.__prepare_env_with_closed_variables(target_closure, new_env)
+            self.__bind_compiled_args(target_ast, args, new_env)
+            return target_ast, new_env
+
+        def run_call(calling_obj):
+            target_ast, new_env = bind_call()
+            if self.memo is not None and id(target_ast) in self.memo.pure_functions:
+                return self.__call_pure(func_name, target_ast, new_env)
+            if self.profiler is not None:
+                return self.__run_profiled(func_name, target_ast, new_env)
+            return self.__run_function(target_ast.statements, new_env)
+
+        if not tail:
+            return run_call
+
+        def run_tail_call(calling_obj):
+            # main has no frame of its own to reuse
+            if not self.frame_bases:
+                return (ExecStatus.RETURN, self.copy_value(run_call(calling_obj)))
+            target_ast, new_env = bind_call()
+            return self.__tail_call(func_name, target_ast, new_env)
+
+        return run_tail_call
@@ -0,0 +1,181 @@
+# Memoization of pure Brewin functions.
+#
+# find_pure_functions picks out the top-level functions whose result depends on
+# nothing but their argument values, and whose calls have no effect other
+# than returning it, so a call can be answered from a MemoCache instead of
+# being run. The bar is higher than "no print/inputi, no object mutation, no
+# ref args". Scoping is dynamic: a callee sees its callers' variables, and an
+# assignment to a name that isn't a param updates the first binding it finds,
+# even in a caller (see resolverv4.py). So a pure function
+#   * takes no ref args, and reads and assigns only its own params;
+#   * doesn't create objects or lambdas, or use fields or methods;
+#   * calls print and inputi nowhere, and calls other functions only by the
+#     name of a top-level function with that many params, which must be pure
+#     as well (a fixed point, so recursion is fine).
+#
+# A call is looked up by function name, arity and argument values (with their
+# types, so 1 and true differ). Only calls whose args are ints, strings, bools
+# or nil are cached, and only results of those types are kept. Cached results
+# are InternedValues (see internv4.py), so the caller can't change them.
+from collections import OrderedDict
+
+from intbase import InterpreterBase
+from internv4 import InternedValue
+from type_valuev4 import Type
+
+KEY_TYPES = {Type.INT, Type.STRING, Type.BOOL, Type.NIL}
+BUILTINS = {"print", "inputi"}
+# by default, entries kept before the least recently used is evicted
+MEMO_SIZE = 4096
+
+
+# the pure FuncNodes of ast, by id
+def find_pure_functions(ast):
+    functions = {}
+    for func_def in ast.get("functions"):
+        functions.setdefault(func_def.get("name"), {})[len(func_def.get("args"))] = func_def
+    callees = {}  # id(func_def) -> ids of the functions it calls
+    for func_def in ast.get("functions"):
+        called = _PurityCheck(func_def, functions).run()
+        if called is not None:
+            callees[id(func_def)] = called
+    pure = set(callees)
+    changed = True
+    while changed:
+        changed = False
+        for key in list(pure):
+            if not callees[key] <= pure:
+                pure.discard(key)
+                changed = True
+    return {id(func_def): func_def for func_def in ast.get("functions") if id(func_def) in pure}
+
+
+# the ids of the functions func_def calls if it is pure apart from them, else None
+class _PurityCheck:
+    def __init__(self, func_def, functions):
+        self.functions = functions
+        self.func_def = func_def
+        self.params = set()
+        self.called = set()
+
+    def run(self):
+        for arg in self.func_def.get("args"):
+            if arg.elem_type == InterpreterBase.REFARG_DEF:
+                return None
+            self.params.add(arg.get("name"))
+        if not self.__block(self.func_def.get("statements")):
+            return None
+        return self.called
+
+    def __block(self, statements):
+        return all(self.__statement(statement) for statement in statements)
+
+    def __statement(self, statement):
+        kind = statement.elem_type
+        if kind == "=":
+            return statement.get("name") in self.params and self.__expr(
+                statement.get("expression")
+            )
+        if kind == InterpreterBase.IF_DEF:
+            return (
+                self.__expr(statement.get("condition"))
+                and self.__block(statement.get("statements"))
+                and self.__block(statement.get("else_statements") or [])
+            )
+        if kind == InterpreterBase.WHILE_DEF:
+            return self.__expr(statement.get("condition")) and self.__block(
+                statement.get("statements")
+            )
+        if kind == InterpreterBase.RETURN_DEF:
+            expr_ast = statement.get("expression")
+            return expr_ast is None or self.__expr(expr_ast)
+        if kind == InterpreterBase.FCALL_DEF:
+            return self.__expr(statement)
+        # method calls, and anything else
+        return False
+
+    def __expr(self, expr_ast):
+        kind = expr_ast.elem_type
+        if kind in (
+            InterpreterBase.INT_DEF,
+            InterpreterBase.STRING_DEF,
+            InterpreterBase.BOOL_DEF,
+            InterpreterBase.NIL_DEF,
+        ):
+            return True
+        if kind == InterpreterBase.VAR_DEF:
+            return expr_ast.get("name") in self.params
+        if kind == InterpreterBase.FCALL_DEF:
+            return self.__call(expr_ast)
+        if kind in (InterpreterBase.NEG_DEF, InterpreterBase.NOT_DEF):
+            return self.__expr(expr_ast.get("op1"))
+        if expr_ast.get("op1") is not None and expr_ast.get("op2") is not None:
+            # binary operators
+            return self.__expr(expr_ast.get("op1")) and self.__expr(expr_ast.get("op2"))
+        # lambdas, @ and method calls
+        return False
+
+    def __call(self, call_ast):
+        func_name = call_ast.get("name")
+        if func_name in BUILTINS:
+            return False
+        # names of top-level functions are looked up before variables, so the
+        # callee is known; anything else is a closure in a variable
+        func_def = self.functions.get(func_name, {}).get(len(call_ast.get("args")))
+        if func_def is None:
+            return False
+        self.called.add(id(func_def))
+        return all(self.__expr(arg) for arg in call_ast.get("args"))
+
+
+# the key of a call of func_ast with the Values args, or None if it isn't cached
+def memo_key(func_ast, args):
+    values = []
+    for value in args:
+        if value.t not in KEY_TYPES:
+            return None
+        values.append((value.t, value.v))
+    return (func_ast.name, len(values), tuple(values))
+
+
+class MemoCache:
+    def __init__(self, pure_functions, max_size=MEMO_SIZE):
+        self.pure_functions = pure_functions  # see find_pure_functions
+        self.max_size = max_size
+        self.entries = OrderedDict()  # key -> InternedValue, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # the cached result for key, or None
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, value):
+        if value.t not in KEY_TYPES or self.max_size <= 0:
+            return
+        self.entries[key] = InternedValue(value.t, value.v)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "pure_functions": sorted(
+                f"{func_def.name}/{len(func_def.args)}"
+                for func_def in self.pure_functions.values()
+            ),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+        }
@@ -0,0 +1,158 @@
+# AST optimizer, run on the parsed program before the resolver when the
+# interpreter is created with optimize=True. It rewrites, in place:
+#   * operators whose operands are all literals into the literal they evaluate
+#     to (e.g. 3 * 4 + x -> 12 + x, !true -> false);
+#   * if statements with a literal condition into the branch that runs, and
+#     while (false) loops into nothing;
+#   * !!e into e when e always yields a bool (comparisons, &&, ||, !).
+# Folding calls back into the interpreter to evaluate the operator, so the
+# promotion rules are exactly the ones used at runtime. An operator that raises
+# when evaluated (e.g. 1 + "a", 1 / 0) is left alone, so the program still fails
+# at the same point.
+from element import BinaryOpNode, IfNode, ValueNode
+from intbase import InterpreterBase
+from type_valuev4 import Type
+
+LITERAL_TYPES = {
+    InterpreterBase.INT_DEF: Type.INT,
+    InterpreterBase.STRING_DEF: Type.STRING,
+    InterpreterBase.BOOL_DEF: Type.BOOL,
+}
+LITERAL_DEFS = {t: elem_type for elem_type, t in LITERAL_TYPES.items()}
+BOOL_RESULT_OPS = {"==", "!=", "<", "<=", ">", ">=", "&&", "||", InterpreterBase.NOT_DEF}
+
+FOLD = "fold"
+DEAD_IF = "dead-if"
+DEAD_WHILE = "dead-while"
+DOUBLE_NOT = "double-not"
+
+
+def is_literal(expr_ast):
+    return (
+        expr_ast.elem_type in LITERAL_TYPES
+        or expr_ast.elem_type == InterpreterBase.NIL_DEF
+    )
+
+
+class Optimizer:
+    # evaluate(expr_ast) evaluates an expression whose operands are literals
+    # and returns its Value, or raises as the interpreter would
+    def __init__(self, evaluate):
+        self.evaluate = evaluate
+        self.rewrites = []  # (kind, function name, description)
+        self.func_name = None
+
+    def optimize(self, ast):
+        for func_def in ast.get("functions"):
+            self.func_name = func_def.get("name")
+            func_def.set("statements", self.__block(func_def.get("statements")))
+        return ast
+
+    # number of rewrites of each kind
+    def counts(self):
+        counts = {}
+        for kind, _, _ in self.rewrites:
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def __record(self, kind, description):
+        self.rewrites.append((kind, self.func_name, description))
+
+    def __block(self, statements):
+        optimized = []
+        for statement in statements:
+            optimized.extend(self.__statement(statement))
+        return optimized
+
+    # returns the statements that replace statement in its block
+    def __statement(self, statement):
+        kind = statement.elem_type
+        if kind == "=":
+            statement.expression = self.__expr(statement.expression)
+        elif kind == InterpreterBase.RETURN_DEF:
+            if statement.expression is not None:
+                statement.expression = self.__expr(statement.expression)
+        elif kind == InterpreterBase.IF_DEF:
+            return self.__if(statement)
+        elif kind == InterpreterBase.WHILE_DEF:
+            statement.condition = self.__expr(statement.condition)
+            if self.__condition_value(statement.condition) is False:
+                self.__record(DEAD_WHILE, "removed while loop with false condition")
+                return []
+            statement.statements = self.__block(statement.statements)
+        else:
+            return [self.__expr(statement)]
+        return [statement]
+
+    def __if(self, if_ast):
+        if_ast.condition = self.__expr(if_ast.condition)
+        if_ast.statements = self.__block(if_ast.statements)
+        if if_ast.else_statements is not None:
+            if_ast.else_statements = self.__block(if_ast.else_statements)
+        taken = self.__condition_value(if_ast.condition)
+        if taken is None:
+            return [if_ast]
+        branch = if_ast.statements if taken else if_ast.else_statements
+        if branch is None:
+            self.__record(DEAD_IF, "removed if statement with false condition")
+            return []
+        self.__record(DEAD_IF, f"kept only the {'if' if taken else 'else'} branch")
+        # a branch runs in its own scope, so it can only be inlined into the
+        # enclosing block if it cannot create variables there
+        if all(statement.elem_type != "=" for statement in branch):
+            return branch
+        return [
+            IfNode(
+                condition=ValueNode(InterpreterBase.BOOL_DEF, val=True),
+                statements=branch,
+                else_statements=None,
+            )
+        ]
+
+    # the truth value of a literal condition as __do_if/__do_while see it, or
+    # None if it is not a literal or would be a type error
+    def __condition_value(self, cond_ast):
+        if cond_ast.elem_type == InterpreterBase.BOOL_DEF:
+            return cond_ast.val
+        if cond_ast.elem_type == InterpreterBase.INT_DEF:
+            return cond_ast.val != 0
+        return None
+
+    def __expr(self, expr_ast):
+        kind = expr_ast.elem_type
+        if kind in (InterpreterBase.FCALL_DEF, InterpreterBase.MCALL_DEF):
+            expr_ast.args = [self.__expr(arg) for arg in expr_ast.args]
+            return expr_ast
+        if kind == InterpreterBase.LAMBDA_DEF:
+            expr_ast.statements = self.__block(expr_ast.statements)
+            return expr_ast
+        if isinstance(expr_ast, BinaryOpNode):
+            expr_ast.op1 = self.__expr(expr_ast.op1)
+            expr_ast.op2 = self.__expr(expr_ast.op2)
+            if is_literal(expr_ast.op1) and is_literal(expr_ast.op2):
+                return self.__fold(expr_ast)
+            return expr_ast
+        if kind in (InterpreterBase.NEG_DEF, InterpreterBase.NOT_DEF):
+            expr_ast.op1 = self.__expr(expr_ast.op1)
+            if is_literal(expr_ast.op1):
+                return self.__fold(expr_ast)
+            inner = expr_ast.op1
+            if (
+                kind == InterpreterBase.NOT_DEF
+                and inner.elem_type == InterpreterBase.NOT_DEF
+                and inner.op1.elem_type in BOOL_RESULT_OPS
+            ):
+                self.__record(DOUBLE_NOT, f"removed double negation of {inner.op1.elem_type}")
+                return inner.op1
+            return expr_ast
+        return expr_ast
+
+    def __fold(self, expr_ast):
+        try:
+            value = self.evaluate(expr_ast)
+        except Exception:  # pylint: disable=broad-except
+            return expr_ast  # raises at runtime instead
+        if value is None or value.type() not in LITERAL_DEFS:
+            return expr_ast
+        self.__record(FOLD, f"folded {expr_ast.elem_type} to {value.value()}")
+        return ValueNode(LITERAL_DEFS[value.type()], val=value.value())
@@ -0,0 +1,178 @@
+# Output pipeline for InterpreterBase.output.
+#
+# Each line a program prints goes to two places: a sink, which is where the
+# program's output is shown, and the output log, which get_output() returns.
+#
+# The sink is the console (sys.stdout), a file or a callback. Lines for it are
+# collected in an OutputBuffer and written in one piece once buffer_size
+# characters are pending, instead of with one print() call per line. The
+# buffer is flushed when a run ends, including when it ends with an error,
+# before input is read from the keyboard (so a prompt is shown before the
+# program waits for it), and when flush_output() is called. A buffer_size of 0
+# writes each line as it is printed, as print() did.
+#
+# The log is a list of every line by default. With a log_limit it is bounded:
+# a RingLog keeps only the last log_limit lines, and a SpillLog keeps at most
+# log_limit lines in memory and moves the rest to a temporary file, from which
+# get_output() reads them back.
+import collections
+import marshal
+import os
+import sys
+
+# characters of output buffered before they are written to the sink
+OUTPUT_BUFFER = 1 << 16
+RING = "ring"
+SPILL = "spill"
+LOG_MODES = (RING, SPILL)
+
+
+# writes to whatever sys.stdout is at the time, so redirect_stdout still works
+class ConsoleSink:
+    def write(self, text):
+        sys.stdout.write(text)
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
+
+
+class FileSink:
+    def __init__(self, path):
+        self.handle = open(path, "w", encoding="utf-8")
+
+    def write(self, text):
+        self.handle.write(text)
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+
+# callback(text) is called with one or more lines, each ending in "\n"
+class CallbackSink:
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, text):
+        self.callback(text)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# a sink for sink: a path is a FileSink, a callable a CallbackSink, and
+# anything else is used as it is (it needs write, flush and close)
+def make_sink(sink):
+    if isinstance(sink, (str, os.PathLike)):
+        return FileSink(sink)
+    if callable(sink):
+        return CallbackSink(sink)
+    return sink
+
+
+class OutputBuffer:
+    def __init__(self, sink, buffer_size=OUTPUT_BUFFER):
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_chars = 0
+
+    def write(self, line):
+        line = str(line)
+        self.pending.append(line)
+        self.pending_chars += len(line) + 1
+        if self.pending_chars >= self.buffer_size:
+            self.__drain()
+
+    def __drain(self):
+        if self.pending:
+            self.pending.append("")
+            self.sink.write("\n".join(self.pending))
+            self.pending = []
+            self.pending_chars = 0
+
+    def flush(self):
+        self.__drain()
+        self.sink.flush()
+
+    def close(self):
+        self.__drain()
+        self.sink.close()
+
+
+# the last limit lines printed
+class RingLog:
+    def __init__(self, limit):
+        self.lines = collections.deque(maxlen=limit)
+        self.dropped = 0  # lines pushed out of the ring
+
+    def append(self, line):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+
+    def get_lines(self):
+        return list(self.lines)
+
+    def close(self):
+        pass
+
+
+# every line printed, at most limit of them in memory; the others are
+# marshalled to a temporary file in chunks of limit lines
+class SpillLog:
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self.lines = []
+        self.spill_file = None
+        self.spilled = 0  # lines in the spill file
+
+    def append(self, line):
+        self.lines.append(line)
+        if len(self.lines) >= self.limit:
+            if self.spill_file is None:
+                # tempfile is slow to import and only needed once a log spills
+                import tempfile  # pylint: disable=import-outside-toplevel
+
+                self.spill_file = tempfile.TemporaryFile()
+            marshal.dump(self.lines, self.spill_file)
+            self.spilled += len(self.lines)
+            self.lines = []
+
+    def get_lines(self):
+        if self.spill_file is None:
+            return list(self.lines)
+        lines = []
+        self.spill_file.seek(0)
+        while True:
+            try:
+                lines.extend(marshal.load(self.spill_file))
+            except EOFError:
+                break
+        self.spill_file.seek(0, os.SEEK_END)
+        lines.extend(self.lines)
+        return lines
+
+    def close(self):
+        if self.spill_file is not None:
+            self.spill_file.close()
+            self.spill_file = None
+
+
+# the output log for log_limit and log_mode; a plain list if there's no limit
+def make_log(log_limit=None, log_mode=RING):
+    if log_mode not in LOG_MODES:
+        raise ValueError(f"Unknown output log mode {log_mode}")
+    if log_limit is None:
+        return []
+    if log_mode == RING:
+        return RingLog(log_limit)
+    return SpillLog(log_limit)
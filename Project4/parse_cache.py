@@ -0,0 +1,164 @@
+# Content-addressed on-disk cache for parse_program.
+#
+# Entries are keyed by a hash of the program source together with the grammar
+# signature from parsetab.py, so a change to the grammar (or to the AST node
+# layout, see CACHE_FORMAT) never serves a stale tree. Each entry is one AST in
+# the cache directory, marshalled as plain tuples, lists and constants (see
+# encode_ast) rather than pickled: loading an entry can only build Element
+# nodes, never run code, whoever wrote the file. On top of that the directory is
+# created private to the current user, and entries owned by anyone else are
+# ignored. Writes go to a temporary file that is renamed into place, so several
+# processes can share a directory; readers either see a complete entry or none.
+# The directory is kept under max_bytes by evicting the least recently used
+# entries, using file mtimes (bumped on every hit) as the recency order.
+import hashlib
+import marshal
+import os
+import tempfile
+
+from element import Element
+from parsetab import _lr_signature
+
+# bump when the Element classes change shape
+CACHE_FORMAT = "5"
+ENTRY_SUFFIX = ".ast"
+# class name -> Element subclass, for the nodes an entry may contain
+NODE_CLASSES = {cls.__name__: cls for cls in Element.__subclasses__()}
+
+
+# node as nested tuples (class name, elem_type, field values...); lists stay
+# lists, and every other field value is a constant marshal can write
+def encode_ast(node):
+    if isinstance(node, Element):
+        return (type(node).__name__, node.elem_type) + tuple(
+            encode_ast(getattr(node, field)) for field in node.fields
+        )
+    if isinstance(node, list):
+        return [encode_ast(item) for item in node]
+    return node
+
+
+# the node encode_ast encoded as data; slots that aren't fields (filled in
+# when a program is loaded) start out as None, as in the constructors
+def decode_ast(data):
+    if isinstance(data, tuple):
+        cls = NODE_CLASSES[data[0]]
+        if len(data) != 2 + len(cls.fields):
+            raise ValueError(f"Malformed {data[0]} in cache entry")
+        node = cls.__new__(cls)
+        node.elem_type = data[1]
+        for slot in cls.__slots__:
+            setattr(node, slot, None)
+        for field, value in zip(cls.fields, data[2:]):
+            setattr(node, field, decode_ast(value))
+        return node
+    if isinstance(data, list):
+        return [decode_ast(item) for item in data]
+    return data
+
+
+class ParseCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # mode only applies if the directory is created here
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def key(self, program):
+        digest = hashlib.sha256()
+        digest.update(CACHE_FORMAT.encode())
+        digest.update(_lr_signature.encode())
+        digest.update(b"\0")
+        digest.update(program.encode("utf-8"))
+        return digest.hexdigest()
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    # returns the cached AST for program, or None on a miss
+    def load(self, program):
+        path = self.__path(self.key(program))
+        try:
+            with open(path, "rb") as handle:
+                if hasattr(os, "getuid") and os.fstat(handle.fileno()).st_uid != os.getuid():
+                    # not ours; leave it alone, but don't trust it either
+                    self.misses += 1
+                    return None
+                ast = decode_ast(marshal.load(handle))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:  # pylint: disable=broad-except
+            # truncated or foreign file; drop it and parse again
+            self.__remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted by another process in the meantime
+        self.hits += 1
+        return ast
+
+    def store(self, program, ast):
+        path = self.__path(self.key(program))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                marshal.dump(encode_ast(ast), handle)
+            os.replace(tmp_path, path)
+        except (RecursionError, ValueError):
+            # too deeply nested to encode or marshal; such programs are simply not cached
+            self.__remove(tmp_path)
+            return
+        except BaseException:
+            self.__remove(tmp_path)
+            raise
+        self.__evict()
+
+    def __evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry.path))
+                total += info.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if self.__remove(path):
+                self.evictions += 1
+            total -= size
+
+    @staticmethod
+    def __remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def clear(self):
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    self.__remove(entry.path)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
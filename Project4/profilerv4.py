@@ -0,0 +1,274 @@
+# Deterministic profiler for Brewin programs.
+#
+# With Interpreter(profile=True), each call of a Brewin function, lambda or
+# method is reported to the interpreter's Profiler as it starts (enter) and as
+# it returns (exit), on every engine; main is entered when the program starts.
+# For each function the profiler counts calls and measures the wall time spent
+# in it and the objects allocated on the heap while it runs, both inclusive
+# and exclusive of the functions it calls. It keeps the same figures per
+# caller/callee pair and per call stack.
+#
+# Functions are identified by their definition (FuncNode or LambdaNode) and
+# named after the first call that reaches them. A function, or a lambda in a
+# variable, is named for the name it was called by. A method is named "." plus
+# its name. A definition whose name another definition already has gets "#2",
+# "#3"... appended. Recursive calls count as calls, but the inclusive figures
+# cover only the outermost one, as in cProfile. A tail call reuses the
+# caller's frame, so it ends the caller's entry and starts the callee's under
+# the caller's caller.
+#
+# Results export as pstats data: dump_stats(), or pass the profiler itself to
+# pstats.Stats. Times are in seconds, and each function is at line 0 of
+# "<brewin>". They also export as collapsed stacks for flamegraph.pl and
+# similar tools (write_collapsed), weighted by exclusive microseconds or by
+# allocations.
+#
+# When profiling is off, Interpreter.profiler is None. Each call then costs
+# only a check of that.
+import marshal
+import time
+
+FILENAME = "<brewin>"
+METRICS = ("time", "allocations")
+
+
+class FunctionStats:
+    __slots__ = (
+        "name",
+        "func_ast",
+        "calls",
+        "primitive_calls",
+        "exclusive_time",
+        "inclusive_time",
+        "exclusive_allocations",
+        "inclusive_allocations",
+        "callers",
+    )
+
+    def __init__(self, name, func_ast):
+        self.name = name
+        self.func_ast = func_ast  # keeps the id the stats are keyed by in use
+        self.calls = 0
+        self.primitive_calls = 0  # calls that weren't made from inside itself
+        self.exclusive_time = 0.0
+        self.inclusive_time = 0.0
+        self.exclusive_allocations = 0
+        self.inclusive_allocations = 0
+        # caller's FunctionStats -> [calls, primitive calls, exclusive, inclusive time]
+        self.callers = {}
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "primitive_calls": self.primitive_calls,
+            "exclusive_time": self.exclusive_time,
+            "inclusive_time": self.inclusive_time,
+            "exclusive_allocations": self.exclusive_allocations,
+            "inclusive_allocations": self.inclusive_allocations,
+        }
+
+
+# a node of the call tree: one per distinct call stack
+class _StackNode:
+    __slots__ = ("children", "time", "allocations")
+
+    def __init__(self):
+        self.children = {}  # FunctionStats -> _StackNode
+        self.time = 0.0
+        self.allocations = 0
+
+
+class _Frame:
+    __slots__ = ("stats", "node", "start", "child_time", "allocated", "child_allocations")
+
+    def __init__(self, stats, node, start, allocated):
+        self.stats = stats
+        self.node = node
+        self.start = start
+        self.child_time = 0.0
+        self.allocated = allocated  # heap.allocated at entry
+        self.child_allocations = 0
+
+
+class Profiler:
+    def __init__(self, heap, clock=time.perf_counter):
+        self.heap = heap
+        self.clock = clock
+        self.functions = {}  # (id(func_ast), name called by) -> FunctionStats
+        self.names = {}  # name -> number of definitions with it
+        self.root = _StackNode()
+        self.frames = []
+        self.active = {}  # FunctionStats -> number of its calls in progress
+        self.stats = {}  # see create_stats
+
+    def enter(self, func_ast, name):
+        stats = self.__get_stats(func_ast, name)
+        parent = self.frames[-1].node if self.frames else self.root
+        node = parent.children.get(stats)
+        if node is None:
+            node = parent.children[stats] = _StackNode()
+        self.active[stats] = self.active.get(stats, 0) + 1
+        self.frames.append(_Frame(stats, node, self.clock(), self.heap.allocated))
+
+    def exit(self):
+        now = self.clock()
+        frame = self.frames.pop()
+        stats = frame.stats
+        elapsed = now - frame.start
+        exclusive = elapsed - frame.child_time
+        allocations = self.heap.allocated - frame.allocated
+        outermost = self.active[stats] == 1
+        self.active[stats] -= 1
+
+        stats.calls += 1
+        stats.exclusive_time += exclusive
+        stats.exclusive_allocations += allocations - frame.child_allocations
+        if outermost:
+            stats.primitive_calls += 1
+            stats.inclusive_time += elapsed
+            stats.inclusive_allocations += allocations
+        frame.node.time += exclusive
+        frame.node.allocations += allocations - frame.child_allocations
+        if self.frames:
+            caller = self.frames[-1]
+            caller.child_time += elapsed
+            caller.child_allocations += allocations
+            edge = stats.callers.get(caller.stats)
+            if edge is None:
+                edge = stats.callers[caller.stats] = [0, 0, 0.0, 0.0]
+            edge[0] += 1
+            edge[2] += exclusive
+            if outermost:
+                edge[1] += 1
+                edge[3] += elapsed
+
+    # the running function's frame is reused for a call of func_ast
+    def tail_call(self, func_ast, name):
+        self.exit()
+        self.enter(func_ast, name)
+
+    # ends the calls still in progress, as when a program stops with an error
+    def unwind(self):
+        while self.frames:
+            self.exit()
+
+    def __get_stats(self, func_ast, name):
+        key = (id(func_ast), name)
+        stats = self.functions.get(key)
+        if stats is None:
+            count = self.names.get(name, 0) + 1
+            self.names[name] = count
+            stats = FunctionStats(name if count == 1 else f"{name}#{count}", func_ast)
+            self.functions[key] = stats
+        return stats
+
+    # most exclusive time first
+    def summary(self):
+        return [
+            stats.as_dict()
+            for stats in sorted(
+                self.functions.values(), key=lambda stats: stats.exclusive_time, reverse=True
+            )
+        ]
+
+    # pstats.Stats(profiler) calls this and reads (and then clears) self.stats
+    def create_stats(self):
+        self.stats = {}
+        for stats in self.functions.values():
+            callers = {}
+            for caller, (calls, primitive_calls, exclusive, inclusive) in stats.callers.items():
+                callers[self.__pstats_key(caller)] = (calls, primitive_calls, exclusive, inclusive)
+            self.stats[self.__pstats_key(stats)] = (
+                stats.primitive_calls,
+                stats.calls,
+                stats.exclusive_time,
+                stats.inclusive_time,
+                callers,
+            )
+
+    @staticmethod
+    def __pstats_key(stats):
+        return (FILENAME, 0, stats.name)
+
+    # in the format of cProfile.Profile.dump_stats, for pstats and its viewers
+    def dump_stats(self, path):
+        self.create_stats()
+        with open(path, "wb") as handle:
+            marshal.dump(self.stats, handle)
+
+    # "main;f;g 1234" lines: each call stack and its exclusive microseconds or allocations
+    def collapsed_stacks(self, metric="time"):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric {metric}")
+        lines = []
+        pending = [(self.root, None)]
+        while pending:
+            node, path = pending.pop()
+            if path is not None:
+                if metric == "time":
+                    weight = round(node.time * 1e6)
+                else:
+                    weight = node.allocations
+                if weight > 0:
+                    lines.append(f"{path} {weight}")
+            for stats, child in node.children.items():
+                name = stats.name.replace(";", ":").replace(" ", "_")
+                pending.append((child, name if path is None else f"{path};{name}"))
+        lines.sort()
+        return lines
+
+    def write_collapsed(self, path, metric="time"):
+        with open(path, "w", encoding="utf-8") as handle:
+            for line in self.collapsed_stacks(metric):
+                handle.write(line + "\n")
+
+
+def format_summary(profiler, limit=None):
+    rows = profiler.summary()[:limit]
+    lines = [
+        f"{'calls':>10} {'excl ms':>10} {'incl ms':>10} {'excl allocs':>12} {'incl allocs':>12}  function"
+    ]
+    for row in rows:
+        calls = str(row["calls"])
+        if row["primitive_calls"] != row["calls"]:
+            calls = f"{row['calls']}/{row['primitive_calls']}"
+        lines.append(
+            f"{calls:>10} {row['exclusive_time'] * 1000:>10.3f} {row['inclusive_time'] * 1000:>10.3f}"
+            f" {row['exclusive_allocations']:>12} {row['inclusive_allocations']:>12}  {row['name']}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # usage: python profilerv4.py program.br [--engine ENGINE] [--input LINE ...]
+    #            [--pstats FILE] [--collapsed FILE] [--collapsed-metric time|allocations]
+    #            [--limit N]
+    import argparse
+    import sys
+
+    from interpreterv4 import Interpreter
+
+    parser = argparse.ArgumentParser(description="Profile a Brewin program by function")
+    parser.add_argument("program")
+    parser.add_argument(
+        "--engine", choices=sorted(Interpreter.ENGINES), default=Interpreter.TREE_ENGINE
+    )
+    parser.add_argument("--input", nargs="*", default=[], help="lines for inputi()")
+    parser.add_argument("--pstats", help="write pstats data to this file")
+    parser.add_argument("--collapsed", help="write collapsed stacks to this file")
+    parser.add_argument("--collapsed-metric", choices=METRICS, default="time")
+    parser.add_argument("--limit", type=int, default=20, help="functions to list")
+    args = parser.parse_args()
+
+    with open(args.program, encoding="utf-8") as handle:
+        source = handle.read()
+    interpreter = Interpreter(inp=args.input, engine=args.engine, profile=True)
+    try:
+        interpreter.run(source)
+    finally:
+        print(format_summary(interpreter.profiler, args.limit), file=sys.stderr)
+        if args.pstats:
+            interpreter.profiler.dump_stats(args.pstats)
+        if args.collapsed:
+            interpreter.profiler.write_collapsed(args.collapsed, args.collapsed_metric)
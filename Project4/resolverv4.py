@@ -0,0 +1,105 @@
+# Lexical-address resolver: annotates "var" and "=" nodes with the number of
+# scopes between the top of the EnvironmentManager stack and the scope that
+# holds the variable ("depth"), so the interpreter can index that scope directly
+# instead of probing every scope with EnvironmentManager.get/set.
+#
+# Brewin calls push their frame on top of the caller's scopes, and a plain
+# assignment updates the first binding it finds anywhere below, so a callee's
+# locals are only known statically in two cases:
+#   * formal parameters, which always sit in the frame pushed for the call and
+#     can never be shadowed by a block scope above it;
+#   * locals of main when main is only entered from Interpreter.run, where the
+#     scopes below the body are all main's own.
+# Every other name is left without a depth and keeps the dynamic lookup.
+from element import Element
+from intbase import InterpreterBase
+
+
+def resolve_program(ast):
+    track_main = not _references_name(ast, "main")
+    for func_def in ast.get("functions"):
+        track_locals = (
+            track_main
+            and func_def.get("name") == "main"
+            and len(func_def.get("args")) == 0
+        )
+        _FunctionResolver(func_def, track_locals).resolve()
+    return ast
+
+
+def _references_name(node, name):
+    if isinstance(node, list):
+        return any(_references_name(item, name) for item in node)
+    if not isinstance(node, Element):
+        return False
+    if node.elem_type in (InterpreterBase.FCALL_DEF, InterpreterBase.VAR_DEF):
+        if node.get("name") == name:
+            return True
+    return any(_references_name(child, name) for _, child in node.items())
+
+
+class _FunctionResolver:
+    def __init__(self, func_ast, track_locals):
+        self.func_ast = func_ast
+        self.track_locals = track_locals
+        # one set of known names per scope; index 0 is the frame holding the params
+        self.scopes = [{arg.get("name") for arg in func_ast.get("args")}]
+
+    def resolve(self):
+        self.__block(self.func_ast.get("statements"))
+
+    def __lookup(self, name):
+        for depth, scope in enumerate(reversed(self.scopes)):
+            if name in scope:
+                return depth
+        return None
+
+    def __block(self, statements):
+        self.scopes.append(set())
+        for statement in statements:
+            self.__statement(statement)
+        self.scopes.pop()
+
+    def __statement(self, statement):
+        kind = statement.elem_type
+        if kind == "=":
+            self.__expr(statement.get("expression"))
+            var_name = statement.get("name")
+            if "." in var_name or var_name == InterpreterBase.THIS_DEF:
+                return
+            depth = self.__lookup(var_name)
+            if depth is None and self.track_locals:
+                # first assignment creates the variable in the current block
+                self.scopes[-1].add(var_name)
+                depth = 0
+            statement.set("depth", depth)
+        elif kind == InterpreterBase.IF_DEF:
+            self.__expr(statement.get("condition"))
+            self.__block(statement.get("statements"))
+            if statement.get("else_statements") is not None:
+                self.__block(statement.get("else_statements"))
+        elif kind == InterpreterBase.WHILE_DEF:
+            self.__expr(statement.get("condition"))
+            self.__block(statement.get("statements"))
+        elif kind == InterpreterBase.RETURN_DEF:
+            if statement.get("expression") is not None:
+                self.__expr(statement.get("expression"))
+        else:
+            self.__expr(statement)
+
+    def __expr(self, expr_ast):
+        kind = expr_ast.elem_type
+        if kind == InterpreterBase.VAR_DEF:
+            var_name = expr_ast.get("name")
+            if "." not in var_name:
+                expr_ast.set("depth", self.__lookup(var_name))
+        elif kind == InterpreterBase.LAMBDA_DEF:
+            # a lambda body runs in its own frame, wherever it is called from
+            _FunctionResolver(expr_ast, False).resolve()
+        elif kind in (InterpreterBase.FCALL_DEF, InterpreterBase.MCALL_DEF):
+            for arg in expr_ast.get("args"):
+                self.__expr(arg)
+        else:
+            for operand in ("op1", "op2"):
+                if expr_ast.get(operand) is not None:
+                    self.__expr(expr_ast.get(operand))
@@ -0,0 +1,214 @@
+# Long-lived interpreter server. Importing the interpreter and building the PLY
+# tables costs far more than running a typical test program, so this process
+# pays for it once and then runs any number of programs, each in a fresh
+# Interpreter.
+#
+# Requests and responses are JSON objects, one per line, read from stdin and
+# written to stdout or, with --socket, exchanged over a Unix socket connection:
+#
+#   {"id": 1, "program": "func main() { print(inputi()); }", "input": ["5"]}
+#   -> {"id": 1, "output": ["5"], "error_type": null, "error_line": null,
+#       "exception": null, "stdout": "", "latency_ms": 0.41, "heap": {...}}
+#
+# error_type is the name of the ErrorType member the program failed with (or
+# "SYNTAX_ERROR"), exception is the message of whatever was raised, and stdout
+# is anything printed while parsing or running (e.g. syntax error reports).
+# heap is the program's ObjectHeap.stats(): live/peak objects and bytes, and
+# the collections, pauses and reclaimed bytes of its garbage collector. With
+# --heap-limit, a program whose live objects outgrow the limit fails with a
+# FAULT_ERROR.
+# {"op": "stats"} returns request count and latency percentiles instead. The
+# percentiles come from a fixed histogram of latencies, so they are accurate to
+# within LATENCY_BUCKET_GROWTH (5%), and a server that runs for a long time
+# keeps the same, small amount of state however many requests it serves.
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import socketserver
+import sys
+import time
+
+from brewparse import BACKENDS, PLY_BACKEND, PRATT_BACKEND, get_lexer, get_parser
+from interpreterv4 import Interpreter
+
+SYNTAX_ERROR = "SYNTAX_ERROR"
+PERCENTILES = (50, 90, 99)
+# latency histogram: bucket i holds latencies up to LATENCY_MIN_MS *
+# LATENCY_BUCKET_GROWTH ** i; the last one holds everything longer
+LATENCY_MIN_MS = 0.01
+LATENCY_BUCKET_GROWTH = 1.05
+LATENCY_BUCKETS = 420  # up to about 2 hours
+
+
+class LatencyStats:
+    def __init__(self):
+        self.counts = [0] * LATENCY_BUCKETS
+        self.requests = 0
+        self.min_ms = None
+        self.max_ms = 0.0
+
+    def record(self, latency_ms):
+        self.counts[self.__bucket(latency_ms)] += 1
+        self.requests += 1
+        if self.min_ms is None or latency_ms < self.min_ms:
+            self.min_ms = latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    @staticmethod
+    def __bucket(latency_ms):
+        if latency_ms <= LATENCY_MIN_MS:
+            return 0
+        bucket = math.ceil(math.log(latency_ms / LATENCY_MIN_MS, LATENCY_BUCKET_GROWTH))
+        return min(bucket, LATENCY_BUCKETS - 1)
+
+    # nearest-rank percentile: the upper bound of the bucket holding it,
+    # within the smallest and largest latencies recorded
+    def percentile(self, p):
+        if not self.requests:
+            return 0.0
+        rank = max(1, -(-p * self.requests // 100))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = LATENCY_MIN_MS * LATENCY_BUCKET_GROWTH**bucket
+                return min(max(bound, self.min_ms), self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        summary = {"requests": self.requests}
+        for p in PERCENTILES:
+            summary[f"p{p}_ms"] = round(self.percentile(p), 3)
+        summary["max_ms"] = round(self.max_ms, 3)
+        return summary
+
+
+class InterpreterServer:
+    def __init__(self, engine=Interpreter.TREE_ENGINE, parser_backend=PLY_BACKEND, heap_limit=None):
+        self.engine = engine
+        self.parser_backend = parser_backend
+        self.heap_limit = heap_limit
+        self.stats = LatencyStats()
+        self.__warm_up()
+
+    def __warm_up(self):
+        if self.parser_backend == PRATT_BACKEND:
+            import brewpratt  # pylint: disable=import-outside-toplevel,unused-import
+        else:
+            get_lexer()
+            get_parser()
+        self.run("func main() { print(1); }", [])
+        self.stats = LatencyStats()
+
+    def handle(self, request):
+        if request.get("op") == "stats":
+            return self.stats.summary()
+        response = self.run(request.get("program", ""), request.get("input"))
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    def run(self, program, inp):
+        start = time.perf_counter()
+        interpreter = Interpreter(
+            console_output=False,
+            inp=inp,
+            engine=self.engine,
+            parser_backend=self.parser_backend,
+            heap_limit=self.heap_limit,
+        )
+        error_type = None
+        message = None
+        captured = io.StringIO()
+        # the interpreter must neither write to nor read from the server's own
+        # stdin/stdout; with no input list, inputi()/inputs() see end of file
+        with contextlib.redirect_stdout(captured), _redirect_stdin(io.StringIO()):
+            try:
+                interpreter.run(program)
+            except SyntaxError as exception:
+                error_type = SYNTAX_ERROR
+                message = str(exception)
+            except Exception as exception:  # pylint: disable=broad-except
+                message = str(exception)
+        if interpreter.error_type is not None:
+            error_type = interpreter.error_type.name
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.stats.record(latency_ms)
+        return {
+            "output": interpreter.get_output(),
+            "error_type": error_type,
+            "error_line": interpreter.error_line,
+            "exception": message,
+            "stdout": captured.getvalue(),
+            "latency_ms": round(latency_ms, 3),
+            "heap": interpreter.heap.stats(),
+        }
+
+    # serve newline-delimited JSON requests until end of input
+    def serve_lines(self, reader, writer):
+        for line in reader:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as exception:
+                response = {"exception": f"Bad request: {exception}"}
+            else:
+                response = self.handle(request)
+            writer.write(json.dumps(response, default=str) + "\n")
+            writer.flush()
+
+
+@contextlib.contextmanager
+def _redirect_stdin(stream):
+    saved = sys.stdin
+    sys.stdin = stream
+    try:
+        yield
+    finally:
+        sys.stdin = saved
+
+
+def serve_unix_socket(server, path):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            reader = io.TextIOWrapper(self.rfile, encoding="utf-8")
+            writer = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+            server.serve_lines(reader, writer)
+
+    if os.path.exists(path):
+        os.remove(path)
+    # connections are served one at a time: runs redirect the process-wide
+    # stdin/stdout
+    with socketserver.UnixStreamServer(path, Handler) as unix_server:
+        try:
+            unix_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Brewin interpreter server")
+    parser.add_argument("--socket", help="serve on this Unix socket instead of stdin/stdout")
+    parser.add_argument(
+        "--engine", choices=sorted(Interpreter.ENGINES), default=Interpreter.TREE_ENGINE
+    )
+    parser.add_argument("--parser-backend", choices=BACKENDS, default=PLY_BACKEND)
+    parser.add_argument("--heap-limit", type=int, help="max bytes of live objects per program")
+    args = parser.parse_args()
+
+    server = InterpreterServer(args.engine, args.parser_backend, args.heap_limit)
+    if args.socket:
+        serve_unix_socket(server, args.socket)
+    else:
+        server.serve_lines(sys.stdin, sys.stdout)
+    print(json.dumps(server.stats.summary()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+# Hidden-class ("shape") representation of Brewin objects.
+#
+# A Shape maps each property and method name an object has to an index into
+# the object's slots list. Objects that received the same fields in the same
+# order share one Shape, so the name -> index tables are stored once instead of
+# once per object, and each object only carries its shape, a list of values
+# and its proto. Adding a field moves the object to the next shape along a
+# transition that is cached on the previous shape, so every object built by the
+# same code walks the same chain of shapes.
+#
+# Transitions are never removed, so each ObjectHeap (that is, each interpreter)
+# has a root shape of its own, and the shapes a run creates are freed with its
+# heap instead of accumulating for the life of the process. ROOT_SHAPE is only
+# the root of objects that have no heap.
+#
+# ShapedObject keeps the interface of type_valuev4.Object: obj.properties and
+# obj.methods behave like the dicts they used to be (membership, indexing,
+# assignment, keys()), backed by the shape and slots. Objects allocated by an
+# ObjectHeap (heapv4.py) report their size changes and release to it.
+import copy
+import sys
+
+PROPERTY = 0
+METHOD = 1
+
+
+class Shape:
+    __slots__ = ("properties", "methods", "size", "transitions")
+
+    def __init__(self, properties, methods):
+        self.properties = properties  # name -> slot index
+        self.methods = methods  # name -> slot index
+        self.size = len(properties) + len(methods)
+        self.transitions = {}  # (kind, name) -> Shape
+
+    # the shape an object of this shape has once field name is added to it
+    def with_field(self, kind, name):
+        key = (kind, name)
+        shape = self.transitions.get(key)
+        if shape is None:
+            properties = dict(self.properties)
+            methods = dict(self.methods)
+            (properties if kind == PROPERTY else methods)[name] = self.size
+            shape = Shape(properties, methods)
+            self.transitions[key] = shape
+        return shape
+
+    def index(self, kind):
+        return self.properties if kind == PROPERTY else self.methods
+
+    # shapes are immutable once created (transitions only cache), so copies of
+    # objects keep sharing them
+    def __deepcopy__(self, memo):
+        return self
+
+
+ROOT_SHAPE = Shape({}, {})
+
+
+class ShapedObject:
+    __slots__ = ("shape", "slots", "proto", "heap", "__weakref__")
+
+    def __init__(self, heap=None):
+        self.shape = ROOT_SHAPE if heap is None else heap.root_shape
+        self.slots = []
+        self.proto = None
+        self.heap = heap
+
+    @property
+    def properties(self):
+        return FieldView(self, PROPERTY)
+
+    @property
+    def methods(self):
+        return FieldView(self, METHOD)
+
+    def add_field(self, kind, name, value):
+        self.extend(self.shape.with_field(kind, name), value)
+
+    # moves the object to shape, one of its shape's transitions, whose new
+    # field holds value
+    def extend(self, shape, value):
+        self.shape = shape
+        if self.heap is None:
+            self.slots.append(value)
+            return
+        size = sys.getsizeof(self.slots)
+        self.slots.append(value)
+        self.heap.resize(sys.getsizeof(self.slots) - size)
+
+    # copies (by-value arguments and returns) are allocated on the same heap
+    def __deepcopy__(self, memo):
+        copied = ShapedObject() if self.heap is None else self.heap.allocate()
+        memo[id(self)] = copied
+        copied.shape = self.shape
+        copied.proto = copy.deepcopy(self.proto, memo)
+        if self.heap is None:
+            copied.slots = copy.deepcopy(self.slots, memo)
+            return copied
+        size = sys.getsizeof(copied.slots)
+        copied.slots = copy.deepcopy(self.slots, memo)
+        self.heap.resize(sys.getsizeof(copied.slots) - size)
+        return copied
+
+    def __del__(self):
+        if self.heap is not None:
+            self.heap.release(self)
+
+
+# bytes used by an object's own layout: the object and its slots list
+def object_size(obj):
+    return sys.getsizeof(obj) + sys.getsizeof(obj.slots)
+
+
+# dict-like view of one kind of field of a ShapedObject
+class FieldView:
+    __slots__ = ("obj", "kind")
+
+    def __init__(self, obj, kind):
+        self.obj = obj
+        self.kind = kind
+
+    def __contains__(self, name):
+        return name in self.obj.shape.index(self.kind)
+
+    def __getitem__(self, name):
+        return self.obj.slots[self.obj.shape.index(self.kind)[name]]
+
+    def __setitem__(self, name, value):
+        slot = self.obj.shape.index(self.kind).get(name)
+        if slot is None:
+            self.obj.add_field(self.kind, name, value)
+        else:
+            self.obj.slots[slot] = value
+
+    def __iter__(self):
+        return iter(self.obj.shape.index(self.kind))
+
+    def __len__(self):
+        return len(self.obj.shape.index(self.kind))
+
+    def keys(self):
+        return self.obj.shape.index(self.kind).keys()
+
+    def get(self, name, default=None):
+        slot = self.obj.shape.index(self.kind).get(name)
+        return default if slot is None else self.obj.slots[slot]
+
+    def items(self):
+        slots = self.obj.slots
+        return [(name, slots[slot]) for name, slot in self.obj.shape.index(self.kind).items()]
@@ -0,0 +1,233 @@
+# Hot-path counters for an Interpreter run.
+#
+# With Interpreter(collect_stats=True), the interpreter keeps an
+# InterpreterStats in self.counters and fills it while programs run.
+# Interpreter.stats() returns the figures. With stats_path set, run() also
+# writes them there as JSON when it exits. The counters cover:
+#
+# - environment lookups and assignments. get/set walk the scope chain from the
+#   innermost scope, so both the calls and the scopes probed are counted.
+#   get_at/set_at, for names the resolver placed, probe one scope each. The
+#   bytecode VM reads resolved names from the scope directly (LOAD_FAST), and
+#   those reads aren't counted;
+# - scopes pushed and popped, including the frames the VM drops at once
+#   (pop_to);
+# - Values the interpreter creates: those its ValuePool makes (operator
+#   results other than the shared constants, literals, objects, closures,
+#   input), the copies made for by-value and ref args and for returns, and the
+#   Values copied objects and closures get when completed. Values made by the
+#   starter code aren't counted;
+# - copies of objects and closures (see cowv4.py): those made, those
+#   completed, and the bytes completing them took (the slots lists and
+#   captured environments, see copy_bytes);
+# - hops along proto chains by property and method lookups that the inline
+#   caches missed;
+# - statements executed, by statement type.
+#
+# Nothing is instrumented unless stats are collected, and then only in the
+# interpreter that collects them; no module-level state is touched, so other
+# interpreters in the process run as usual. An interpreter that collects stats
+# imports this module, and:
+# - runs programs in a CountingEnvironmentManager (environment());
+# - makes Values with a CountingValuePool (value_pool()) and copies them with
+#   a CountingCopyOnWrite (copier()) and unshared() below instead of cowv4's
+#   and internv4's;
+# - wraps statements as the compiled engine compiles them, and has the
+#   bytecode compiler emit a COUNT_STATEMENT before each statement.
+# The only checks left on the paths a run takes without stats are the ones
+# for the tree walker's statements and for proto hops, next to the existing
+# trace_output check and the inline-cache misses.
+import json
+import sys
+
+from cowv4 import IMMUTABLE_TYPES, CopyOnWrite
+from env_v4 import EnvironmentManager
+from internv4 import InternedValue, ValuePool
+from shapesv4 import ShapedObject
+from type_valuev4 import Type, Value
+
+
+class InterpreterStats:
+    def __init__(self):
+        self.env_gets = 0
+        self.env_get_scopes = 0  # scopes probed by env_gets
+        self.env_sets = 0
+        self.env_set_scopes = 0
+        self.env_direct_gets = 0  # get_at, one scope each
+        self.env_direct_sets = 0
+        self.scopes_pushed = 0
+        self.scopes_popped = 0
+        self.values_allocated = 0
+        self.copies = 0  # of objects and closures
+        self.copies_completed = 0
+        self.copied_bytes = 0
+        self.proto_hops = 0
+        self.statements = {}  # elem_type -> statements of that type executed
+
+    def count_statement(self, kind):
+        self.statements[kind] = self.statements.get(kind, 0) + 1
+
+    def environment(self):
+        return CountingEnvironmentManager(self)
+
+    def value_pool(self, small_ints):
+        return CountingValuePool(small_ints, self)
+
+    def copier(self, heap, values):
+        return CountingCopyOnWrite(heap, values, self)
+
+    # internv4.unshared, counted
+    def unshared(self, value):
+        if type(value) is InternedValue:
+            self.values_allocated += 1
+            return Value(value.t, value.v)
+        return value
+
+    def as_dict(self):
+        return {
+            "env_gets": self.env_gets,
+            "env_get_avg_depth": _average(self.env_get_scopes, self.env_gets),
+            "env_sets": self.env_sets,
+            "env_set_avg_depth": _average(self.env_set_scopes, self.env_sets),
+            "env_direct_gets": self.env_direct_gets,
+            "env_direct_sets": self.env_direct_sets,
+            "scopes_pushed": self.scopes_pushed,
+            "scopes_popped": self.scopes_popped,
+            "values_allocated": self.values_allocated,
+            "copies": self.copies,
+            "copies_completed": self.copies_completed,
+            "copied_bytes": self.copied_bytes,
+            "proto_hops": self.proto_hops,
+            "statements": dict(sorted(self.statements.items())),
+            "statements_total": sum(self.statements.values()),
+        }
+
+    def dump(self, path, extra=None):
+        data = self.as_dict()
+        if extra:
+            data.update(extra)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2)
+            handle.write("\n")
+
+
+def _average(total, count):
+    return total / count if count else 0.0
+
+
+# EnvironmentManager that counts its calls into stats
+class CountingEnvironmentManager(EnvironmentManager):
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def get(self, symbol):
+        stats = self.stats
+        stats.env_gets += 1
+        for env in reversed(self.environment):
+            stats.env_get_scopes += 1
+            if symbol in env:
+                return env[symbol]
+        return None
+
+    def set(self, symbol, value, force_new_var_creation=False):
+        stats = self.stats
+        stats.env_sets += 1
+        if not force_new_var_creation:
+            for env in reversed(self.environment):
+                stats.env_set_scopes += 1
+                if symbol in env:
+                    env[symbol] = value
+                    return
+        else:
+            stats.env_set_scopes += 1
+        self.environment[-1][symbol] = value
+
+    def get_at(self, depth, symbol):
+        self.stats.env_direct_gets += 1
+        return super().get_at(depth, symbol)
+
+    def set_at(self, depth, symbol, value):
+        self.stats.env_direct_sets += 1
+        super().set_at(depth, symbol, value)
+
+    def push(self, env=None):
+        self.stats.scopes_pushed += 1
+        super().push(env)
+
+    def pop(self):
+        self.stats.scopes_popped += 1
+        super().pop()
+
+    def pop_to(self, depth):
+        self.stats.scopes_popped += max(0, len(self.environment) - depth)
+        super().pop_to(depth)
+
+
+# ValuePool that counts the Values it creates into stats; the shared
+# constants it hands out aren't new
+class CountingValuePool(ValuePool):
+    def __init__(self, small_ints, stats):
+        super().__init__(small_ints)
+        self.stats = stats
+
+    def int(self, v):
+        value = super().int(v)
+        if type(value) is not InternedValue:
+            self.stats.values_allocated += 1
+        return value
+
+    def make(self, t, v):
+        if t == Type.INT:
+            return self.int(v)
+        value = super().make(t, v)
+        if type(value) is not InternedValue:
+            self.stats.values_allocated += 1
+        return value
+
+    def literal(self, t, v):
+        value = super().literal(t, v)
+        if t == Type.STRING or (t == Type.INT and not self.__is_small(v)):
+            self.stats.values_allocated += 1
+        return value
+
+    def __is_small(self, v):
+        return 0 <= v - self.ints_start < len(self.ints)
+
+    def new(self, t, v):
+        self.stats.values_allocated += 1
+        return Value(t, v)
+
+
+# cowv4.CopyOnWrite, counted; its copied Values come from the counting pool
+class CountingCopyOnWrite(CopyOnWrite):
+    def __init__(self, heap, values, stats):
+        super().__init__(heap, values)
+        self.stats = stats
+
+    def copy_value(self, value):
+        if value is not None and value.t in IMMUTABLE_TYPES:
+            self.stats.values_allocated += 1
+        return super().copy_value(value)
+
+    def _track(self, copied, owner):
+        self.stats.copies += 1
+        return super()._track(copied, owner)
+
+    def complete(self, item):
+        super().complete(item)
+        self.stats.copies_completed += 1
+        self.stats.copied_bytes += copy_bytes(item)
+
+
+# bytes a completed copy got of its own: an object's slots list and method
+# tables, or a closure's captured environment
+def copy_bytes(item):
+    if isinstance(item, ShapedObject):
+        return sys.getsizeof(item.slots) + sum(
+            sys.getsizeof(slot) for slot in item.slots if isinstance(slot, dict)
+        )
+    captured = item.captured_env
+    return sys.getsizeof(captured) + sys.getsizeof(captured.environment) + sum(
+        sys.getsizeof(scope) for scope in captured.environment
+    )